@@ -0,0 +1,247 @@
+# core_pipeline.py - بنچمارک‌های خرد مسیر اصلی هر نوبت
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from typing import Callable, Dict, Optional, Union
+
+# LLM جایگزین و محدودکننده بدون سقف تا فقط هزینه کد خودمان اندازه‌گیری شود
+os.environ.setdefault("LLM_CLIENT", "openai")
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000000")
+os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000000")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.agents import AgentRole, ConservativeInvestor, RiskyInvestor, Competitor, Evaluator  # noqa: E402
+from core.audio_queue import AudioPlaybackQueue  # noqa: E402
+from core.clock import VirtualClock  # noqa: E402
+from core.conversation import ConversationManager, SessionPhase  # noqa: E402
+from core.event_bus import EventBus  # noqa: E402
+from core.llm import ChatResponse, install_client  # noqa: E402
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baselines.json")
+API_KEY = "benchmark"
+
+USER_MESSAGE = "ما با CAC برابر ۲۰۰ هزار تومان و LTV سه میلیون، رشد ۱۵ درصدی بازار را هدف گرفته‌ایم اما هزینه‌ها بالاست"
+DEAL_MESSAGE = "پیشنهاد نهایی ما 40000000000 تومان برای 20 درصد سهام است"
+STUB_REPLY = json.dumps({
+    "reply": "موافقم، اعداد شما قانع‌کننده است.",
+    "agrees": True,
+    "proposed_investment": None,
+    "proposed_equity": None,
+    "sentiment": "positive"
+}, ensure_ascii=False)
+
+
+class StubChatClient:
+    """کلاینت جایگزین با پاسخ ثابت و بدون شبکه"""
+
+    max_tokens = 300
+
+    def invoke(self, messages, **kwargs):
+        return ChatResponse(STUB_REPLY, {"input_tokens": 200, "output_tokens": 40, "total_tokens": 240})
+
+
+class Benchmark:
+    """بنچمارکی که وضعیتش با اجرا رشد می‌کند
+
+    setup پیش از هر دور اندازه‌گیری وضعیت تازه می‌سازد و هر دور دقیقا number
+    فراخوانی دارد تا همه دورها (و همه اجراها) یک بار کاری را بسنجند.
+    teardown پس از آخرین دور منابع بیرونی (مثل فایل‌های موقت) را آزاد می‌کند.
+    """
+
+    def __init__(self, func: Callable, setup: Callable, number: int, teardown: Optional[Callable] = None):
+        self.func = func
+        self.setup = setup
+        self.number = number
+        self.teardown = teardown
+
+
+def make_manager(turns: int = 0) -> ConversationManager:
+    manager = ConversationManager(API_KEY, async_evaluation=False)
+    for _ in range(turns):
+        manager.process_user_input(USER_MESSAGE)
+    return manager
+
+
+def build_benchmarks() -> Dict[str, Union[Callable, Benchmark]]:
+    """هر بنچمارک یک تابع بدون آرگومان است که یک بار عملیات را اجرا می‌کند"""
+    install_client(StubChatClient(), API_KEY)
+    benchmarks = {}
+
+    # لاگ و checkpointهای جلسه با هر نوبت بلندتر می‌شوند؛ هر دور از جلسه تازه و ۴۰ نوبت
+    state = {}
+
+    def new_manager():
+        state["manager"] = make_manager()
+
+    benchmarks["process_user_input"] = Benchmark(
+        lambda: state["manager"].process_user_input(USER_MESSAGE), new_manager, number=40
+    )
+
+    for agent in (ConservativeInvestor(API_KEY), RiskyInvestor(API_KEY), Competitor(API_KEY)):
+        benchmarks[f"update_state.{agent.role.value}"] = (
+            lambda agent=agent: agent.update_state(USER_MESSAGE, "پاسخ")
+        )
+
+    agent_responses = {"آقای محمدی": "پاسخ", "خانم اکبری": "پاسخ"}
+
+    def new_evaluator():
+        state["evaluator"] = Evaluator(API_KEY)
+
+    benchmarks["evaluate_response"] = Benchmark(
+        lambda: state["evaluator"].evaluate_response(USER_MESSAGE, agent_responses), new_evaluator, number=200
+    )
+
+    deal_manager = make_manager()
+    deal_responses = [
+        {"agent": "آقای محمدی", "role": AgentRole.CONSERVATIVE_INVESTOR.value, "message": "موافقم"},
+        {"agent": "خانم اکبری", "role": AgentRole.RISKY_INVESTOR.value, "message": "باید فکر کنم"}
+    ]
+
+    def check_deal_closure():
+        deal_manager.user_profile["deal_closed"] = False
+        deal_manager.check_deal_closure(DEAL_MESSAGE, deal_responses)
+
+    benchmarks["check_deal_closure"] = check_deal_closure
+
+    report_manager = make_manager(turns=40)
+    benchmarks["get_final_report"] = report_manager.get_final_report
+    benchmarks["export_report.json"] = lambda: report_manager.export_report("json")
+    benchmarks["export_report.text"] = lambda: report_manager.export_report("text")
+
+    def full_session():
+        # همه مراحل با ساعت مجازی و نوبت‌های ۳۰ ثانیه‌ای، بدون انتظار واقعی
+        clock = VirtualClock()
+        manager = ConversationManager(API_KEY, async_evaluation=False, clock=clock)
+        while manager.current_phase != SessionPhase.COMPLETED:
+            manager.process_user_input(USER_MESSAGE)
+            clock.advance(30)
+        manager.get_final_report()
+
+    benchmarks["full_session.virtual_clock"] = full_session
+
+    # کلیپ‌های قدیمی‌تر از max_played از دیسک حذف می‌شوند و پوشه موقت صف با clear پاک می‌شود
+    clip = b"\x00" * 32 * 1024
+
+    def new_queue():
+        if "queue" in state:
+            state["queue"].clear()
+        state["queue"] = AudioPlaybackQueue(max_bytes=1024 * 1024, max_played=50)
+
+    def audio_queue_cycle():
+        state["queue"].append("آقای محمدی", clip)
+        state["queue"].next()
+
+    def clear_queue():
+        state.pop("queue").clear()
+
+    benchmarks["audio_queue.append_next"] = Benchmark(audio_queue_cycle, new_queue, number=500,
+                                                      teardown=clear_queue)
+
+    # انتشار یک پیام به ۱۰۰ بیننده پایش زنده؛ بیننده‌ها نمی‌خوانند تا مسیر سرریز هم سنجیده شود
+    bus = EventBus(idle_timeout=float("inf"))
+    for _ in range(100):
+        bus.subscribe()
+    event = {"type": "message", "session_id": "benchmark", "seq": 1, "entry": {"message": USER_MESSAGE}}
+    benchmarks["event_bus.publish_100_subscribers"] = lambda: bus.publish(event)
+    return benchmarks
+
+
+def measure(benchmark: Union[Callable, Benchmark], repeat: int) -> float:
+    """بهترین زمان هر فراخوانی در چند تکرار (میکروثانیه)"""
+    if isinstance(benchmark, Benchmark):
+        best = float("inf")
+        try:
+            for _ in range(repeat):
+                benchmark.setup()
+                best = min(best, timeit.Timer(benchmark.func).timeit(benchmark.number))
+        finally:
+            if benchmark.teardown is not None:
+                benchmark.teardown()
+        return best / benchmark.number * 1e6
+
+    timer = timeit.Timer(benchmark)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def calibration_workload():
+    """کار ثابت پایتون خالص (رشته، dict و JSON) برای سنجش سرعت همین ماشین"""
+    words = {str(i): "پیام " * (i % 7) for i in range(200)}
+    json.dumps(words, ensure_ascii=False)
+    return sum(len(word.split()) for word in words.values())
+
+
+def machine_id() -> str:
+    return f"{platform.node()} {platform.machine()} {platform.python_implementation()} {platform.python_version()}"
+
+
+def load_baselines() -> Dict:
+    """خط پایه: زمان‌ها به همراه زمان کالیبراسیون و ماشینی که روی آن ثبت شده‌اند"""
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def baseline_scale(baselines: Dict, calibration: float) -> Optional[float]:
+    """ضریب تبدیل خط پایه به ماشین فعلی؛ روی ماشین دیگر نسبت به کالیبراسیون مقایسه می‌شود"""
+    if not baselines.get("calibration"):
+        return None
+    if baselines.get("machine") == machine_id():
+        return 1.0
+    return calibration / baselines["calibration"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک‌های خرد مسیر نوبت")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="اجرای بنچمارک‌هایی که نامشان شامل این متن است")
+    parser.add_argument("--update-baseline", action="store_true", help="ذخیره نتایج به عنوان خط پایه")
+    parser.add_argument("--max-regression", type=float, default=0.3,
+                        help="حداکثر افزایش نسبی مجاز نسبت به خط پایه")
+    args = parser.parse_args()
+
+    baselines = load_baselines()
+    calibration = round(measure(calibration_workload, args.repeat), 2)
+    scale = baseline_scale(baselines, calibration)
+    if scale is None:
+        print("no usable baseline; run with --update-baseline on this machine")
+    elif scale != 1.0:
+        print(f"baseline recorded on {baselines.get('machine')}; comparing relative to calibration (x{scale:.2f})")
+
+    results = {}
+    regressions = []
+
+    for name, benchmark in build_benchmarks().items():
+        if args.filter not in name:
+            continue
+        results[name] = round(measure(benchmark, args.repeat), 2)
+        baseline = baselines.get("results", {}).get(name)
+        expected = baseline * scale if baseline and scale else None
+        change = f"{(results[name] / expected - 1) * 100:+6.1f}%" if expected else "   new"
+        print(f"{name:36s} {results[name]:12.2f} us  {change}")
+        if expected and results[name] > expected * (1 + args.max_regression):
+            regressions.append(f"{name}: {expected:.2f} -> {results[name]} us")
+
+    if args.update_baseline:
+        # خط پایه فقط با ماشین و کالیبراسیون همان اجرا معنا دارد
+        recorded = baselines.get("results", {}) if baselines.get("machine") == machine_id() else {}
+        recorded.update(results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine_id(), "calibration": calibration, "results": recorded},
+                      f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if regressions and not args.update_baseline:
+        print("\nregressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
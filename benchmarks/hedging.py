@@ -0,0 +1,65 @@
+# hedging.py - مقایسه تاخیر دم با و بدون درخواست‌های hedged روی سرویس‌دهنده‌های mock
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.llm_router import Endpoint, LLMRouter, MockEndpointClient  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "سلام"}]
+
+
+def make_router(hedging: bool) -> LLMRouter:
+    """دو سرویس‌دهنده با تاخیر مشابه که گاهی بسیار کند می‌شوند و یکی که خطا هم دارد"""
+    return LLMRouter([
+        Endpoint("primary", MockEndpointClient(latency=0.05, jitter=0.01, slow_rate=0.05, slow_latency=0.5)),
+        Endpoint("secondary", MockEndpointClient(latency=0.06, jitter=0.01, slow_rate=0.05, slow_latency=0.5)),
+        Endpoint("flaky", MockEndpointClient(latency=0.04, jitter=0.01, error_rate=0.6)),
+    ], hedging=hedging, default_hedge_delay=0.1)
+
+
+def run(router: LLMRouter, calls: int, concurrency: int) -> List[float]:
+    def timed_call(_):
+        started = time.perf_counter()
+        router.invoke(MESSAGES)
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed_call, range(calls)))
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50": statistics.median(ordered),
+        "p95": ordered[int(0.95 * (len(ordered) - 1))],
+        "p99": ordered[int(0.99 * (len(ordered) - 1))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="اثر hedging بر تاخیر دم")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    for hedging in (False, True):
+        router = make_router(hedging)
+        summary = summarize(run(router, args.calls, args.concurrency))
+        label = "hedged" if hedging else "single"
+        print(f"{label:8s} p50 {summary['p50']:7.1f} ms  p95 {summary['p95']:7.1f} ms  "
+              f"p99 {summary['p99']:7.1f} ms  hedges {router.hedges}")
+        for name, stats in router.stats()["endpoints"].items():
+            print(f"    {name:10s} calls {stats['calls']:4d}  errors {stats['error_rate']:.2f}  "
+                  f"healthy {stats['healthy']}  hedge wins {stats['hedge_wins']}")
+
+
+if __name__ == "__main__":
+    main()
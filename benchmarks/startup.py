@@ -0,0 +1,105 @@
+# startup.py - بنچمارک زمان شروع سرد و هزینه importها
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_PATH = os.path.join(ROOT, "benchmarks", "startup_history.jsonl")
+
+# ماژول‌هایی که در شروع سرد worker بارگذاری می‌شوند
+TARGETS = {
+    "core.conversation": "import core.conversation",
+    "core.audio_manager": "import core.audio_manager",
+    "session_create": "from core.conversation import NegotiationSession; NegotiationSession('bench')",
+}
+
+
+def measure_wall(statement: str, repeats: int) -> float:
+    """میانه زمان اجرای یک مفسر تازه برای دستور داده شده (میلی‌ثانیه)"""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=ROOT, check=True)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def profile_imports(statement: str, top: int = 10) -> List[Dict]:
+    """پرهزینه‌ترین importها براساس خروجی -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    entries.sort(key=lambda e: e["cumulative_us"], reverse=True)
+    return entries[:top]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def load_history() -> List[Dict]:
+    if not os.path.exists(HISTORY_PATH):
+        return []
+    with open(HISTORY_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک شروع سرد")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--record", action="store_true", help="افزودن نتیجه به تاریخچه")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="حداکثر افزایش نسبی مجاز نسبت به آخرین رکورد")
+    args = parser.parse_args()
+
+    baseline = measure_wall("pass", args.repeats)
+    results = {}
+    for name, statement in TARGETS.items():
+        results[name] = round(measure_wall(statement, args.repeats) - baseline, 1)
+        print(f"{name:24s} {results[name]:8.1f} ms")
+
+    print("\nslowest imports (session_create):")
+    for entry in profile_imports(TARGETS["session_create"]):
+        print(f"  {entry['cumulative_us'] / 1000:8.1f} ms  {entry['module']}")
+
+    history = load_history()
+    regressions = []
+    if history:
+        previous = history[-1]["results_ms"]
+        for name, value in results.items():
+            if name in previous and value > previous[name] * (1 + args.max_regression) + 5:
+                regressions.append(f"{name}: {previous[name]} -> {value} ms")
+
+    if args.record:
+        with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "revision": git_revision(),
+                "python": sys.version.split()[0],
+                "results_ms": results
+            }) + "\n")
+
+    if regressions:
+        print("\nregressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
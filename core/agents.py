@@ -3,9 +3,127 @@
 from typing import Dict, List, Optional, Tuple
 from enum import Enum
 import json
-from langchain_openai import ChatOpenAI
-from abc import ABC, abstractmethod
+import math
+import os
+import re
 import time
+from abc import ABC
+from .amounts import extract_amounts
+from .llm import get_shared_client, client_backend
+from .clock import Clock, SYSTEM_CLOCK
+from .persistent import PersistentList
+from .generation_profiles import GenerationProfile, TEXT_PROFILE
+from .prompts import (
+    normalize_prompt, make_message, system_message, state_line,
+    count_tokens, state_line_tokens
+)
+from .rate_limiter import (
+    RequestPriority, RateLimitExceeded, get_rate_limiter, get_coalescer,
+    estimate_tokens, retry_after_from_error
+)
+
+# حداکثر تلاش مجدد پس از دریافت 429
+MAX_RATE_LIMIT_RETRIES = 3
+
+# اسلات‌هایی که بین یک عامل و fork آن مشترک می‌مانند و در checkpoint نمی‌آیند
+FORK_SHARED_SLOTS = ("api_key", "usage", "clock", "persona", "skill", "checkpoints")
+
+_agent_slots: Dict[type, Tuple[str, ...]] = {}
+
+
+def agent_slots(cls: type) -> Tuple[str, ...]:
+    """همه اسلات‌های یک کلاس عامل و والدهایش (یک بار محاسبه و کش)"""
+    slots = _agent_slots.get(cls)
+    if slots is None:
+        slots = tuple(slot for klass in reversed(cls.__mro__) for slot in getattr(klass, "__slots__", ()))
+        _agent_slots[cls] = slots
+    return slots
+
+# پاسخ ساختاریافته عوامل: متن پاسخ به همراه توافق، پیشنهاد و احساس در همان فراخوانی
+AGENT_REPLY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "reply": {"type": "string", "description": "متن پاسخ شما به فارسی، همان‌طور که به بنیان‌گذار گفته می‌شود"},
+        "agrees": {"type": "boolean", "description": "آیا با پیشنهاد فعلی بنیان‌گذار موافقت می‌کنید"},
+        "proposed_investment": {"type": ["number", "null"], "description": "مبلغ سرمایه پیشنهادی شما به تومان، در صورت وجود"},
+        "proposed_equity": {"type": ["number", "null"], "description": "درصد سهام پیشنهادی شما، در صورت وجود"},
+        "sentiment": {"type": "string", "enum": ["positive", "neutral", "negative"]}
+    },
+    "required": ["reply", "agrees", "proposed_investment", "proposed_equity", "sentiment"],
+    "additionalProperties": False
+}
+
+STRUCTURED_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "agent_reply", "strict": True, "schema": AGENT_REPLY_SCHEMA}
+}
+
+
+# فیلدهای کامل‌شده JSON ناقص (پاسخی که به سقف max_tokens خورده است)
+_PARTIAL_REPLY = re.compile(r'^\s*\{\s*"reply"\s*:\s*"((?:[^"\\]|\\.)*)')
+_PARTIAL_AGREES = re.compile(r'"agrees"\s*:\s*(true|false)')
+_UNFINISHED_ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{0,3})?$')
+
+
+def truncated_reply(content: str) -> str:
+    """متن قابل نمایش از خروجی؛ از JSON بریده‌شده فقط بخش reply نگه داشته می‌شود"""
+    match = _PARTIAL_REPLY.match(content or "")
+    if match is None:
+        return content
+    # گریز ناتمام انتهای متن (مثل \ یا \u06) حذف می‌شود
+    text = _UNFINISHED_ESCAPE.sub("", match.group(1))
+    try:
+        return json.loads(f'"{text}"')
+    except ValueError:
+        return text
+
+
+def reply_number(value) -> Optional[float]:
+    """عدد فیلدهای proposed_*؛ مدلی که response_format را رعایت نکند ممکن است "20%" یا
+    "۵۰ میلیارد تومان" برگرداند. متنی که دقیقا یک مقدار دارد تبدیل و بقیه None می‌شوند.
+
+    >>> reply_number(50000000000), reply_number("20%"), reply_number("۵۰ میلیارد تومان")
+    (50000000000, 20, 50000000000)
+    >>> reply_number(True), reply_number("بین ۱۰ تا ۲۰ درصد"), reply_number(float("nan"))
+    (None, None, None)
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value if math.isfinite(value) else None
+    if isinstance(value, str):
+        amounts = extract_amounts(value)
+        return amounts[0]["value"] if len(amounts) == 1 else None
+    return None
+
+
+def parse_agent_reply(content: str) -> Dict:
+    """تبدیل خروجی مدل به پاسخ ساختاریافته؛ متن غیر JSON به عنوان پاسخ ساده پذیرفته می‌شود"""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        data = None
+
+    if not isinstance(data, dict) or not isinstance(data.get("reply"), str):
+        # JSON بریده‌شده: متن reply و در صورت کامل شدن، agrees حفظ می‌شوند؛ بقیه فیلدها از دست می‌روند
+        agrees = _PARTIAL_AGREES.search(content or "") if _PARTIAL_REPLY.match(content or "") else None
+        return {"reply": truncated_reply(content), "agrees": agrees.group(1) == "true" if agrees else None,
+                "proposed_investment": None, "proposed_equity": None, "sentiment": None}
+
+    return {
+        "reply": data["reply"],
+        "agrees": data.get("agrees") if isinstance(data.get("agrees"), bool) else None,
+        "proposed_investment": reply_number(data.get("proposed_investment")),
+        "proposed_equity": reply_number(data.get("proposed_equity")),
+        "sentiment": data.get("sentiment")
+    }
+
+# بازخوردهای ثابت ارزیاب؛ صدای آن‌ها از پیش در phrase_bank ساخته می‌شود
+EVALUATOR_FEEDBACK = {
+    "technical": "استفاده خوب از اصطلاحات فنی و مالی",
+    "negative_emotions": "سعی کنید کمتر از کلمات منفی استفاده کنید",
+    "needs_data": "پاسخ‌های خود را با داده‌های بیشتری پشتیبانی کنید"
+}
 
 
 class AgentRole(Enum):
@@ -13,6 +131,7 @@ class AgentRole(Enum):
     RISKY_INVESTOR = "risky_investor"
     COMPETITOR = "competitor"
     EVALUATOR = "evaluator"
+    FOUNDER = "founder"
 
 
 class AgentState(Enum):
@@ -23,55 +142,187 @@ class AgentState(Enum):
     DEFENSIVE = "defensive"
 
 
+class Persona:
+    """تعریف تغییرناپذیر یک عامل که بین همه جلسات مشترک است"""
+
+    __slots__ = ("name", "role", "system_prompt", "keywords")
+
+    def __init__(self, name: str, role: AgentRole, system_prompt: str,
+                 keywords: Optional[Dict[str, Tuple[str, ...]]] = None):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "role", role)
+        object.__setattr__(self, "system_prompt", normalize_prompt(system_prompt))
+        object.__setattr__(self, "keywords", {k: tuple(v) for k, v in (keywords or {}).items()})
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Persona تغییرناپذیر است")
+
+    def __reduce__(self):
+        return Persona, (self.name, self.role, self.system_prompt, self.keywords)
+
+    @property
+    def prompt_tokens(self) -> int:
+        """تعداد توکن پرامپت سیستم (محاسبه یک بار و کش)"""
+        return count_tokens(self.system_prompt)
+
+
 class Agent(ABC):
-    """کلاس پایه برای همه عوامل"""
+    """کلاس پایه برای همه عوامل
+
+    بخش‌های سنگین (پرامپت، کلمات کلیدی و کلاینت) در persona و مخزن کلاینت
+    مشترک نگه داشته می‌شوند و هر نمونه فقط وضعیت قابل تغییر جلسه را دارد.
+    """
+
+    persona: Persona
 
-    def __init__(self, name: str, role: AgentRole, api_key: str):
-        self.name = name
-        self.role = role
+    # قالب خروجی مدل؛ None یعنی متن ساده
+    response_format: Optional[Dict] = STRUCTURED_RESPONSE_FORMAT
+
+    __slots__ = ("api_key", "state", "satisfaction_level", "conversation_history", "notes", "last_reply", "usage")
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
         self.state = AgentState.NEUTRAL
-        self.conversation_history: List[Dict] = []
-        self.client = ChatOpenAI(model="gpt-4o-mini", base_url="https://api.avalai.ir/v1",api_key=api_key,temperature=0.7,                max_tokens=300)
+        self.conversation_history: PersistentList = PersistentList()
         self.satisfaction_level = 50  # 0-100
-        self.notes: List[str] = []
+        self.notes: PersistentList = PersistentList()
+        self.last_reply: Optional[Dict] = None
+        # دفتر مصرف جلسه؛ ConversationManager آن را تنظیم می‌کند
+        self.usage = None
+
+    @property
+    def name(self) -> str:
+        return self.persona.name
+
+    @property
+    def role(self) -> AgentRole:
+        return self.persona.role
+
+    @property
+    def client(self):
+        """کلاینت مشترک از مخزن؛ در اولین فراخوانی ساخته می‌شود"""
+        return get_shared_client(self.api_key)
 
-    @abstractmethod
     def get_system_prompt(self) -> str:
         """پرامپت سیستم برای هر عامل"""
-        pass
+        return self.persona.system_prompt
+
+    def generate_response(self, user_message: str, context: Dict,
+                          priority: RequestPriority = RequestPriority.INTERACTIVE) -> str:
+        """تولید پاسخ براساس پیام کاربر و زمینه
 
-    def generate_response(self, user_message: str, context: Dict) -> str:
-        """تولید پاسخ براساس پیام کاربر و زمینه"""
+        متن پاسخ برگردانده می‌شود و نسخه ساختاریافته آن در last_reply می‌ماند.
+        بودجه تولید از generation_profile زمینه خوانده می‌شود (پیش‌فرض: حالت متنی).
+        """
+        self.last_reply = None
+        profile = context.get("generation_profile") or TEXT_PROFILE
 
-        # به‌روزرسانی تاریخچه مکالمه
-        self.conversation_history.append({"role": "user", "content": user_message})
+        # به‌روزرسانی تاریخچه مکالمه؛ پیام‌ها از ابتدا در قالب بومی کلاینت ساخته می‌شوند
+        backend = client_backend()
+        self.conversation_history.append(make_message(backend, "user", user_message))
 
-        # آماده‌سازی پرامپت با زمینه
+        # آماده‌سازی پرامپت با پیام‌های سیستم و وضعیت از پیش ساخته‌شده
         messages = [
-            {"role": "system", "content": self.get_system_prompt()},
-            {"role": "system",
-             "content": f"Current state: {self.state.value}\nSatisfaction: {self.satisfaction_level}%"}
+            system_message(backend, self.persona.system_prompt),
+            state_line(backend, self.state.value, self.satisfaction_level)
         ]
-        messages.extend(self.conversation_history[-10:])  # حداکثر 10 پیام آخر
-
-        # فراخوانی API
+        if profile.directive:
+            messages.append(system_message(backend, profile.directive))
+        history_tail = self.conversation_history[-10:]  # حداکثر 10 پیام آخر
+        messages.extend(history_tail)
+
+        estimated_tokens = (self.persona.prompt_tokens
+                            + state_line_tokens(self.state.value, self.satisfaction_level)
+                            + profile.directive_tokens
+                            + estimate_tokens(history_tail)
+                            + profile.max_tokens)
+
+        # فراخوانی API با رعایت محدودیت نرخ سراسری
+        started = time.perf_counter()
         try:
-            response = self.client.invoke(
-                messages,
-
-            )
-
-            ai_response = response.content
-            self.conversation_history.append({"role": "assistant", "content": ai_response})
-
-            # به‌روزرسانی وضعیت براساس پاسخ
-            self.update_state(user_message, ai_response)
-
-            return ai_response
-
+            response = self._invoke_with_rate_limit(messages, estimated_tokens, priority, profile)
+        except RateLimitExceeded:
+            # پیام کاربر را برمی‌گردانیم تا تلاش مجدد تکراری ثبت نشود
+            self.conversation_history.pop()
+            raise
         except Exception as e:
             return f"خطا در تولید پاسخ: {str(e)}"
 
+        if self.usage is not None:
+            usage = getattr(response, "usage_metadata", None) or {}
+            self.usage.record("llm", self.role.value, context.get("current_phase"),
+                              input_tokens=usage.get("input_tokens") or 0,
+                              output_tokens=usage.get("output_tokens") or 0,
+                              latency=time.perf_counter() - started)
+
+        self.last_reply = parse_agent_reply(response.content)
+        ai_response = self.last_reply["reply"]
+        self.conversation_history.append(make_message(backend, "assistant", ai_response))
+
+        # به‌روزرسانی وضعیت براساس پاسخ
+        self.update_state(user_message, ai_response)
+
+        return ai_response
+
+    def _invoke_with_rate_limit(self, messages: List, estimated: int, priority: RequestPriority,
+                                profile: GenerationProfile = TEXT_PROFILE):
+        """فراخوانی مدل از طریق صف اولویت‌دار و مدیریت ساختاریافته 429"""
+        limiter = get_rate_limiter()
+        # بودجه در هر فراخوانی فرستاده می‌شود تا همه پروفایل‌ها از یک کلاینت مشترک استفاده کنند
+        invoke_kwargs = {"max_tokens": profile.max_tokens, "temperature": profile.temperature}
+        if self.response_format is not None and os.getenv("LLM_STRUCTURED_OUTPUT", "1") == "1":
+            invoke_kwargs["response_format"] = self.response_format
+        key = get_coalescer().make_key(messages, **invoke_kwargs)
+
+        for attempt in range(MAX_RATE_LIMIT_RETRIES):
+            limiter.acquire(estimated, priority)
+            try:
+                response = get_coalescer().run(key, lambda: self.client.invoke(messages, **invoke_kwargs))
+            except Exception as e:
+                retry_after = retry_after_from_error(e)
+                if retry_after is None:
+                    raise
+                limiter.block_for(retry_after)
+                if attempt == MAX_RATE_LIMIT_RETRIES - 1:
+                    raise RateLimitExceeded(f"محدودیت نرخ سرویس LLM: {str(e)}", retry_after=retry_after)
+                continue
+
+            usage = getattr(response, "usage_metadata", None) or {}
+            if usage.get("total_tokens"):
+                limiter.record_usage(estimated, usage["total_tokens"])
+            return response
+
+    def checkpoint(self) -> Dict:
+        """وضعیت قابل تغییر عامل؛ از فهرست‌های پایا فقط طول ذخیره می‌شود"""
+        state = {}
+        for slot in agent_slots(type(self)):
+            if slot in FORK_SHARED_SLOTS:
+                continue
+            value = getattr(self, slot)
+            if isinstance(value, PersistentList):
+                state[slot] = len(value)
+            elif isinstance(value, dict):
+                state[slot] = dict(value)
+            else:
+                state[slot] = value
+        return state
+
+    def fork(self, checkpoint: Optional[Dict] = None) -> "Agent":
+        """نسخه مستقل عامل در وضعیت checkpoint؛ تاریخچه‌ها بدون کپی مشترک می‌مانند"""
+        checkpoint = self.checkpoint() if checkpoint is None else checkpoint
+        clone = object.__new__(type(self))
+        for slot in agent_slots(type(self)):
+            value = getattr(self, slot)
+            if slot not in checkpoint:
+                setattr(clone, slot, value)
+            elif isinstance(value, PersistentList):
+                setattr(clone, slot, value.fork(checkpoint[slot]))
+            elif isinstance(value, dict):
+                setattr(clone, slot, dict(checkpoint[slot]))
+            else:
+                setattr(clone, slot, checkpoint[slot])
+        return clone
+
     def update_state(self, user_message: str, ai_response: str):
         """به‌روزرسانی وضعیت عامل براساس مکالمه"""
         # این متد در کلاس‌های فرزند با منطق خاص هر عامل پیاده‌سازی می‌شود
@@ -81,18 +332,7 @@ class Agent(ABC):
 class ConservativeInvestor(Agent):
     """سرمایه‌گذار محتاط - آقای محمدی"""
 
-    def __init__(self, api_key: str):
-        super().__init__("آقای محمدی", AgentRole.CONSERVATIVE_INVESTOR, api_key)
-        self.required_metrics = {
-            "cac": False,  # Cost of Customer Acquisition
-            "ltv": False,  # Lifetime Value
-            "burn_rate": False,
-            "market_share": False,
-            "risk_assessment": False
-        }
-
-    def get_system_prompt(self) -> str:
-        return """شما آقای محمدی، یک سرمایه‌گذار محتاط با ۲۰ سال تجربه در سرمایه‌گذاری فناوری هستید.
+    persona = Persona("آقای محمدی", AgentRole.CONSERVATIVE_INVESTOR, """شما آقای محمدی، یک سرمایه‌گذار محتاط با ۲۰ سال تجربه در سرمایه‌گذاری فناوری هستید.
 
 ویژگی‌های شما:
 - بسیار دقیق و جزئی‌نگر هستید
@@ -104,13 +344,27 @@ class ConservativeInvestor(Agent):
 - درباره مدل مالی، هزینه‌ها و درآمدها سوال کنید
 - اگر پاسخ‌ها مبهم باشند، سخت‌گیرتر شوید
 - اگر اعداد دقیق ارائه شود، نرم‌تر برخورد کنید
-- در صورت نبود برنامه مشخص، تمایل به سرمایه‌گذاری را از دست دهید"""
+- در صورت نبود برنامه مشخص، تمایل به سرمایه‌گذاری را از دست دهید""", {
+        "financial": ["cac", "ltv", "هزینه", "درآمد", "سود", "بازگشت سرمایه", "roi"]
+    })
+
+    __slots__ = ("required_metrics",)
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key)
+        self.required_metrics = {
+            "cac": False,  # Cost of Customer Acquisition
+            "ltv": False,  # Lifetime Value
+            "burn_rate": False,
+            "market_share": False,
+            "risk_assessment": False
+        }
 
     def update_state(self, user_message: str, ai_response: str):
         """به‌روزرسانی وضعیت براساس کیفیت پاسخ‌های مالی"""
 
         # بررسی کلمات کلیدی مالی در پاسخ کاربر
-        financial_keywords = ["cac", "ltv", "هزینه", "درآمد", "سود", "بازگشت سرمایه", "roi"]
+        financial_keywords = self.persona.keywords["financial"]
         has_numbers = any(char.isdigit() for char in user_message)
         has_financial_terms = any(keyword in user_message.lower() for keyword in financial_keywords)
 
@@ -127,13 +381,7 @@ class ConservativeInvestor(Agent):
 class RiskyInvestor(Agent):
     """سرمایه‌گذار ریسک‌پذیر - خانم اکبری"""
 
-    def __init__(self, api_key: str):
-        super().__init__("خانم اکبری", AgentRole.RISKY_INVESTOR, api_key)
-        self.innovation_score = 0
-        self.vision_clarity = 0
-
-    def get_system_prompt(self) -> str:
-        return """شما خانم اکبری، یک سرمایه‌گذار ریسک‌پذیر و علاقه‌مند به نوآوری هستید.
+    persona = Persona("خانم اکبری", AgentRole.RISKY_INVESTOR, """شما خانم اکبری، یک سرمایه‌گذار ریسک‌پذیر و علاقه‌مند به نوآوری هستید.
 
 ویژگی‌های شما:
 - به دنبال ایده‌های نوآورانه و disruptive هستید
@@ -145,13 +393,23 @@ class RiskyInvestor(Agent):
 - درباره نوآوری و تمایز از رقبا سوال کنید
 - به دنبال چشم‌انداز ۵ ساله و پتانسیل جهانی باشید
 - اگر ایده کپی باشد، علاقه خود را از دست دهید
-- از پاسخ‌های خلاقانه و آینده‌نگرانه استقبال کنید"""
+- از پاسخ‌های خلاقانه و آینده‌نگرانه استقبال کنید""", {
+        "innovation": ["نوآوری", "جدید", "متفاوت", "انقلاب", "تغییر", "آینده", "هوش مصنوعی"],
+        "vision": ["چشم‌انداز", "جهانی", "رشد", "توسعه", "بازار", "میلیون", "میلیارد"]
+    })
+
+    __slots__ = ("innovation_score", "vision_clarity")
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key)
+        self.innovation_score = 0
+        self.vision_clarity = 0
 
     def update_state(self, user_message: str, ai_response: str):
         """به‌روزرسانی وضعیت براساس میزان نوآوری و چشم‌انداز"""
 
-        innovation_keywords = ["نوآوری", "جدید", "متفاوت", "انقلاب", "تغییر", "آینده", "هوش مصنوعی"]
-        vision_keywords = ["چشم‌انداز", "جهانی", "رشد", "توسعه", "بازار", "میلیون", "میلیارد"]
+        innovation_keywords = self.persona.keywords["innovation"]
+        vision_keywords = self.persona.keywords["vision"]
 
         has_innovation = any(keyword in user_message.lower() for keyword in innovation_keywords)
         has_vision = any(keyword in user_message.lower() for keyword in vision_keywords)
@@ -173,12 +431,7 @@ class RiskyInvestor(Agent):
 class Competitor(Agent):
     """استارتاپ رقیب - آقای رضایی"""
 
-    def __init__(self, api_key: str):
-        super().__init__("آقای رضایی", AgentRole.COMPETITOR, api_key)
-        self.aggression_level = 50
-
-    def get_system_prompt(self) -> str:
-        return """شما آقای رضایی، بنیان‌گذار یک استارتاپ رقیب با ۳۰ میلیون کاربر هستید.
+    persona = Persona("آقای رضایی", AgentRole.COMPETITOR, """شما آقای رضایی، بنیان‌گذار یک استارتاپ رقیب با ۳۰ میلیون کاربر هستید.
 
 ویژگی‌های شما:
 - رقابتی و چالش‌برانگیز هستید
@@ -190,13 +443,22 @@ class Competitor(Agent):
 - ادعاهای رقیب را به چالش بکشید
 - از موفقیت‌ها و تجربه خود بگویید
 - اگر پاسخ‌های قوی بشنوید، کمی عقب بنشینید
-- در صورت ضعف رقیب، تهاجمی‌تر شوید"""
+- در صورت ضعف رقیب، تهاجمی‌تر شوید""", {
+        "defensive": ["اما", "ولی", "شاید", "فکر می‌کنم", "احتمالا"],
+        "strong": ["قطعا", "مطمئن", "ثابت شده", "داده‌ها نشان", "تجربه کرده‌ایم"]
+    })
+
+    __slots__ = ("aggression_level",)
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key)
+        self.aggression_level = 50
 
     def update_state(self, user_message: str, ai_response: str):
         """به‌روزرسانی وضعیت براساس قدرت پاسخ‌های رقیب"""
 
-        defensive_keywords = ["اما", "ولی", "شاید", "فکر می‌کنم", "احتمالا"]
-        strong_keywords = ["قطعا", "مطمئن", "ثابت شده", "داده‌ها نشان", "تجربه کرده‌ایم"]
+        defensive_keywords = self.persona.keywords["defensive"]
+        strong_keywords = self.persona.keywords["strong"]
 
         is_defensive = any(keyword in user_message.lower() for keyword in defensive_keywords)
         is_strong = any(keyword in user_message.lower() for keyword in strong_keywords)
@@ -213,19 +475,7 @@ class Competitor(Agent):
 class Evaluator(Agent):
     """ارزیاب مذاکره - دکتر کریمی"""
 
-    def __init__(self, api_key: str):
-        super().__init__("دکتر کریمی", AgentRole.EVALUATOR, api_key)
-        self.evaluation_metrics = {
-            "technical_knowledge": 0,
-            "communication_skills": 0,
-            "negotiation_intelligence": 0,
-            "emotional_control": 0,
-            "creativity": 0
-        }
-        self.feedback_points: List[Dict] = []
-
-    def get_system_prompt(self) -> str:
-        return """شما دکتر کریمی، یک ارزیاب حرفه‌ای مذاکره با ۱۵ سال تجربه هستید.
+    persona = Persona("دکتر کریمی", AgentRole.EVALUATOR, """شما دکتر کریمی، یک ارزیاب حرفه‌ای مذاکره با ۱۵ سال تجربه هستید.
 
         وظایف شما:
         - ارزیابی عملکرد شرکت‌کننده در جلسه
@@ -237,21 +487,39 @@ class Evaluator(Agent):
         - به جزئیات رفتاری توجه کنید
         - زمان پاسخ‌ها را در نظر بگیرید
         - کیفیت استدلال‌ها را بررسی کنید
-        - نحوه مدیریت فشار را ارزیابی کنید"""
+        - نحوه مدیریت فشار را ارزیابی کنید""", {
+        "technical": ["roi", "cac", "ltv", "بازار", "رشد", "هزینه", "درآمد"],
+        "negative_emotions": ["ولی", "اما", "نه", "نمی‌توانم", "مشکل"]
+    })
 
+    __slots__ = ("evaluation_metrics", "feedback_points", "clock", "checkpoints")
+
+    def __init__(self, api_key: str, clock: Optional[Clock] = None):
+        super().__init__(api_key)
+        self.clock = clock or SYSTEM_CLOCK
+        self.evaluation_metrics = {
+            "technical_knowledge": 0,
+            "communication_skills": 0,
+            "negotiation_intelligence": 0,
+            "emotional_control": 0,
+            "creativity": 0
+        }
+        self.feedback_points: PersistentList = PersistentList()
+        # checkpoints[n] وضعیت پس از n ارزیابی است؛ ارزیابی ناهم‌زمان است و نوبت‌ها آن را ثبت نمی‌کنند
+        self.checkpoints: PersistentList = PersistentList([self.checkpoint()])
 
     def evaluate_response(self, user_message: str, agent_responses: Dict[str, str]) -> Dict:
         """ارزیابی پاسخ کاربر به عوامل مختلف"""
 
         evaluation = {
-            "timestamp": time.time(),
+            "timestamp": self.clock.time(),
             "user_message": user_message,
             "feedback": "",
             "scores": {}
         }
 
         # ارزیابی دانش فنی
-        technical_terms = ["roi", "cac", "ltv", "بازار", "رشد", "هزینه", "درآمد"]
+        technical_terms = self.persona.keywords["technical"]
         technical_score = sum(1 for term in technical_terms if term in user_message.lower())
         self.evaluation_metrics["technical_knowledge"] += technical_score
 
@@ -260,22 +528,35 @@ class Evaluator(Agent):
             self.evaluation_metrics["communication_skills"] += 1
 
         # ارزیابی کنترل احساسات
-        negative_emotions = ["ولی", "اما", "نه", "نمی‌توانم", "مشکل"]
+        negative_emotions = self.persona.keywords["negative_emotions"]
         emotional_control = sum(1 for word in negative_emotions if word in user_message.lower())
         if emotional_control < 2:
             self.evaluation_metrics["emotional_control"] += 1
 
         # تولید بازخورد
         if technical_score > 2:
-            evaluation["feedback"] = "استفاده خوب از اصطلاحات فنی و مالی"
+            evaluation["feedback"] = EVALUATOR_FEEDBACK["technical"]
         elif emotional_control > 2:
-            evaluation["feedback"] = "سعی کنید کمتر از کلمات منفی استفاده کنید"
+            evaluation["feedback"] = EVALUATOR_FEEDBACK["negative_emotions"]
         else:
-            evaluation["feedback"] = "پاسخ‌های خود را با داده‌های بیشتری پشتیبانی کنید"
+            evaluation["feedback"] = EVALUATOR_FEEDBACK["needs_data"]
         #evaluation["feedback"]+=str(agent_responses)
         self.feedback_points.append(evaluation)
+        self.checkpoints.append(self.checkpoint())
         return evaluation
 
+    @property
+    def evaluations(self) -> int:
+        """تعداد نوبت‌های ارزیابی‌شده"""
+        return len(self.checkpoints) - 1
+
+    def fork_at(self, evaluations: int) -> "Evaluator":
+        """نسخه مستقل ارزیاب در وضعیت پس از evaluations ارزیابی"""
+        evaluations = min(evaluations, self.evaluations)
+        clone = self.fork(self.checkpoints[evaluations])
+        clone.checkpoints = self.checkpoints.fork(evaluations + 1)
+        return clone
+
     def generate_final_report(self) -> Dict:
         """تولید گزارش نهایی ارزیابی"""
 
@@ -308,7 +589,7 @@ class Evaluator(Agent):
             "strengths": self._identify_strengths(),
             "weaknesses": self._identify_weaknesses(),
             "recommendations": self._generate_recommendations(),
-            "feedback_history": self.feedback_points
+            "feedback_history": list(self.feedback_points)
         }
 
         return report
@@ -367,4 +648,56 @@ class Evaluator(Agent):
         recommendations.append("تمرین با سناریوهای مختلف برای افزایش اعتماد به نفس")
         recommendations.append("مطالعه موردی مذاکرات موفق در صنعت")
 
-        return recommendations
\ No newline at end of file
+        return recommendations
+
+
+class FounderSkill(Enum):
+    NOVICE = "novice"
+    INTERMEDIATE = "intermediate"
+    EXPERT = "expert"
+
+
+FOUNDER_PROMPT = """شما بنیان‌گذار یک استارتاپ EdTech هستید که در جلسه جذب سرمایه شرکت کرده‌اید.
+هدف شما جذب ۵۰ میلیارد تومان سرمایه در برابر حداکثر ۳۰ درصد سهام است.
+پیام‌هایی که دریافت می‌کنید صحبت‌های سرمایه‌گذاران، رقیب و مدیر جلسه است.
+
+قواعد:
+- فقط به فارسی و در یک تا سه جمله پاسخ دهید
+- فقط متن صحبت خودتان را بنویسید، بدون نام گوینده یا توضیح اضافه
+- در مرحله مذاکره نهایی، مبلغ سرمایه و درصد سهام مشخصی پیشنهاد دهید"""
+
+FOUNDER_SKILL_PROMPTS = {
+    FounderSkill.NOVICE: """سطح مهارت شما: تازه‌کار
+- پاسخ‌هایتان کلی و بدون عدد است
+- زیر فشار سوال‌ها کمی دفاعی و احساسی می‌شوید
+- شاخص‌هایی مثل CAC و LTV را به خوبی نمی‌شناسید""",
+    FounderSkill.INTERMEDIATE: """سطح مهارت شما: متوسط
+- گاهی از اعداد و شاخص‌های مالی استفاده می‌کنید اما همیشه دقیق نیستید
+- چشم‌انداز روشنی دارید ولی به ریسک‌ها کمتر می‌پردازید""",
+    FounderSkill.EXPERT: """سطح مهارت شما: حرفه‌ای
+- با اعداد دقیق (CAC، LTV، نرخ سوخت، سهم بازار) پاسخ می‌دهید
+- آرام و مطمئن هستید و اعتراض‌ها را با داده پاسخ می‌دهید
+- از تمایز محصول و چشم‌انداز رشد جهانی صحبت می‌کنید و در مذاکره سهام کمتری واگذار می‌کنید"""
+}
+
+# persona هر سطح مهارت یک بار ساخته و بین همه جلسات خودکار مشترک می‌شود
+FOUNDER_PERSONAS = {
+    skill: Persona("بنیان‌گذار", AgentRole.FOUNDER, f"{FOUNDER_PROMPT}\n\n{skill_prompt}")
+    for skill, skill_prompt in FOUNDER_SKILL_PROMPTS.items()
+}
+
+
+class FounderAgent(Agent):
+    """بنیان‌گذار مصنوعی برای اجرای خودکار جلسات (self-play)
+
+    ورودی آن صحبت‌های عوامل در نوبت قبل و خروجی آن پیام کاربر در نوبت بعد است.
+    """
+
+    response_format = None
+
+    __slots__ = ("skill", "persona")
+
+    def __init__(self, api_key: str, skill: FounderSkill = FounderSkill.INTERMEDIATE):
+        super().__init__(api_key)
+        self.skill = skill
+        self.persona = FOUNDER_PERSONAS[skill]
@@ -0,0 +1,114 @@
+# amounts.py - استخراج مبلغ و درصد از متن فارسی و انگلیسی
+
+import re
+from typing import Dict, List, Optional
+
+SCALE_WORDS = {
+    "هزار": 1_000,
+    "میلیون": 1_000_000,
+    "میلیارد": 1_000_000_000,
+    "تریلیون": 1_000_000_000_000,
+    "thousand": 1_000,
+    "million": 1_000_000,
+    "billion": 1_000_000_000,
+    "trillion": 1_000_000_000_000,
+}
+
+PERCENT_UNITS = {"درصد", "%", "٪", "percent"}
+# ضریب تبدیل هر واحد پول به تومان
+CURRENCY_UNITS = {"تومان": 1, "تومن": 1, "toman": 1, "ریال": 0.1, "rial": 0.1}
+
+# مبلغ‌های بدون واحد پول (با یا بدون هزار/میلیون/...) فقط از این مقدار به بالا مبلغ سرمایه‌اند؛
+# «۲ میلیون کاربر» یا «۳۰ هزار مدرسه» مبلغ نیستند
+BARE_MONEY_THRESHOLD = 1_000_000_000
+
+# درصد فقط وقتی سهام است که یکی از این کلمات بین آن و مبلغ مجاور (حداکثر EQUITY_WINDOW نویسه) بیاید؛
+# «سهم بازار» یا «درصد رشد» سهام نیستند
+_EQUITY_PATTERN = re.compile(r"سهام|(?i:equity|stake)")
+EQUITY_WINDOW = 20
+
+# \d در الگوهای یونیکد ارقام فارسی و عربی را هم می‌پذیرد و float آن‌ها را مستقیم تبدیل می‌کند،
+# پس نیازی به تبدیل کل متن نیست؛ فقط کلمات انگلیسی حساس به حروف نیستند
+_AMOUNT_PATTERN = re.compile(
+    r"(?<![\d.٫])"
+    r"(?P<number>\d{1,3}(?:[,٬]\d{3})+(?:[.٫]\d+)?|\d+(?:[.٫]\d+)?)"
+    r"(?P<scales>(?:\s*(?:هزار|میلیون|میلیارد|تریلیون|(?i:thousand|million|billion|trillion)))*)"
+    r"\s*(?P<unit>درصد|تومان|تومن|ریال|%|٪|(?i:percent|toman|rial))?"
+)
+_SCALE_PATTERN = re.compile(r"هزار|میلیون|میلیارد|تریلیون|(?i:thousand|million|billion|trillion)")
+_NUMBER_CLEANUP = str.maketrans({",": None, "٬": None, "٫": "."})
+
+
+def extract_amounts(text: str) -> List[Dict]:
+    """استخراج همه مبالغ و درصدها در یک گذر
+
+    خروجی فهرستی از {"kind": "money" | "scaled" | "percent" | "number", "value": ..., "start": ..., "end": ...}
+    است؛ money فقط مبلغ با واحد پول است و به تومان برگردانده می‌شود. scaled عدد با هزار/میلیون/... بدون واحد است.
+    """
+    amounts = []
+    for match in _AMOUNT_PATTERN.finditer(text):
+        number, scales, unit = match.group("number", "scales", "unit")
+        unit = unit or ""
+        value = float(number.translate(_NUMBER_CLEANUP))
+
+        if scales:
+            for scale in _SCALE_PATTERN.findall(scales):
+                value *= SCALE_WORDS[scale.lower()]
+
+        unit = unit.lower()
+        if unit in PERCENT_UNITS:
+            kind = "percent"
+        elif unit in CURRENCY_UNITS:
+            kind = "money"
+            value *= CURRENCY_UNITS[unit]
+        elif scales:
+            kind = "scaled"
+        else:
+            kind = "number"
+
+        amounts.append({"kind": kind, "value": int(value) if value.is_integer() else value,
+                        "start": match.start(), "end": match.end()})
+    return amounts
+
+
+def _mentions_equity(text: str, amounts: List[Dict], index: int) -> bool:
+    """آیا کلمه سهام در فاصله بین این درصد و مبلغ‌های قبلی و بعدی آن آمده است"""
+    amount = amounts[index]
+    before_start = amounts[index - 1]["end"] if index > 0 else 0
+    after_end = amounts[index + 1]["start"] if index + 1 < len(amounts) else len(text)
+    before = text[max(before_start, amount["start"] - EQUITY_WINDOW):amount["start"]]
+    after = text[amount["end"]:min(after_end, amount["end"] + EQUITY_WINDOW)]
+    return bool(_EQUITY_PATTERN.search(before) or _EQUITY_PATTERN.search(after))
+
+
+def extract_deal_terms(text: str) -> Dict[str, Optional[float]]:
+    """مبلغ سرمایه و درصد سهام ذکرشده در متن
+
+    مبلغ با واحد پول بر عدد بدون واحد مقدم است و از هر گروه آخرین مورد انتخاب می‌شود؛
+    عدد بدون واحد فقط از BARE_MONEY_THRESHOLD به بالا. درصد فقط در کنار سهام/equity.
+
+    >>> extract_deal_terms("۵۰ میلیارد تومان برای ۲۰ درصد سهام، با ۲ میلیون کاربر فعال")
+    {'investment': 50000000000, 'equity': 20}
+    >>> extract_deal_terms("۳۰ هزار مدرسه و ۱۵ درصد سهم بازار داریم")
+    {'investment': None, 'equity': None}
+    >>> extract_deal_terms("۴۵ میلیارد در ازای سهام ۲۵٪ و ۴۰ درصد رشد سالانه")
+    {'investment': 45000000000, 'equity': 25}
+    >>> extract_deal_terms("قبلا 50,000,000,000 ریال گفتیم، حالا 6 billion toman for 18% equity")
+    {'investment': 6000000000, 'equity': 18}
+    """
+    amounts = extract_amounts(text)
+    terms = {"investment": None, "equity": None}
+    bare_investment = None
+
+    for index, amount in enumerate(amounts):
+        kind, value = amount["kind"], amount["value"]
+        if kind == "money":
+            terms["investment"] = value
+        elif kind in ("scaled", "number") and value >= BARE_MONEY_THRESHOLD:
+            bare_investment = value
+        elif kind == "percent" and 0 < value <= 100 and _mentions_equity(text, amounts, index):
+            terms["equity"] = value
+
+    if terms["investment"] is None:
+        terms["investment"] = bare_investment
+    return terms
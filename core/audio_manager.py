@@ -1,158 +1,239 @@
 # audio_manager.py - مدیریت صدا برای برنامه مذاکره
 
 import os
-import requests
-import json
 import base64
-import streamlit as st
-from time import time
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from time import perf_counter, time
+from typing import Dict, Optional
+from .audio_queue import AudioPlaybackQueue
+from .audio_processing import audio_duration, prepare_for_stt, normalize_tts_output
+from .speech_backends import SpeechBackendError, get_resilient_backend
+from .rate_limiter import RequestCoalescer
+from .phrase_bank import get_phrase_bank
+
+
+class _LazyStreamlit:
+    """دسترسی به streamlit که ماژول را فقط در اولین استفاده وارد می‌کند (زمان راه‌اندازی)"""
+
+    def __getattr__(self, name):
+        import streamlit
+        return getattr(streamlit, name)
+
+
+st = _LazyStreamlit()
+
+# کش نتایج STT براساس هش محتوای ضبط؛ بین همه جلسات مشترک است
+STT_CACHE_SIZE = 256
+_stt_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_stt_cache_lock = threading.Lock()
+_stt_in_flight = RequestCoalescer()
+
+# ساخت صدای پاسخ‌ها خارج از اجرای اسکریپت تا نمایش متن معطل TTS نشود
+_tts_jobs = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tts-job")
+
+# پاسخ‌های طولانی‌تر از این در حالت صوتی فقط به صورت متن نمایش داده می‌شوند
+MAX_TTS_CHARS = int(os.getenv("VOICE_MAX_TTS_CHARS", "400"))
+
+# شماره گوینده سرویس TTS برای هر عامل
+SPEAKER_MAP = {
+    "آقای محمدی": 2,  # Male voice 1
+    "خانم اکبری": 0,  # Female voice
+    "آقای رضایی": 1,  # Male voice 2
+    "دکتر کریمی": 3,  # Male voice 3
+    "system": 3        # System voice
+}
 
 
 class AudioManager:
     """مدیریت ورودی و خروجی صوتی"""
 
     def __init__(self):
-        # تنظیمات API
-        self.STT_ENDPOINT = os.getenv("STT_ENDPOINT", "https://partai.gw.isahab.ir/speechRecognition/v1/base64")
-        self.TTS_ENDPOINT = os.getenv("TTS_ENDPOINT", "https://partai.gw.isahab.ir/TextToSpeech/v1/speech-synthesys")
-        self.STT_API_KEY = os.getenv("STT_API_KEY", "Gateway 5c1ea0b8-7dc9-5f36-8f96-c4deff201a1d")
-        self.TTS_API_KEY = os.getenv("TTS_API_KEY", "Gateway a7f37b14-d0a1-5b52-a6f0-d0baef9e1b67")
+        # سرویس گفتار (راه دور یا محلی) با مهلت هر مرحله و قطع‌کننده مدار
+        self.backend = get_resilient_backend()
+
+        # صدای آماده جمله‌های ثابت (خوش‌آمد، انتقال مراحل، بازخوردهای ارزیاب)
+        self.phrase_bank = get_phrase_bank()
         
         # Speaker settings for different agents
-        self.speaker_map = {
-            "آقای محمدی": 2,  # Male voice 1
-            "خانم اکبری": 0,  # Female voice
-            "آقای رضایی": 1,  # Male voice 2
-            "دکتر کریمی": 3,  # Male voice 3
-            "system": 3        # System voice
-        }
+        self.speaker_map = SPEAKER_MAP
         
         # Initialize audio queue
         if 'audio_queue' not in st.session_state:
-            st.session_state.audio_queue = []
+            st.session_state.audio_queue = self._new_queue()
+        if 'audio_jobs' not in st.session_state:
+            st.session_state.audio_jobs = deque()
         if 'current_audio' not in st.session_state:
             st.session_state.current_audio = None
         if 'audio_playing' not in st.session_state:
             st.session_state.audio_playing = False
         if 'last_queue_update' not in st.session_state:
             st.session_state.last_queue_update = time()
+        # خطاهای پردازش صوت در رشته‌های پس‌زمینه؛ در collect_ready_audio نمایش داده می‌شوند
+        if 'audio_errors' not in st.session_state:
+            st.session_state.audio_errors = deque(maxlen=10)
 
-    def speech_to_text(self, audio_base64, language="fa"):
+    def speech_to_text(self, audio_base64, language="fa", idempotency_key=None):
         """تبدیل صدا به متن"""
-        url = self.STT_ENDPOINT
-        payload = json.dumps({"language": language, "data": audio_base64})
-        headers = {
-            'gateway-token': self.STT_API_KEY,
-            'Content-Type': 'application/json'
-        }
-        
         try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status()
-            result = response.json()
-            
-            # Debug response
-            print("STT Response:", result)
-            
-            # Parse response based on the provided structure
-            if result.get("data", {}).get("status") == "success":
-                return result["data"]["data"]
-            else:
-                st.error("خطا در تبدیل صدا به متن: پاسخ نامعتبر")
-                return None
+            return self.backend.speech_to_text(audio_base64, language, idempotency_key=idempotency_key)
+        except SpeechBackendError as e:
+            st.error(str(e))
+            return None
         except Exception as e:
             st.error(f"خطا در درخواست STT: {str(e)}")
             return None
 
+    @staticmethod
+    def recording_key(audio_bytes: bytes) -> str:
+        """کلید یکتای هر ضبط براساس هش محتوا"""
+        return hashlib.sha256(audio_bytes).hexdigest()
+
+    def transcribe_recording(self, audio_bytes, language="fa", usage=None) -> Optional[Dict]:
+        """کوچک‌سازی ضبط کاربر و تبدیل آن به متن؛ هر محتوای یکتا فقط یک بار ارسال می‌شود
+
+        usage در صورت وجود با stt_seconds و latency هر ارسال واقعی فراخوانی می‌شود.
+        """
+        recording_key = self.recording_key(audio_bytes)
+        cache_key = f"{language}:{recording_key}"
+        with _stt_cache_lock:
+            if cache_key in _stt_cache:
+                _stt_cache.move_to_end(cache_key)
+                return _stt_cache[cache_key]
+
+        def transcribe():
+            processed_bytes, _ = prepare_for_stt(audio_bytes, on_error=st.warning)
+            audio_base64 = base64.b64encode(processed_bytes).decode()
+            started = perf_counter()
+            result = self.speech_to_text(audio_base64, language, idempotency_key=recording_key)
+            if result and usage is not None:
+                usage(stt_seconds=audio_duration(processed_bytes), latency=perf_counter() - started)
+            return result
+
+        # ضبط‌های یکسان هم‌زمان منتظر همان یک درخواست می‌مانند
+        result = _stt_in_flight.run(cache_key, transcribe)
+        if result:
+            with _stt_cache_lock:
+                _stt_cache[cache_key] = result
+                while len(_stt_cache) > STT_CACHE_SIZE:
+                    _stt_cache.popitem(last=False)
+        return result
+
     def text_to_speech(self, text, speaker=3, speed=1):
         """تبدیل متن به صدا"""
-        url = self.TTS_ENDPOINT
-        payload = json.dumps({
-            "data": text, 
-            "filePath": "true", 
-            "base64": "1", 
-            "checksum": "1",
-            "speaker": str(speaker), 
-            "speed": str(speed)
-        })
-        headers = {
-            'Content-Type': 'application/json', 
-            'gateway-token': self.TTS_API_KEY
-        }
-        
         try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status()
-            result = response.json()
-            
-            if result["data"]["status"] == "success":
-                file_url = result["data"]["data"].get("filePath")
-                if file_url:
-                    if not file_url.startswith(('http://', 'https://')):
-                        file_url = f"https://{file_url}"
-                    audio_response = requests.get(file_url, headers={'gateway-token': self.TTS_API_KEY})
-                    audio_response.raise_for_status()
-                    return audio_response.content
-                else:
-                    st.error("No filePath found in TTS response.")
-                    return None
-            else:
-                st.error("TTS API returned unsuccessful status.")
-                return None
+            return self.backend.text_to_speech(text, speaker=speaker, speed=speed)
+        except SpeechBackendError as e:
+            st.error(str(e))
+            return None
         except Exception as e:
             st.error(f"خطا در درخواست TTS: {str(e)}")
             return None
 
-    def enqueue_audio(self, agent_name, message_text):
-        """افزودن یک فایل صوتی به صف پخش و نمایش کنترل دستی"""
+    def enqueue_audio(self, agent_name, message_text, track=None, usage=None):
+        """افزودن صدای یک پیام به صف پخش بدون انتظار برای TTS
+
+        جمله‌های ثابت فوری از بانک صدا اضافه می‌شوند؛ برای بقیه، صدا در پس‌زمینه
+        ساخته و با collect_ready_audio به ترتیب پیام‌ها وارد صف می‌شود. پاسخ‌های
+        طولانی بدون صدا می‌مانند. track در صورت وجود، context manager شمارش
+        فراخوانی TTS است و usage با tts_chars و latency هر ساخت موفق فراخوانی می‌شود.
+        """
         speaker = self.speaker_map.get(agent_name, 3)
-        audio_bytes = self.text_to_speech(message_text, speaker=speaker)
-        
-        if audio_bytes:
-            unique_id = f"audio_{len(st.session_state.audio_queue)}_{time()}"
-            audio_item = {
-                "id": unique_id,
-                "agent": agent_name,
-                "data": audio_bytes,
-                "played": False
-            }
-            
-            # Add to queue for sequential auto-play
-            st.session_state.audio_queue.append(audio_item)
-            st.session_state.last_queue_update = time()
-            
-            # Also display individual audio control
-            audio_base64 = base64.b64encode(audio_bytes).decode()
-            with st.expander(f"صدای {agent_name}", expanded=False):
-                st.audio(audio_bytes, format="audio/mp3")
-                
+
+        # جمله‌های ثابت بدون فراخوانی TTS از بانک صدا خوانده می‌شوند
+        clip = self.phrase_bank.get(message_text, speaker)
+        if clip is not None:
+            st.session_state.audio_jobs.append((agent_name, clip))
+            self.collect_ready_audio()
             return True
-        return False
+
+        if len(message_text) > MAX_TTS_CHARS:
+            return False
+
+        future = _tts_jobs.submit(self._synthesize, message_text, speaker, track, usage,
+                                  st.session_state.audio_errors)
+        st.session_state.audio_jobs.append((agent_name, future))
+        return True
+
+    def _synthesize(self, message_text, speaker, track=None, usage=None, errors=None):
+        """اجرا در رشته پس‌زمینه؛ به session state دسترسی ندارد و خطاها را به errors اضافه می‌کند"""
+        started = perf_counter()
+        with track() if track is not None else nullcontext():
+            audio_bytes = self.backend.text_to_speech(message_text, speaker=speaker)
+        if usage is not None:
+            usage(tts_chars=len(message_text), latency=perf_counter() - started)
+        return normalize_tts_output(audio_bytes, on_error=errors.append if errors is not None else None)
+
+    def collect_ready_audio(self) -> int:
+        """انتقال صداهای آماده به صف پخش با حفظ ترتیب پیام‌ها؛ تعداد کلیپ‌های اضافه‌شده"""
+        jobs = st.session_state.audio_jobs
+        errors = st.session_state.audio_errors
+        added = 0
+        while jobs:
+            agent_name, job = jobs[0]
+            if isinstance(job, tuple):
+                clip = job
+            elif job.done():
+                try:
+                    clip = job.result()
+                except Exception as e:
+                    # صدای این پیام حذف می‌شود؛ متن آن قبلا نمایش داده شده است
+                    errors.append(f"خطا در ساخت صدای پیام {agent_name}: {str(e)}")
+                    clip = None
+            else:
+                break
+
+            jobs.popleft()
+            if clip is not None and clip[0]:
+                audio_bytes, mime = clip
+                st.session_state.audio_queue.append(agent_name, audio_bytes, mime=mime)
+                added += 1
+
+        if added:
+            st.session_state.last_queue_update = time()
+
+        # هر خطای تکراری فقط یک بار نمایش داده می‌شود
+        for message in dict.fromkeys(errors.popleft() for _ in range(len(errors))):
+            st.warning(message)
+        return added
+
+    def has_audio_jobs(self) -> bool:
+        """آیا صدایی در حال ساخت است"""
+        return bool(st.session_state.audio_jobs)
+
+    def voice_degraded(self) -> bool:
+        """آیا قطع‌کننده مدار سرویس گفتار باز است"""
+        return self.backend.breaker.state == "open"
+
+    def enqueue_phrase(self, agent_name, message_text):
+        """افزودن صدای آماده یک جمله ثابت به صف؛ اگر آماده نباشد TTS زنده فراخوانی نمی‌شود"""
+        clip = self.phrase_bank.get(message_text, self.speaker_map.get(agent_name, 3))
+        if clip is None:
+            return False
+
+        st.session_state.audio_jobs.append((agent_name, clip))
+        self.collect_ready_audio()
+        return True
 
     def get_next_audio(self):
         """دریافت بعدی فایل صوتی از صف پخش"""
-        if not st.session_state.audio_queue:
-            return None
-            
-        # Find the first unplayed audio
-        for i, audio_item in enumerate(st.session_state.audio_queue):
-            if not audio_item["played"]:
-                st.session_state.audio_queue[i]["played"] = True
-                return audio_item
-                
-        return None
+        return st.session_state.audio_queue.next()
 
     def render_audio_player(self):
         """نمایش پلیر صوتی برای پخش صف"""
         # First check if we need to update the audio player for auto-play
-        if st.session_state.audio_autoplay and not st.session_state.audio_playing and st.session_state.audio_queue:
+        if st.session_state.audio_autoplay and not st.session_state.audio_playing and st.session_state.audio_queue.has_pending():
             next_audio = self.get_next_audio()
             if next_audio:
                 audio_bytes = next_audio["data"]
                 audio_base64 = base64.b64encode(audio_bytes).decode()
                 audio_html = f"""
                     <audio id="{next_audio['id']}" onended="this.parentNode.removeChild(this)" autoplay>
-                        <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
+                        <source src="data:{next_audio['mime']};base64,{audio_base64}" type="{next_audio['mime']}">
                         مرورگر شما از پخش صوت پشتیبانی نمی‌کند.
                     </audio>
                     <script>
@@ -181,8 +262,29 @@ class AudioManager:
             st.session_state.audio_container.empty()
             st.session_state.audio_playing = False
 
+    def render_replay_controls(self, count=5):
+        """نمایش کنترل دستی برای پخش مجدد آخرین پاسخ‌های صوتی"""
+        recent = st.session_state.audio_queue.recent(count)
+        if not recent:
+            return
+
+        with st.expander("پخش مجدد پاسخ‌های صوتی", expanded=False):
+            for item in recent:
+                st.caption(f"صدای {item['agent']}")
+                st.audio(st.session_state.audio_queue.get(item["id"]), format=item["mime"])
+
     def clear_audio_queue(self):
         """پاک کردن صف صوتی"""
-        st.session_state.audio_queue = []
+        st.session_state.audio_queue.clear()
+        st.session_state.audio_queue = self._new_queue()
+        st.session_state.audio_jobs = deque()
         st.session_state.audio_playing = False
-        st.session_state.current_audio = None
\ No newline at end of file
+        st.session_state.current_audio = None
+
+    def _new_queue(self) -> AudioPlaybackQueue:
+        """ساخت صف پخش با سقف حافظه و مسیر کش از تنظیمات"""
+        return AudioPlaybackQueue(
+            max_bytes=int(os.getenv("AUDIO_QUEUE_MAX_BYTES", str(8 * 1024 * 1024))),
+            cache_dir=os.path.join(os.getenv("AUDIO_CACHE_DIR", "audio_cache"), uuid.uuid4().hex),
+            max_played=int(os.getenv("AUDIO_REPLAY_HISTORY", "50"))
+        )
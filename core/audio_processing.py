@@ -0,0 +1,149 @@
+# audio_processing.py - تبدیل قالب و فشرده‌سازی صوت ورودی و خروجی
+
+import io
+import os
+import shutil
+import subprocess
+import wave
+from typing import Callable, Optional, Tuple
+
+# پارامترهای ffmpeg برای هر قالب خروجی: (آرگومان‌ها، mime)
+ENCODERS = {
+    "wav": (["-c:a", "pcm_s16le", "-f", "wav"], "audio/wav"),
+    "flac": (["-c:a", "flac", "-f", "flac"], "audio/flac"),
+    "opus": (["-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "ogg"], "audio/ogg"),
+    "mp3": (["-c:a", "libmp3lame", "-b:a", "48k", "-f", "mp3"], "audio/mpeg"),
+}
+
+
+def sniff_mime(audio_bytes: bytes) -> str:
+    """تشخیص قالب واقعی صوت از بایت‌های ابتدایی"""
+    head = audio_bytes[:12]
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head[:4] == b"OggS":
+        return "audio/ogg"
+    if head[:4] == b"fLaC":
+        return "audio/flac"
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "audio/mpeg"
+    if head[4:8] == b"ftyp":
+        return "audio/mp4"
+    return "application/octet-stream"
+
+
+def audio_duration(audio_bytes: bytes) -> float:
+    """مدت صوت به ثانیه از سرآیند WAV یا FLAC؛ برای قالب‌های فشرده با نرخ بیت ثابت تخمین زده می‌شود"""
+    mime = sniff_mime(audio_bytes)
+    if mime == "audio/wav":
+        try:
+            with wave.open(io.BytesIO(audio_bytes), "rb") as source:
+                return source.getnframes() / float(source.getframerate())
+        except (wave.Error, EOFError):
+            pass
+    if mime == "audio/flac" and len(audio_bytes) >= 26:
+        # بلوک STREAMINFO بلافاصله پس از fLaC: نرخ نمونه ۲۰ بیت و تعداد نمونه‌ها ۳۶ بیت
+        info = int.from_bytes(audio_bytes[18:26], "big")
+        sample_rate = info >> 44
+        total_samples = info & ((1 << 36) - 1)
+        if sample_rate and total_samples:
+            return total_samples / sample_rate
+    # opus و mp3 خروجی transcode حدود ۲۴ تا ۴۸ کیلوبیت بر ثانیه‌اند
+    return len(audio_bytes) * 8 / 32000
+
+
+def has_ffmpeg() -> bool:
+    return shutil.which(os.getenv("FFMPEG_BINARY", "ffmpeg")) is not None
+
+
+def transcode(audio_bytes: bytes, target_format: str, sample_rate: Optional[int] = None,
+              mono: bool = True) -> Tuple[bytes, str]:
+    """تبدیل قالب با ffmpeg از طریق pipe، بدون فایل موقت"""
+    args, mime = ENCODERS[target_format]
+    command = [os.getenv("FFMPEG_BINARY", "ffmpeg"), "-hide_banner", "-loglevel", "error", "-i", "pipe:0"]
+    if mono:
+        command += ["-ac", "1"]
+    if sample_rate:
+        command += ["-ar", str(sample_rate)]
+    command += args + ["pipe:1"]
+
+    result = subprocess.run(command, input=audio_bytes, capture_output=True, check=True, timeout=30)
+    return result.stdout, mime
+
+
+def resample_wav(audio_bytes: bytes, sample_rate: int) -> bytes:
+    """تک‌کاناله‌سازی و تغییر نرخ نمونه WAV بدون ffmpeg (نیازمند numpy)"""
+    import numpy as np
+
+    with wave.open(io.BytesIO(audio_bytes), "rb") as source:
+        channels = source.getnchannels()
+        width = source.getsampwidth()
+        rate = source.getframerate()
+        frames = source.readframes(source.getnframes())
+
+    if width != 2:
+        return audio_bytes
+
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate and len(samples):
+        duration = len(samples) / rate
+        target_times = np.arange(int(duration * sample_rate)) / sample_rate
+        samples = np.interp(target_times, np.arange(len(samples)) / rate, samples)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as target:
+        target.setnchannels(1)
+        target.setsampwidth(2)
+        target.setframerate(sample_rate)
+        target.writeframes(np.clip(samples, -32768, 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def _report(on_error: Optional[Callable[[str], None]], message: str):
+    """گزارش بازگشت به فایل اصلی از مسیر خطای فراخوان؛ بدون آن، چاپ در لاگ"""
+    if on_error is not None:
+        on_error(message)
+    else:
+        print(message)
+
+
+def prepare_for_stt(audio_bytes: bytes, on_error: Optional[Callable[[str], None]] = None) -> Tuple[bytes, str]:
+    """کوچک‌سازی ضبط کاربر به نرخ و قالب بومی STT پیش از ارسال
+
+    با ffmpeg خروجی FLAC است (بدون افت کیفیت و حدود نصف WAV)؛ بدون ffmpeg فقط WAV با
+    numpy بازنمونه‌برداری می‌شود. در صورت خطا فایل اصلی ارسال و on_error فراخوانی می‌شود.
+    """
+    sample_rate = int(os.getenv("STT_SAMPLE_RATE", "16000"))
+    target_format = os.getenv("STT_UPLOAD_FORMAT", "flac").lower()
+
+    try:
+        if has_ffmpeg():
+            return transcode(audio_bytes, target_format, sample_rate=sample_rate)
+        if sniff_mime(audio_bytes) == "audio/wav":
+            return resample_wav(audio_bytes, sample_rate), "audio/wav"
+    except (ImportError, subprocess.SubprocessError, wave.Error, OSError) as e:
+        _report(on_error, f"خطا در پردازش صدای ورودی، ارسال فایل اصلی: {str(e)}")
+
+    return audio_bytes, sniff_mime(audio_bytes)
+
+
+def normalize_tts_output(audio_bytes: bytes,
+                         on_error: Optional[Callable[[str], None]] = None) -> Tuple[bytes, str]:
+    """تبدیل خروجی TTS به قالب کوچک و مناسب پخش جریانی با mime درست"""
+    target_format = os.getenv("TTS_PLAYBACK_FORMAT", "mp3").lower()
+    mime = sniff_mime(audio_bytes)
+
+    if target_format == "original" or ENCODERS.get(target_format, (None, mime))[1] == mime:
+        return audio_bytes, mime
+
+    try:
+        if has_ffmpeg():
+            encoded, encoded_mime = transcode(audio_bytes, target_format)
+            if encoded and len(encoded) < len(audio_bytes):
+                return encoded, encoded_mime
+    except (subprocess.SubprocessError, OSError) as e:
+        _report(on_error, f"خطا در فشرده‌سازی خروجی TTS: {str(e)}")
+
+    return audio_bytes, mime
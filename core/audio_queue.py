@@ -0,0 +1,181 @@
+# audio_queue.py - صف پخش صوت با سقف حافظه
+
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Dict, List, Optional
+
+
+class AudioPlaybackQueue:
+    """صف پخش صوت با دسترسی O(1) به مورد بعدی و سقف حجم در حافظه
+
+    کلیپ‌ها تا زمان پخش در حافظه می‌مانند؛ وقتی حجم از سقف بیشتر شود،
+    کلیپ‌های پخش‌شده (قدیمی‌ترین اول) به کش دیسک منتقل می‌شوند و برای
+    پخش مجدد از همان‌جا خوانده می‌شوند. فقط max_played کلیپ پخش‌شده آخر برای
+    پخش مجدد نگه داشته می‌شوند و فایل کلیپ‌های قدیمی‌تر حذف می‌شود.
+
+    پوشه کش متعلق به صف است: با اولین انتقال به دیسک ساخته می‌شود (بدون cache_dir
+    یک پوشه موقت) و با clear یا جمع‌آوری صف حذف می‌شود.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, cache_dir: Optional[str] = None,
+                 max_played: int = 50):
+        self.max_bytes = max_bytes
+        self.max_played = max_played
+        self.cache_dir = cache_dir
+        self._temporary_cache = cache_dir is None
+        self._cleanup: Optional[weakref.finalize] = None
+        self._items: Dict[str, Dict] = {}
+        self._pending: deque = deque()         # شناسه کلیپ‌های پخش‌نشده به ترتیب ورود
+        self._played_resident: deque = deque()  # شناسه کلیپ‌های پخش‌شده که هنوز در حافظه‌اند
+        self._played: deque = deque()           # شناسه همه کلیپ‌های پخش‌شده نگه‌داشته‌شده، قدیمی‌ترین اول
+        self._resident: "OrderedDict[str, int]" = OrderedDict()
+        self._memory_bytes = 0
+        self._counter = 0
+
+    def append(self, agent_name: str, audio_bytes: bytes, mime: str = "audio/mp3") -> Dict:
+        """افزودن کلیپ به انتهای صف"""
+        self._counter += 1
+        item = {
+            "id": f"audio_{self._counter}_{uuid.uuid4().hex[:8]}",
+            "agent": agent_name,
+            "data": audio_bytes,
+            "mime": mime,
+            "size": len(audio_bytes),
+            "path": None,
+            "played": False
+        }
+        self._items[item["id"]] = item
+        self._pending.append(item["id"])
+        self._resident[item["id"]] = item["size"]
+        self._memory_bytes += item["size"]
+        self._enforce_limit()
+        return item
+
+    def next(self) -> Optional[Dict]:
+        """برداشتن کلیپ بعدی برای پخش"""
+        while self._pending:
+            item = self._items.get(self._pending.popleft())
+            if item is None:
+                continue
+            item["played"] = True
+            self._load(item)
+            self._played_resident.append(item["id"])
+            self._played.append(item["id"])
+            while len(self._played) > self.max_played:
+                self._drop(self._played.popleft())
+            self._enforce_limit(keep=item["id"])
+            return item
+        return None
+
+    def get(self, item_id: str) -> Optional[bytes]:
+        """دریافت داده یک کلیپ برای پخش مجدد"""
+        item = self._items.get(item_id)
+        if item is None:
+            return None
+        if item["data"] is not None:
+            return item["data"]
+        with open(item["path"], "rb") as f:
+            return f.read()
+
+    def recent(self, count: int) -> List[Dict]:
+        """آخرین کلیپ‌ها، جدیدترین اول"""
+        return list(islice(reversed(self._items.values()), count))
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def spill(self):
+        """انتقال همه کلیپ‌های داخل حافظه به دیسک؛ برای جلسه‌ای که بی‌کار شده است"""
+        for item_id in list(self._resident):
+            self._evict(item_id)
+        self._played_resident.clear()
+
+    def clear(self):
+        """حذف همه کلیپ‌ها از حافظه و دیسک"""
+        self._items.clear()
+        self._pending.clear()
+        self._played_resident.clear()
+        self._played.clear()
+        self._resident.clear()
+        self._memory_bytes = 0
+        if self._cleanup is not None:
+            self._cleanup()
+            self._cleanup = None
+        if self._temporary_cache:
+            self.cache_dir = None
+
+    def _load(self, item: Dict):
+        """بازگرداندن کلیپ منتقل‌شده به دیسک برای پخش"""
+        if item["data"] is None:
+            with open(item["path"], "rb") as f:
+                item["data"] = f.read()
+            self._resident[item["id"]] = item["size"]
+            self._memory_bytes += item["size"]
+
+    def _cache_path(self) -> str:
+        """پوشه کش؛ در اولین استفاده ساخته و حذف آن با جمع‌آوری صف ثبت می‌شود"""
+        if self._cleanup is None:
+            if self.cache_dir is None:
+                self.cache_dir = tempfile.mkdtemp(prefix="audio_cache_")
+            else:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            self._cleanup = weakref.finalize(self, shutil.rmtree, self.cache_dir, True)
+        return self.cache_dir
+
+    def _drop(self, item_id: str):
+        """حذف کامل کلیپ پخش‌شده قدیمی از تاریخچه، حافظه و دیسک"""
+        item = self._items.pop(item_id, None)
+        if item is None:
+            return
+        if item_id in self._resident:
+            self._memory_bytes -= self._resident.pop(item_id)
+        # قدیمی‌ترین کلیپ پخش‌شده، اگر هنوز در حافظه باشد، اول صف _played_resident است
+        if self._played_resident and self._played_resident[0] == item_id:
+            self._played_resident.popleft()
+        if item["path"] is not None:
+            try:
+                os.remove(item["path"])
+            except OSError:
+                pass
+
+    def _evict(self, item_id: str):
+        item = self._items[item_id]
+        if item["path"] is None:
+            item["path"] = os.path.join(self._cache_path(), f"{item_id}.bin")
+            with open(item["path"], "wb") as f:
+                f.write(item["data"])
+        item["data"] = None
+        self._memory_bytes -= self._resident.pop(item_id)
+
+    def _enforce_limit(self, keep: Optional[str] = None):
+        """انتقال کلیپ‌ها به دیسک تا رسیدن به سقف حجم"""
+        # ابتدا کلیپ‌های پخش‌شده، قدیمی‌ترین اول
+        while self._memory_bytes > self.max_bytes and self._played_resident:
+            item_id = self._played_resident[0]
+            if item_id == keep:
+                break
+            self._played_resident.popleft()
+            if item_id in self._resident:
+                self._evict(item_id)
+
+        # سپس کلیپ‌های پخش‌نشده، از آخرین کلیپ که دیرتر از همه پخش می‌شود
+        for item_id in reversed(self._pending):
+            if self._memory_bytes <= self.max_bytes:
+                break
+            if item_id in self._resident:
+                self._evict(item_id)
@@ -0,0 +1,315 @@
+# batch_scoring.py - امتیازدهی آفلاین گزارش‌ها با LLM از طریق رابط batch
+
+import argparse
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+from .reports import ReportStore
+
+RUBRIC_METRICS = [
+    "technical_knowledge",
+    "communication_skills",
+    "negotiation_intelligence",
+    "emotional_control",
+    "creativity"
+]
+
+RUBRIC_PROMPT = """شما دکتر کریمی، ارزیاب حرفه‌ای مذاکره جذب سرمایه هستید.
+متن کامل یک جلسه مذاکره به شما داده می‌شود. عملکرد بنیان‌گذار (user) را در هر معیار از 0 تا 20 نمره دهید:
+- technical_knowledge: دانش فنی و مالی (CAC، LTV، ROI، مدل درآمد)
+- communication_skills: وضوح و اختصار پاسخ‌ها
+- negotiation_intelligence: مدیریت مبلغ و سهام و امتیازدهی هوشمندانه
+- emotional_control: آرامش در برابر فشار و چالش
+- creativity: خلاقیت و تمایز ایده
+
+فقط یک شیء JSON با همین پنج کلید عددی و کلید "feedback" (یک جمله فارسی) برگردانید."""
+
+# امتیازدهی ناموفق (batch منقضی، پاسخ نامعتبر) تا این تعداد ارسال دوباره امتحان می‌شود
+MAX_SCORING_ATTEMPTS = 3
+
+
+class BatchClient(ABC):
+    """رابط سرویس‌دهنده batch سازگار با OpenAI"""
+
+    @abstractmethod
+    def submit(self, requests: List[Dict]) -> str:
+        """ارسال درخواست‌ها و دریافت شناسه batch"""
+        pass
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """وضعیت batch: in_progress، completed، failed یا unknown (batch متعلق به این کلاینت نیست)"""
+        pass
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Dict[str, str]:
+        """نگاشت custom_id به متن پاسخ مدل"""
+        pass
+
+
+class OpenAIBatchClient(BatchClient):
+    """ارسال batch به endpoint سازگار با OpenAI Batch API"""
+
+    def __init__(self, api_key: str, base_url: str = "https://api.avalai.ir/v1"):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+
+    def submit(self, requests: List[Dict]) -> str:
+        payload = "\n".join(json.dumps(r, ensure_ascii=False) for r in requests)
+        batch_file = self.client.files.create(
+            file=("scoring_batch.jsonl", io.BytesIO(payload.encode("utf-8"))),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            return "completed"
+        if batch.status in ("failed", "expired", "cancelled"):
+            return "failed"
+        return "in_progress"
+
+    def results(self, batch_id: str) -> Dict[str, str]:
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.output_file_id is None:
+            # batch منقضی یا ناموفق خروجی ندارد و همه گزارش‌های آن ناموفق حساب می‌شوند
+            return {}
+        content = self.client.files.content(batch.output_file_id).text
+
+        results = {}
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            body = (item.get("response") or {}).get("body") or {}
+            choices = body.get("choices") or []
+            if choices:
+                results[item["custom_id"]] = choices[0]["message"]["content"]
+        return results
+
+
+class LocalBatchClient(BatchClient):
+    """جایگزین محلی batch برای آزمایش بدون شبکه"""
+
+    def __init__(self, completion: Optional[Callable[[Dict], str]] = None):
+        self.completion = completion or heuristic_completion
+        self._batches: Dict[str, Dict[str, str]] = {}
+
+    def submit(self, requests: List[Dict]) -> str:
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        self._batches[batch_id] = {
+            r["custom_id"]: self.completion(r["body"]) for r in requests
+        }
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        # batchهای ارسال‌شده به API واقعی اینجا شناخته نمی‌شوند و نباید ناموفق علامت بخورند
+        return "completed" if batch_id in self._batches else "unknown"
+
+    def results(self, batch_id: str) -> Dict[str, str]:
+        return self._batches.pop(batch_id, {})
+
+
+def heuristic_completion(body: Dict) -> str:
+    """پاسخ قطعی مبتنی بر کلمات کلیدی به جای مدل واقعی"""
+    transcript = body["messages"][-1]["content"].lower()
+    technical_terms = ["roi", "cac", "ltv", "بازار", "رشد", "هزینه", "درآمد"]
+    scores = {metric: 10 for metric in RUBRIC_METRICS}
+    scores["technical_knowledge"] = min(20, sum(2 for term in technical_terms if term in transcript))
+    scores["feedback"] = "امتیازدهی محلی براساس کلمات کلیدی انجام شد"
+    return json.dumps(scores, ensure_ascii=False)
+
+
+def build_transcript(report: Dict) -> str:
+    """تبدیل لاگ مکالمه گزارش به متن قابل ارزیابی"""
+    lines = []
+    for entry in report.get("conversation_log", []):
+        sender = "user" if entry["sender"] == "user" else entry["sender"]
+        lines.append(f"[{entry.get('phase', '')}] {sender}: {entry['message']}")
+    return "\n".join(lines)
+
+
+def parse_scores(content: str) -> Optional[Dict]:
+    """استخراج و محدودسازی نمره‌ها از پاسخ مدل"""
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end == -1:
+        return None
+    try:
+        data = json.loads(content[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+
+    scores = {}
+    for metric in RUBRIC_METRICS:
+        try:
+            scores[metric] = max(0, min(20, float(data.get(metric, 0))))
+        except (TypeError, ValueError):
+            scores[metric] = 0
+    return {"metrics": scores, "feedback": str(data.get("feedback", ""))}
+
+
+class BatchScoringPipeline:
+    """جمع‌آوری گزارش‌ها، ارسال دسته‌ای و ادغام نمره‌ها در گزارش‌ها"""
+
+    def __init__(self, store: ReportStore, client: BatchClient,
+                 model: str = "gpt-4o-mini", batch_size: int = 50,
+                 max_attempts: int = MAX_SCORING_ATTEMPTS):
+        self.store = store
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def build_request(self, custom_id: str, report: Dict) -> Dict:
+        """ساخت یک خط درخواست batch برای یک گزارش"""
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": self.model,
+                "temperature": 0,
+                "response_format": {"type": "json_object"},
+                "messages": [
+                    {"role": "system", "content": RUBRIC_PROMPT},
+                    {"role": "user", "content": build_transcript(report)}
+                ]
+            }
+        }
+
+    def submit_pending(self) -> List[str]:
+        """ارسال گزارش‌های بدون نمره یا ناموفق (تا max_attempts بار) در دسته‌های batch_size تایی"""
+        pending = []
+        for path in self.store.list_reports():
+            report = self.store.load(path)
+            scoring = report.get("performance_evaluation", {}).get("llm_scoring")
+            if scoring is None or (scoring["status"] == "failed"
+                                   and scoring.get("attempts", 1) < self.max_attempts):
+                pending.append((path, report))
+
+        batch_ids = []
+        for i in range(0, len(pending), self.batch_size):
+            chunk = pending[i:i + self.batch_size]
+            requests = [
+                self.build_request(os.path.basename(path), report)
+                for path, report in chunk
+            ]
+            batch_id = self.client.submit(requests)
+            batch_ids.append(batch_id)
+
+            for path, report in chunk:
+                evaluation = report.setdefault("performance_evaluation", {})
+                previous = evaluation.get("llm_scoring") or {}
+                evaluation["llm_scoring"] = {
+                    "status": "pending",
+                    "batch_id": batch_id,
+                    "submitted_at": time.time(),
+                    "attempts": previous.get("attempts", 1 if previous else 0) + 1
+                }
+                self.store.write(path, report)
+
+        return batch_ids
+
+    def merge_completed(self) -> int:
+        """ادغام نتایج batchهای تمام‌شده در گزارش‌ها"""
+        waiting: Dict[str, List] = {}
+        for path in self.store.list_reports():
+            report = self.store.load(path)
+            scoring = report.get("performance_evaluation", {}).get("llm_scoring")
+            if scoring and scoring["status"] == "pending":
+                waiting.setdefault(scoring["batch_id"], []).append((path, report))
+
+        merged = 0
+        for batch_id, items in waiting.items():
+            status = self.client.status(batch_id)
+            if status in ("in_progress", "unknown"):
+                continue
+
+            results = self.client.results(batch_id) if status == "completed" else {}
+            for path, report in items:
+                parsed = parse_scores(results.get(os.path.basename(path), ""))
+                scoring = report["performance_evaluation"]["llm_scoring"]
+                if parsed:
+                    scoring.update(parsed)
+                    scoring["status"] = "completed"
+                    merged += 1
+                else:
+                    scoring["status"] = "failed"
+                scoring["completed_at"] = time.time()
+                self.store.write(path, report)
+
+        return merged
+
+    def run_once(self) -> int:
+        """یک دور کامل ارسال و ادغام"""
+        self.submit_pending()
+        return self.merge_completed()
+
+    def start(self, interval: float = 60.0):
+        """اجرای دوره‌ای در پس‌زمینه"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _loop(self, interval: float):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"خطا در امتیازدهی batch: {str(e)}")
+            self._stop.wait(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="امتیازدهی آفلاین گزارش‌های جلسات")
+    parser.add_argument("--reports", default="reports")
+    parser.add_argument("--local", action="store_true", help="استفاده از جایگزین محلی به جای API")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--max-attempts", type=int, default=MAX_SCORING_ATTEMPTS,
+                        help="حداکثر دفعات ارسال گزارشی که امتیازدهی آن ناموفق بوده")
+    parser.add_argument("--watch", type=float, default=0, help="فاصله اجرای دوره‌ای (ثانیه)")
+    args = parser.parse_args()
+
+    if args.local:
+        client = LocalBatchClient()
+    else:
+        client = OpenAIBatchClient(os.getenv("OPENAI_API_KEY", ""))
+
+    pipeline = BatchScoringPipeline(ReportStore(args.reports), client, batch_size=args.batch_size,
+                                    max_attempts=args.max_attempts)
+    if args.watch:
+        pipeline.start(args.watch)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pipeline.stop()
+    else:
+        submitted = pipeline.submit_pending()
+        merged = pipeline.merge_completed()
+        print(f"batches submitted: {len(submitted)}, reports merged: {merged}")
+
+
+if __name__ == "__main__":
+    main()
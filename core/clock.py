@@ -0,0 +1,43 @@
+# clock.py - منبع زمان قابل تزریق برای جلسات، آزمایش‌ها و بنچمارک‌ها
+
+import time
+from abc import ABC, abstractmethod
+
+
+class Clock(ABC):
+    """منبع زمان جلسه؛ مقدار آن همان مقیاس time.time() (ثانیه) است"""
+
+    @abstractmethod
+    def time(self) -> float:
+        pass
+
+
+class SystemClock(Clock):
+    """زمان واقعی سیستم"""
+
+    def time(self) -> float:
+        return time.time()
+
+
+class VirtualClock(Clock):
+    """زمان مجازی که فقط با advance جلو می‌رود
+
+    با آن می‌توان کل مراحل یک جلسه را بدون انتظار واقعی و با نتیجه تکرارپذیر اجرا کرد.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = float(start)
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> float:
+        """جلو بردن زمان؛ زمان جدید برگردانده می‌شود"""
+        if seconds < 0:
+            raise ValueError("VirtualClock cannot move backwards")
+        self.now += seconds
+        return self.now
+
+
+# ساعت پیش‌فرض همه جلسات
+SYSTEM_CLOCK = SystemClock()
@@ -1,14 +1,22 @@
 # conversation.py - مدیریت گفتگو و جلسه مذاکره
 
 from typing import Dict, List, Optional
-import time
 import json
+import uuid
 from datetime import datetime
 from enum import Enum
 from .agents import (
     Agent, ConservativeInvestor, RiskyInvestor,
     Competitor, Evaluator, AgentRole
 )
+from .rate_limiter import RateLimitExceeded
+from .evaluation_worker import get_evaluation_worker
+from .amounts import extract_deal_terms
+from .clock import Clock, SYSTEM_CLOCK
+from .usage_ledger import UsageLedger
+from .event_bus import get_event_bus
+from .persistent import PersistentList
+from .generation_profiles import select_profile
 
 
 class SessionPhase(Enum):
@@ -19,22 +27,65 @@ class SessionPhase(Enum):
     COMPLETED = "completed"
 
 
+# مدت هر مرحله؛ بین همه جلسات مشترک است و نباید تغییر کند
+PHASE_DURATIONS = {
+    SessionPhase.INTRODUCTION: 120,  # 2 minutes
+    SessionPhase.FINANCIAL_QUESTIONS: 180,  # 3 minutes
+    SessionPhase.COMPETITIVE_CHALLENGE: 180,  # 3 minutes
+    SessionPhase.FINAL_NEGOTIATION: 120,  # 2 minutes
+}
+
+# متن‌های ثابت جلسه؛ صدای آن‌ها از پیش در phrase_bank ساخته می‌شود
+PHASE_TRANSITION_MESSAGES = {
+    SessionPhase.FINANCIAL_QUESTIONS: "حالا به بخش سوالات مالی می‌رویم. آقای محمدی، لطفا سوالات خود را مطرح کنید.",
+    SessionPhase.COMPETITIVE_CHALLENGE: "اکنون آقای رضایی از استارتاپ رقیب وارد بحث می‌شود.",
+    SessionPhase.FINAL_NEGOTIATION: "زمان مذاکره نهایی فرا رسیده است. هر دو سرمایه‌گذار آماده تصمیم‌گیری هستند.",
+    SessionPhase.COMPLETED: "جلسه به پایان رسید. در حال آماده‌سازی گزارش نهایی..."
+}
+
+WELCOME_MESSAGE = """
+خوش آمدید به کارگاه مذاکره جذب سرمایه!
+
+شما در نقش بنیان‌گذار یک استارتاپ EdTech هستید که قصد جذب ۵۰ میلیارد تومان سرمایه دارید.
+در این جلسه با سه نفر روبرو خواهید شد:
+1. آقای محمدی - سرمایه‌گذار محتاط
+2. خانم اکبری - سرمایه‌گذار ریسک‌پذیر
+3. آقای رضایی - بنیان‌گذار استارتاپ رقیب
+
+جلسه شامل ۴ مرحله است:
+1. معرفی (۲ دقیقه)
+2. سوالات مالی (۳ دقیقه)
+3. چالش رقابتی (۳ دقیقه)
+4. مذاکره نهایی (۲ دقیقه)
+
+لطفا با معرفی کوتاه استارتاپ خود شروع کنید...
+"""
+
+
 class ConversationManager:
     """مدیریت جلسه مذاکره و هماهنگی بین عوامل"""
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, async_evaluation: bool = True, clock: Optional[Clock] = None):
         self.api_key = api_key
+        self.session_id = uuid.uuid4().hex
+        self.async_evaluation = async_evaluation
+        self.clock = clock or SYSTEM_CLOCK
         self.agents: Dict[AgentRole, Agent] = {}
         self.current_phase = SessionPhase.INTRODUCTION
-        self.phase_start_time = time.time()
-        self.session_start_time = time.time()
-        self.conversation_log: List[Dict] = []
-        self.phase_durations = {
-            SessionPhase.INTRODUCTION: 120,  # 2 minutes
-            SessionPhase.FINANCIAL_QUESTIONS: 180,  # 3 minutes
-            SessionPhase.COMPETITIVE_CHALLENGE: 180,  # 3 minutes
-            SessionPhase.FINAL_NEGOTIATION: 120,  # 2 minutes
-        }
+        self.phase_start_time = self.clock.time()
+        self.session_start_time = self.clock.time()
+        self.conversation_log: PersistentList = PersistentList()
+        self.usage = UsageLedger(self.session_id)
+        self.event_seq = 0
+        # checkpoints[n] وضعیت جلسه پس از n نوبت کاربر است؛ برای fork از هر نوبت
+        self.checkpoints: PersistentList = PersistentList()
+        self.evaluated_turns = 0
+        self.forked_from: Optional[Dict] = None
+        # بازخوردهای آماده‌ای که پیش از ذخیره جلسه روی دیسک از صف ارزیابی برداشته شده‌اند
+        self.held_evaluations: List[Dict] = []
+        self.phase_durations = PHASE_DURATIONS
+        # در حالت صوتی پاسخ‌ها با پروفایل کوتاه‌تر تولید می‌شوند تا TTS و پخش سریع‌تر باشد
+        self.voice_mode = False
         self.user_profile = {
             "investment_requested": 50_000_000_000,  # 50 میلیارد تومان
             "equity_offered": 30,  # درصد سهام پیشنهادی
@@ -49,7 +100,13 @@ class ConversationManager:
         self.agents[AgentRole.CONSERVATIVE_INVESTOR] = ConservativeInvestor(self.api_key)
         self.agents[AgentRole.RISKY_INVESTOR] = RiskyInvestor(self.api_key)
         self.agents[AgentRole.COMPETITOR] = Competitor(self.api_key)
-        self.agents[AgentRole.EVALUATOR] = Evaluator(self.api_key)
+        self.agents[AgentRole.EVALUATOR] = Evaluator(self.api_key, clock=self.clock)
+        for agent in self.agents.values():
+            agent.usage = self.usage
+
+    def record_usage(self, kind: str, role: str, **amounts):
+        """ثبت مصرف TTS/STT در مرحله فعلی جلسه"""
+        self.usage.record(kind, role, self.current_phase.value, **amounts)
 
     def get_current_speaker(self) -> AgentRole:
         """تعیین اینکه کدام عامل باید صحبت کند"""
@@ -69,7 +126,7 @@ class ConversationManager:
 
     def check_phase_transition(self) -> bool:
         """بررسی و انتقال به مرحله بعدی در صورت نیاز"""
-        current_time = time.time()
+        current_time = self.clock.time()
         elapsed_time = current_time - self.phase_start_time
 
         if self.current_phase in self.phase_durations:
@@ -91,7 +148,8 @@ class ConversationManager:
         current_index = phase_order.index(self.current_phase)
         if current_index < len(phase_order) - 1:
             self.current_phase = phase_order[current_index + 1]
-            self.phase_start_time = time.time()
+            self.phase_start_time = self.clock.time()
+            self.publish_event("phase", phase=self.current_phase.value)
 
             # اعلام تغییر مرحله
             transition_message = self.get_phase_transition_message()
@@ -102,18 +160,14 @@ class ConversationManager:
 
     def get_phase_transition_message(self) -> str:
         """پیام انتقال بین مراحل"""
-        messages = {
-            SessionPhase.FINANCIAL_QUESTIONS: "حالا به بخش سوالات مالی می‌رویم. آقای محمدی، لطفا سوالات خود را مطرح کنید.",
-            SessionPhase.COMPETITIVE_CHALLENGE: "اکنون آقای رضایی از استارتاپ رقیب وارد بحث می‌شود.",
-            SessionPhase.FINAL_NEGOTIATION: "زمان مذاکره نهایی فرا رسیده است. هر دو سرمایه‌گذار آماده تصمیم‌گیری هستند.",
-            SessionPhase.COMPLETED: "جلسه به پایان رسید. در حال آماده‌سازی گزارش نهایی..."
-        }
-        return messages.get(self.current_phase, "")
+        return PHASE_TRANSITION_MESSAGES.get(self.current_phase, "")
 
     def process_user_input(self, user_message: str) -> List[Dict]:
         """پردازش ورودی کاربر و تولید پاسخ‌های عوامل"""
         responses = []
 
+        self.checkpoints.append(self.checkpoint())
+
         # ثبت پیام کاربر
         self.add_user_message(user_message)
 
@@ -122,28 +176,48 @@ class ConversationManager:
             responses.append({
                 "agent": "system",
                 "message": self.get_phase_transition_message(),
-                "timestamp": time.time()
+                "timestamp": self.clock.time()
             })
 
         # دریافت پاسخ از عوامل فعال در این مرحله
         active_agents = self.get_active_agents()
 
         for agent_role in active_agents:
+            # پاسخ ارزیاب در صف پس‌زمینه تولید می‌شود
+            if self.async_evaluation and agent_role == AgentRole.EVALUATOR:
+                continue
+
             agent = self.agents[agent_role]
 
             # ارسال زمینه به عامل
             context = self.get_agent_context(agent_role)
 
             # دریافت پاسخ
-            response = agent.generate_response(user_message, context)
+            try:
+                response = agent.generate_response(user_message, context)
+            except RateLimitExceeded as e:
+                responses.append({
+                    "agent": agent.name,
+                    "role": agent_role.value,
+                    "message": f"سرویس در حال حاضر شلوغ است. لطفا {e.retry_after:.0f} ثانیه دیگر دوباره تلاش کنید.",
+                    "type": "rate_limited",
+                    "retry_after": e.retry_after,
+                    "timestamp": self.clock.time()
+                })
+                continue
 
+            reply = agent.last_reply or {}
             responses.append({
                 "agent": agent.name,
                 "role": agent_role.value,
                 "message": response,
                 "state": agent.state.value,
                 "satisfaction": agent.satisfaction_level,
-                "timestamp": time.time()
+                "agreement": reply.get("agrees"),
+                "proposed_investment": reply.get("proposed_investment"),
+                "proposed_equity": reply.get("proposed_equity"),
+                "sentiment": reply.get("sentiment"),
+                "timestamp": self.clock.time()
             })
 
             # ثبت در لاگ
@@ -151,6 +225,15 @@ class ConversationManager:
 
         # ارزیابی توسط عامل ارزیاب
         if self.current_phase != SessionPhase.COMPLETED:
+            self.evaluated_turns += 1
+        if self.current_phase != SessionPhase.COMPLETED and self.async_evaluation:
+            get_evaluation_worker().submit(self.session_id, self.agents[AgentRole.EVALUATOR], {
+                "user_message": user_message,
+                "agent_responses": {r["agent"]: r["message"] for r in responses},
+                "context": self.get_agent_context(AgentRole.EVALUATOR),
+                "llm_reply": AgentRole.EVALUATOR in active_agents
+            })
+        elif self.current_phase != SessionPhase.COMPLETED:
             evaluator = self.agents[AgentRole.EVALUATOR]
             evaluation = evaluator.evaluate_response(
                 user_message,
@@ -163,7 +246,7 @@ class ConversationManager:
                     "role": "evaluator",
                     "message": evaluation["feedback"],
                     "type": "evaluation",
-                    "timestamp": time.time()
+                    "timestamp": self.clock.time()
                 })
 
         # در مرحله نهایی، بررسی بسته شدن معامله
@@ -172,6 +255,98 @@ class ConversationManager:
 
         return responses
 
+    @property
+    def turns(self) -> int:
+        """تعداد نوبت‌های کاربر تا این لحظه"""
+        return len(self.checkpoints)
+
+    def checkpoint(self) -> Dict:
+        """وضعیت فعلی جلسه؛ از لاگ و تاریخچه‌ها فقط طول ذخیره می‌شود"""
+        return {
+            "time": self.clock.time(),
+            "phase": self.current_phase,
+            "phase_start_time": self.phase_start_time,
+            "log_length": len(self.conversation_log),
+            "user_profile": dict(self.user_profile),
+            "evaluated_turns": self.evaluated_turns,
+            "agents": {
+                role: agent.checkpoint()
+                for role, agent in self.agents.items()
+                if role != AgentRole.EVALUATOR
+            }
+        }
+
+    def fork(self, turn: Optional[int] = None) -> "ConversationManager":
+        """جلسه مستقل از وضعیت پس از turn نوبت کاربر (پیش‌فرض: وضعیت فعلی)
+
+        لاگ، تاریخچه عوامل و وضعیت ارزیاب بدون کپی با جلسه اصلی مشترک می‌مانند؛
+        هزینه fork به طول گفتگو بستگی ندارد. زمان‌های مرحله جابه‌جا می‌شوند تا
+        fork با همان زمان سپری‌شده نوبت turn ادامه پیدا کند.
+        """
+        if self.async_evaluation:
+            # وضعیت ارزیاب و پاسخ‌های آن باید پیش از fork کامل باشند
+            get_evaluation_worker().wait_idle(self.session_id, timeout=30)
+            self.poll_evaluations()
+
+        turn = self.turns if turn is None else turn
+        if not 0 <= turn <= self.turns:
+            raise ValueError(f"turn must be between 0 and {self.turns}")
+        checkpoint = self.checkpoint() if turn == self.turns else self.checkpoints[turn]
+        shift = self.clock.time() - checkpoint["time"]
+
+        clone = object.__new__(ConversationManager)
+        clone.api_key = self.api_key
+        clone.session_id = uuid.uuid4().hex
+        clone.async_evaluation = self.async_evaluation
+        clone.clock = self.clock
+        clone.current_phase = checkpoint["phase"]
+        clone.phase_start_time = checkpoint["phase_start_time"] + shift
+        clone.session_start_time = self.session_start_time + shift
+        clone.conversation_log = self.conversation_log.fork(checkpoint["log_length"])
+        clone.usage = UsageLedger(clone.session_id)
+        clone.event_seq = 0
+        clone.checkpoints = self.checkpoints.fork(turn)
+        clone.evaluated_turns = checkpoint["evaluated_turns"]
+        clone.forked_from = {"session_id": self.session_id, "turn": turn}
+        clone.held_evaluations = []
+        clone.phase_durations = self.phase_durations
+        clone.voice_mode = self.voice_mode
+        clone.user_profile = dict(checkpoint["user_profile"])
+        clone.agents = {
+            role: agent.fork(checkpoint["agents"][role])
+            for role, agent in self.agents.items()
+            if role != AgentRole.EVALUATOR
+        }
+        clone.agents[AgentRole.EVALUATOR] = self.agents[AgentRole.EVALUATOR].fork_at(checkpoint["evaluated_turns"])
+        for agent in clone.agents.values():
+            agent.usage = clone.usage
+        return clone
+
+    def poll_evaluations(self) -> List[Dict]:
+        """دریافت بازخوردهای آماده از صف ارزیابی پس‌زمینه"""
+        if not self.async_evaluation:
+            return []
+
+        held, self.held_evaluations = self.held_evaluations, []
+        results = held + get_evaluation_worker().poll(self.session_id)
+        for result in results:
+            if result.get("type") != "evaluation":
+                self.add_agent_message(result["agent"], result["message"])
+        return results
+
+    def has_pending_evaluations(self) -> bool:
+        """آیا ارزیابی در حال انجام یا بازخورد آماده‌ای وجود دارد"""
+        if not self.async_evaluation:
+            return False
+        worker = get_evaluation_worker()
+        return (bool(self.held_evaluations) or worker.pending(self.session_id) > 0
+                or worker.has_results(self.session_id))
+
+    def hold_evaluations(self):
+        """انتقال بازخوردهای آماده از صف مشترک ارزیابی به خود جلسه (پیش از ذخیره روی دیسک)"""
+        if self.async_evaluation:
+            self.held_evaluations.extend(get_evaluation_worker().discard(self.session_id))
+
     def get_active_agents(self) -> List[AgentRole]:
         """تعیین عوامل فعال در مرحله جاری"""
         active_agents = []
@@ -192,9 +367,10 @@ class ConversationManager:
         """دریافت زمینه مناسب برای هر عامل"""
         context = {
             "current_phase": self.current_phase.value,
-            "elapsed_time": time.time() - self.session_start_time,
-            "phase_time": time.time() - self.phase_start_time,
+            "elapsed_time": self.clock.time() - self.session_start_time,
+            "phase_time": self.clock.time() - self.phase_start_time,
             "user_profile": self.user_profile,
+            "generation_profile": select_profile(self.voice_mode, self.current_phase.value),
             "other_agents_states": {}
         }
 
@@ -213,66 +389,81 @@ class ConversationManager:
         # کلمات کلیدی برای تشخیص توافق
         agreement_keywords = ["موافقم", "قبول", "توافق", "می‌پذیرم", "باشه", "خوبه"]
 
-        # بررسی پیام کاربر برای اعداد
-        import re
-        numbers = re.findall(r'\d+', user_message)
-
-        # اگر کاربر اعداد جدیدی پیشنهاد داده
-        if numbers:
-            for num in numbers:
-                num = int(num)
-                if num > 1000000000:  # احتمالا مبلغ سرمایه است
-                    self.user_profile["final_investment"] = num
-                elif num <= 100:  # احتمالا درصد سهام است
-                    self.user_profile["final_equity"] = num
+        # اگر کاربر مبلغ یا درصد جدیدی پیشنهاد داده (ارقام فارسی، جداکننده و میلیون/میلیارد)
+        terms = extract_deal_terms(user_message)
+        if terms["investment"] is not None:
+            self.user_profile["final_investment"] = terms["investment"]
+        if terms["equity"] is not None:
+            self.user_profile["final_equity"] = terms["equity"]
 
-        # بررسی توافق سرمایه‌گذاران
+        # بررسی توافق سرمایه‌گذاران؛ فیلد ساختاریافته agreement در صورت وجود
+        # معتبر است و جست‌وجوی کلمات کلیدی فقط برای پاسخ‌های متنی ساده است
         conservative_agrees = False
         risky_agrees = False
+        investor_roles = (AgentRole.CONSERVATIVE_INVESTOR.value, AgentRole.RISKY_INVESTOR.value)
 
         for response in responses:
+            if response.get("role") not in investor_roles:
+                continue
+
+            agrees = response.get("agreement")
+            if agrees is None:
+                agrees = any(keyword in response["message"].lower() for keyword in agreement_keywords)
+            if not agrees:
+                continue
+
             if response["role"] == AgentRole.CONSERVATIVE_INVESTOR.value:
-                if any(keyword in response["message"].lower() for keyword in agreement_keywords):
-                    conservative_agrees = True
-            elif response["role"] == AgentRole.RISKY_INVESTOR.value:
-                if any(keyword in response["message"].lower() for keyword in agreement_keywords):
-                    risky_agrees = True
+                conservative_agrees = True
+            else:
+                risky_agrees = True
+
+            # اگر کاربر مبلغی نگفته، پیشنهاد سرمایه‌گذار موافق مبنای معامله است
+            if terms["investment"] is None and response.get("proposed_investment"):
+                self.user_profile["final_investment"] = response["proposed_investment"]
+            if terms["equity"] is None and response.get("proposed_equity"):
+                self.user_profile["final_equity"] = response["proposed_equity"]
 
         # اگر حداقل یک سرمایه‌گذار موافق باشد و مبلغ مشخص شده باشد
         if (conservative_agrees or risky_agrees) and self.user_profile["final_investment"] > 0:
             self.user_profile["deal_closed"] = True
             self.current_phase = SessionPhase.COMPLETED
+            self.publish_event("deal", investment=self.user_profile["final_investment"],
+                               equity=self.user_profile["final_equity"])
 
     def add_user_message(self, message: str):
         """افزودن پیام کاربر به لاگ"""
-        self.conversation_log.append({
-            "sender": "user",
-            "message": message,
-            "timestamp": time.time(),
-            "phase": self.current_phase.value
-        })
+        self._log("user", message)
 
     def add_agent_message(self, agent_name: str, message: str):
         """افزودن پیام عامل به لاگ"""
-        self.conversation_log.append({
-            "sender": agent_name,
-            "message": message,
-            "timestamp": time.time(),
-            "phase": self.current_phase.value
-        })
+        self._log(agent_name, message)
 
     def add_system_message(self, message: str):
         """افزودن پیام سیستم به لاگ"""
-        self.conversation_log.append({
-            "sender": "system",
+        self._log("system", message)
+
+    def publish_event(self, event_type: str, **fields):
+        """انتشار رویداد جلسه برای بیننده‌های پایش زنده؛ بدون بیننده کاری انجام نمی‌شود"""
+        bus = get_event_bus()
+        if not bus.has_subscribers:
+            return
+        self.event_seq += 1
+        bus.publish({"type": event_type, "session_id": self.session_id, "seq": self.event_seq, **fields})
+
+    def _log(self, sender: str, message: str):
+        entry = {
+            "sender": sender,
             "message": message,
-            "timestamp": time.time(),
+            "timestamp": self.clock.time(),
             "phase": self.current_phase.value
-        })
+        }
+        self.conversation_log.append(entry)
+        # همان مدخل لاگ بدون کپی منتشر می‌شود؛ مدخل‌ها پس از ثبت تغییر نمی‌کنند
+        self.publish_event("message", entry=entry)
 
     def get_session_summary(self) -> Dict:
         """دریافت خلاصه جلسه"""
-        total_duration = time.time() - self.session_start_time
+        total_duration = self.clock.time() - self.session_start_time
 
         # محاسبه میزان موفقیت
         success_rate = 0
@@ -302,6 +493,11 @@ class ConversationManager:
 
     def get_final_report(self) -> Dict:
         """دریافت گزارش نهایی جلسه"""
+        if self.async_evaluation:
+            # ارزیابی‌های در صف باید پیش از گزارش کامل شوند
+            get_evaluation_worker().wait_idle(self.session_id, timeout=30)
+            self.poll_evaluations()
+
         evaluator = self.agents[AgentRole.EVALUATOR]
         evaluation_report = evaluator.generate_final_report()
 
@@ -309,7 +505,7 @@ class ConversationManager:
 
         final_report = {
             "session_info": {
-                "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "date": datetime.fromtimestamp(self.clock.time()).strftime("%Y-%m-%d %H:%M:%S"),
                 "duration": session_summary["duration"],
                 "total_messages": session_summary["message_count"]
             },
@@ -326,12 +522,15 @@ class ConversationManager:
                 role.value: {
                     "final_state": agent.state.value,
                     "satisfaction": agent.satisfaction_level,
-                    "notes": agent.notes
+                    "notes": list(agent.notes)
                 }
                 for role, agent in self.agents.items()
             },
-            "conversation_log": self.conversation_log
+            "usage": self.usage.summary(),
+            "conversation_log": list(self.conversation_log)
         }
+        if self.forked_from is not None:
+            final_report["session_info"]["forked_from"] = self.forked_from
 
         return final_report
 
@@ -385,6 +584,17 @@ class ConversationManager:
         for agent, feedback in report['agents_feedback'].items():
             text += f"{agent}: {feedback['satisfaction']}% ({feedback['final_state']})\n"
 
+        usage = report['usage']['totals']
+        text += f"""
+مصرف
+-----
+فراخوانی‌ها: {usage['calls']}
+توکن ورودی/خروجی: {usage['input_tokens']:,} / {usage['output_tokens']:,}
+کاراکترهای TTS: {usage['tts_chars']:,}
+ثانیه‌های STT: {usage['stt_seconds']:.1f}
+هزینه تخمینی: {usage['cost']:.4f}
+"""
+
         return text
 
     def _format_list(self, items: List[str]) -> str:
@@ -395,31 +605,14 @@ class ConversationManager:
 class NegotiationSession:
     """کلاس اصلی برای مدیریت جلسه مذاکره"""
 
-    def __init__(self, api_key: str):
-        self.conversation_manager = ConversationManager(api_key)
+    def __init__(self, api_key: str, clock: Optional[Clock] = None):
+        self.conversation_manager = ConversationManager(api_key, clock=clock)
         self.is_active = True
 
     def start_session(self):
         """شروع جلسه مذاکره"""
-        welcome_message = """
-خوش آمدید به کارگاه مذاکره جذب سرمایه!
-
-شما در نقش بنیان‌گذار یک استارتاپ EdTech هستید که قصد جذب ۵۰ میلیارد تومان سرمایه دارید.
-در این جلسه با سه نفر روبرو خواهید شد:
-1. آقای محمدی - سرمایه‌گذار محتاط
-2. خانم اکبری - سرمایه‌گذار ریسک‌پذیر
-3. آقای رضایی - بنیان‌گذار استارتاپ رقیب
-
-جلسه شامل ۴ مرحله است:
-1. معرفی (۲ دقیقه)
-2. سوالات مالی (۳ دقیقه)
-3. چالش رقابتی (۳ دقیقه)
-4. مذاکره نهایی (۲ دقیقه)
-
-لطفا با معرفی کوتاه استارتاپ خود شروع کنید...
-"""
-        print(welcome_message)
-        return welcome_message
+        print(WELCOME_MESSAGE)
+        return WELCOME_MESSAGE
 
     def process_input(self, user_input: str) -> List[Dict]:
         """پردازش ورودی کاربر"""
@@ -429,6 +622,21 @@ class NegotiationSession:
 
         return self.conversation_manager.process_user_input(user_input)
 
+    def fork(self, turn: Optional[int] = None) -> "NegotiationSession":
+        """ادامه مستقل جلسه از نوبت turn برای امتحان پاسخ دیگر"""
+        clone = object.__new__(NegotiationSession)
+        clone.conversation_manager = self.conversation_manager.fork(turn)
+        clone.is_active = True
+        return clone
+
+    def poll_feedback(self) -> List[Dict]:
+        """دریافت بازخوردهای آماده ارزیاب"""
+        return self.conversation_manager.poll_evaluations()
+
+    def has_pending_feedback(self) -> bool:
+        """آیا بازخوردی در راه است"""
+        return self.conversation_manager.has_pending_evaluations()
+
     def is_session_active(self) -> bool:
         """بررسی فعال بودن جلسه"""
         return self.is_active and self.conversation_manager.current_phase != SessionPhase.COMPLETED
@@ -0,0 +1,136 @@
+# evaluation_worker.py - اجرای ارزیابی خارج از مسیر پاسخ‌دهی
+
+import os
+import queue
+import threading
+import zlib
+from typing import Dict, List, Optional, Set
+
+from .rate_limiter import RequestPriority, RateLimitExceeded
+
+
+class EvaluationWorker:
+    """صف کاری پس‌زمینه برای ارزیابی نوبت‌ها
+
+    رویدادهای هر جلسه همیشه به یک رشته ثابت می‌روند تا ترتیب ارزیابی
+    و به‌روزرسانی evaluation_metrics حفظ شود؛ جلسات مختلف موازی اجرا می‌شوند.
+    """
+
+    def __init__(self, num_threads: int = 2):
+        self._queues = [queue.Queue() for _ in range(max(1, num_threads))]
+        self._results: Dict[str, List[Dict]] = {}
+        self._pending: Dict[str, int] = {}
+        # جلساتی که کنار گذاشته شده‌اند ولی هنوز ارزیابی در حال اجرا دارند
+        self._discarded: Set[str] = set()
+        self._condition = threading.Condition()
+        self._threads = []
+        for shard in self._queues:
+            thread = threading.Thread(target=self._run, args=(shard,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, session_id: str, evaluator, event: Dict):
+        """ثبت رویداد یک نوبت برای ارزیابی"""
+        with self._condition:
+            self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        shard = zlib.crc32(session_id.encode("utf-8")) % len(self._queues)
+        self._queues[shard].put((session_id, evaluator, event))
+
+    def poll(self, session_id: str) -> List[Dict]:
+        """دریافت بازخوردهای آماده یک جلسه"""
+        with self._condition:
+            return self._results.pop(session_id, [])
+
+    def discard(self, session_id: str) -> List[Dict]:
+        """کنار گذاشتن نتایج جلسه‌ای که دیگر poll نمی‌شود؛ نتایج آماده برگردانده می‌شوند
+
+        نتیجه ارزیابی‌هایی که هنوز در حال اجرا هستند پس از پایان دور ریخته می‌شود.
+        """
+        with self._condition:
+            if self._pending.get(session_id):
+                self._discarded.add(session_id)
+            return self._results.pop(session_id, [])
+
+    def has_results(self, session_id: str) -> bool:
+        """آیا بازخورد آماده‌ای برای جلسه وجود دارد"""
+        with self._condition:
+            return bool(self._results.get(session_id))
+
+    def pending(self, session_id: str) -> int:
+        """تعداد رویدادهای در انتظار ارزیابی"""
+        with self._condition:
+            return self._pending.get(session_id, 0)
+
+    def wait_idle(self, session_id: str, timeout: Optional[float] = None) -> bool:
+        """انتظار تا تمام شدن ارزیابی‌های یک جلسه"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending.get(session_id), timeout)
+
+    def _run(self, shard: queue.Queue):
+        while True:
+            session_id, evaluator, event = shard.get()
+            try:
+                results = self._evaluate(evaluator, event)
+            except Exception as e:
+                results = [{
+                    "agent": evaluator.name,
+                    "role": "evaluator",
+                    "message": f"خطا در ارزیابی: {str(e)}",
+                    "type": "evaluation",
+                    "timestamp": evaluator.clock.time()
+                }]
+
+            with self._condition:
+                if session_id not in self._discarded:
+                    self._results.setdefault(session_id, []).extend(results)
+                self._pending[session_id] -= 1
+                if not self._pending[session_id]:
+                    del self._pending[session_id]
+                    self._discarded.discard(session_id)
+                self._condition.notify_all()
+
+    def _evaluate(self, evaluator, event: Dict) -> List[Dict]:
+        """ارزیابی یک نوبت؛ در صورت نیاز پاسخ LLM ارزیاب هم تولید می‌شود"""
+        results = []
+
+        if event.get("llm_reply"):
+            try:
+                reply = evaluator.generate_response(
+                    event["user_message"], event["context"], priority=RequestPriority.BACKGROUND
+                )
+                results.append({
+                    "agent": evaluator.name,
+                    "role": "evaluator",
+                    "message": reply,
+                    "state": evaluator.state.value,
+                    "satisfaction": evaluator.satisfaction_level,
+                    "timestamp": evaluator.clock.time()
+                })
+            except RateLimitExceeded:
+                # پاسخ ارزیاب اختیاری است و در شلوغی حذف می‌شود
+                pass
+
+        evaluation = evaluator.evaluate_response(event["user_message"], event["agent_responses"])
+        if evaluation["feedback"]:
+            results.append({
+                "agent": evaluator.name,
+                "role": "evaluator",
+                "message": evaluation["feedback"],
+                "type": "evaluation",
+                "timestamp": evaluator.clock.time()
+            })
+
+        return results
+
+
+_worker: Optional[EvaluationWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_evaluation_worker() -> EvaluationWorker:
+    """صف ارزیابی مشترک کل فرایند"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = EvaluationWorker(int(os.getenv("EVALUATION_WORKERS", "2")))
+        return _worker
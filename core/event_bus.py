@@ -0,0 +1,135 @@
+# event_bus.py - انتشار رویدادهای پیام و مرحله جلسات برای پایش زنده
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class Subscription:
+    """صف محدود رویدادهای یک بیننده
+
+    اگر بیننده از انتشار عقب بماند، قدیمی‌ترین رویدادها دور ریخته می‌شوند و
+    resync علامت می‌خورد تا بیننده به جای دریافت دوباره رویدادها، یک خلاصه
+    سبک از وضعیت جلسات بگیرد. انتشار هیچ‌وقت منتظر بیننده کند نمی‌ماند.
+    """
+
+    def __init__(self, session_ids: Optional[Iterable[str]] = None, max_pending: int = 500):
+        self.session_ids = set(session_ids) if session_ids is not None else None
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.closed = False
+        self.last_poll = time.monotonic()
+        self._events: deque = deque()
+        self._resync = False
+
+    def wants(self, session_id: str) -> bool:
+        return self.session_ids is None or session_id in self.session_ids
+
+    def _offer(self, event: Dict):
+        if len(self._events) >= self.max_pending:
+            self._events.popleft()
+            self.dropped += 1
+            self._resync = True
+        self._events.append(event)
+
+
+class EventBus:
+    """انتشار رویدادهای جلسات به همه بیننده‌ها
+
+    هر رویداد یک dict کوچک و تغییرناپذیر است که بدون کپی به صف همه
+    بیننده‌های علاقه‌مند اضافه می‌شود؛ هزینه هر انتشار O(تعداد بیننده‌ها) است.
+    بیننده‌ای که مدت idle_timeout صف خود را نخوانده (مثلا تب بسته شده) حذف می‌شود.
+    """
+
+    def __init__(self, max_pending: int = 500, idle_timeout: float = 120.0):
+        self.max_pending = max_pending
+        self.idle_timeout = idle_timeout
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self, session_ids: Optional[Iterable[str]] = None) -> Subscription:
+        """ثبت بیننده برای همه جلسات یا فهرست مشخصی از آن‌ها"""
+        subscription = Subscription(session_ids, self.max_pending)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+            subscription.closed = True
+
+    def publish(self, event: Dict):
+        """ارسال رویداد؛ بدون بیننده تقریبا هزینه‌ای ندارد"""
+        if not self._subscribers:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self.published += 1
+            expired = []
+            for subscription in self._subscribers:
+                if now - subscription.last_poll > self.idle_timeout:
+                    expired.append(subscription)
+                elif subscription.wants(event["session_id"]):
+                    subscription._offer(event)
+            for subscription in expired:
+                self._subscribers.remove(subscription)
+                subscription.closed = True
+
+    def poll(self, subscription: Subscription, max_items: int = 200) -> Tuple[List[Dict], bool]:
+        """رویدادهای جدید بیننده و اینکه آیا باید از خلاصه وضعیت همگام شود"""
+        with self._lock:
+            subscription.last_poll = time.monotonic()
+            count = min(max_items, len(subscription._events))
+            events = [subscription._events.popleft() for _ in range(count)]
+            resync = subscription._resync
+            subscription._resync = False
+        return events, resync
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "pending": sum(len(subscription._events) for subscription in self._subscribers),
+                "dropped": sum(subscription.dropped for subscription in self._subscribers)
+            }
+
+
+def session_snapshot(manager, tail: int = 5) -> Dict:
+    """وضعیت سبک یک جلسه برای بیننده تازه یا عقب‌مانده؛ فقط چند پیام آخر"""
+    return {
+        "session_id": manager.session_id,
+        "seq": manager.event_seq,
+        "phase": manager.current_phase.value,
+        "message_count": len(manager.conversation_log),
+        "messages": list(manager.conversation_log[-tail:]),
+        "deal_closed": manager.user_profile["deal_closed"]
+    }
+
+
+_bus: Optional[EventBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """گذرگاه مشترک کل فرایند"""
+    global _bus
+    if _bus is not None:
+        return _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = EventBus(
+                max_pending=int(os.getenv("MONITOR_MAX_PENDING", "500")),
+                idle_timeout=float(os.getenv("MONITOR_IDLE_SECONDS", "120")),
+            )
+        return _bus
@@ -0,0 +1,60 @@
+# generation_profiles.py - بودجه تولید پاسخ عوامل براساس حالت جلسه (متنی/صوتی) و مرحله
+
+from typing import Dict, Optional
+
+from .prompts import count_tokens
+
+
+class GenerationProfile:
+    """بودجه یک نوبت تولید: سقف توکن، دما، طول هدف گفتاری و دستور سبک
+
+    max_tokens سقف سخت خروجی است و شامل سربار JSON پاسخ ساختاریافته هم می‌شود؛
+    طول واقعی پاسخ را دستور سبک (directive) کنترل می‌کند که به صورت یک پیام
+    سیستم کوتاه به پرامپت اضافه می‌شود. بدون target_chars دستوری اضافه نمی‌شود
+    و پرامپت همان پرامپت قبلی است.
+    """
+
+    __slots__ = ("name", "max_tokens", "temperature", "target_chars", "directive")
+
+    def __init__(self, name: str, max_tokens: int, temperature: float = 0.7,
+                 target_chars: Optional[int] = None):
+        self.name = name
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.target_chars = target_chars
+        self.directive = spoken_style_directive(target_chars) if target_chars else None
+
+    def __repr__(self) -> str:
+        return f"GenerationProfile({self.name!r}, max_tokens={self.max_tokens}, target_chars={self.target_chars})"
+
+    @property
+    def directive_tokens(self) -> int:
+        return count_tokens(self.directive) if self.directive else 0
+
+
+def spoken_style_directive(target_chars: int) -> str:
+    """دستور سبک پاسخ‌هایی که با TTS پخش می‌شوند"""
+    return (f"پاسخ شما با صدا پخش می‌شود. متن reply را در یک یا دو جمله کوتاه و حداکثر "
+            f"حدود {target_chars} نویسه بنویسید؛ بدون مقدمه، فهرست، عنوان یا تکرار حرف طرف مقابل. "
+            f"فقط مهم‌ترین سوال یا نکته خود را بگویید.")
+
+
+# حالت متنی همان تنظیمات پیشین عوامل است
+TEXT_PROFILE = GenerationProfile("text", max_tokens=300)
+
+# حالت صوتی؛ طول هدف کمتر از VOICE_MAX_TTS_CHARS (پیش‌فرض ۴۰۰) است تا پاسخ بی‌صدا نماند.
+# مراحل مالی و مذاکره نهایی برای عدد و شرط کمی جای بیشتری دارند.
+VOICE_PROFILES: Dict[str, GenerationProfile] = {
+    "introduction": GenerationProfile("voice:introduction", max_tokens=160, target_chars=200),
+    "financial_questions": GenerationProfile("voice:financial_questions", max_tokens=200, target_chars=260),
+    "competitive_challenge": GenerationProfile("voice:competitive_challenge", max_tokens=170, target_chars=220),
+    "final_negotiation": GenerationProfile("voice:final_negotiation", max_tokens=200, target_chars=260),
+}
+VOICE_DEFAULT_PROFILE = VOICE_PROFILES["introduction"]
+
+
+def select_profile(voice_mode: bool, phase: str) -> GenerationProfile:
+    """پروفایل نوبت براساس حالت صوتی جلسه و مقدار SessionPhase"""
+    if not voice_mode:
+        return TEXT_PROFILE
+    return VOICE_PROFILES.get(phase, VOICE_DEFAULT_PROFILE)
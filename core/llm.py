@@ -0,0 +1,108 @@
+# llm.py - ساخت تنبل کلاینت‌های مدل زبانی
+
+import os
+import threading
+import time
+from typing import Dict, List
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_BASE_URL = "https://api.avalai.ir/v1"
+
+
+class ChatResponse:
+    """پاسخ یکسان برای هر دو مسیر کلاینت (همان فیلدهای پاسخ langchain)"""
+
+    def __init__(self, content: str, usage_metadata: Dict, latency: float = 0.0):
+        self.content = content
+        self.usage_metadata = usage_metadata
+        self.latency = latency
+
+
+class OpenAIChatClient:
+    """مسیر مستقیم با SDK رسمی openai، بدون بارگذاری langchain"""
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, base_url: str = DEFAULT_BASE_URL,
+                 temperature: float = 0.7, max_tokens: int = 300):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def invoke(self, messages: List[Dict], **kwargs) -> ChatResponse:
+        """max_tokens و temperature فراخوانی می‌توانند تنظیمات کلاینت را جایگزین کنند"""
+        started = time.perf_counter()
+        params = {"temperature": self.temperature, "max_tokens": self.max_tokens, **kwargs}
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            **params
+        )
+        usage = completion.usage
+        usage_metadata = {}
+        if usage is not None:
+            usage_metadata = {
+                "input_tokens": usage.prompt_tokens,
+                "output_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens
+            }
+        return ChatResponse(
+            completion.choices[0].message.content or "",
+            usage_metadata,
+            time.perf_counter() - started
+        )
+
+
+def client_backend() -> str:
+    """نوع کلاینت فعال: langchain یا openai"""
+    return os.getenv("LLM_CLIENT", "langchain").lower()
+
+
+def create_chat_client(api_key: str, model: str = DEFAULT_MODEL, base_url: str = DEFAULT_BASE_URL,
+                       temperature: float = 0.7, max_tokens: int = 300):
+    """ساخت کلاینت براساس LLM_CLIENT؛ import کتابخانه تا اولین فراخوانی به تعویق می‌افتد"""
+    if client_backend() == "openai":
+        return OpenAIChatClient(api_key, model, base_url, temperature, max_tokens)
+
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, base_url=base_url, api_key=api_key,
+                      temperature=temperature, max_tokens=max_tokens)
+
+
+_clients: Dict[tuple, object] = {}
+_clients_lock = threading.Lock()
+
+
+def _client_key(api_key: str, model: str, base_url: str, temperature: float, max_tokens: int) -> tuple:
+    return (client_backend(), api_key, model, base_url, temperature, max_tokens)
+
+
+def get_shared_client(api_key: str, model: str = DEFAULT_MODEL, base_url: str = DEFAULT_BASE_URL,
+                      temperature: float = 0.7, max_tokens: int = 300):
+    """کلاینت مشترک بین همه عوامل و جلسات با تنظیمات یکسان"""
+    key = _client_key(api_key, model, base_url, temperature, max_tokens)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _create_shared_client(api_key, model, base_url, temperature, max_tokens)
+                _clients[key] = client
+    return client
+
+
+def _create_shared_client(api_key: str, model: str, base_url: str, temperature: float, max_tokens: int):
+    """با تنظیم LLM_ENDPOINTS، مسیریاب چند سرویس‌دهنده؛ در غیر این صورت یک کلاینت ساده"""
+    from .llm_router import build_router, load_endpoint_config
+
+    config = load_endpoint_config()
+    if config:
+        return build_router(api_key, config, create_chat_client, temperature, max_tokens)
+    return create_chat_client(api_key, model, base_url, temperature, max_tokens)
+
+
+def install_client(client, api_key: str, model: str = DEFAULT_MODEL, base_url: str = DEFAULT_BASE_URL,
+                   temperature: float = 0.7, max_tokens: int = 300):
+    """ثبت کلاینت دلخواه (مثلا جایگزین آزمایشی) در مخزن مشترک"""
+    with _clients_lock:
+        _clients[_client_key(api_key, model, base_url, temperature, max_tokens)] = client
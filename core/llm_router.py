@@ -0,0 +1,223 @@
+# llm_router.py - مسیریابی براساس تاخیر و درخواست‌های hedged بین چند سرویس‌دهنده LLM
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from .llm import ChatResponse
+
+# تعداد نمونه‌های اخیر برای محاسبه تاخیر و نرخ خطای هر سرویس‌دهنده
+WINDOW_SIZE = 200
+# پیش از این تعداد نمونه، p95 قابل اتکا نیست و از تاخیر پیش‌فرض hedge استفاده می‌شود
+MIN_SAMPLES = 20
+
+
+class Endpoint:
+    """یک سرویس‌دهنده سازگار با OpenAI با آمار غلتان تاخیر و خطا"""
+
+    def __init__(self, name: str, client, max_error_rate: float = 0.5, cooldown: float = 30.0):
+        self.name = name
+        self.client = client
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.latencies: deque = deque(maxlen=WINDOW_SIZE)
+        self.outcomes: deque = deque(maxlen=WINDOW_SIZE)
+        self.down_until = 0.0
+        self.calls = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self.calls += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+            elif len(self.outcomes) >= 5 and self.error_rate() > self.max_error_rate:
+                # تا پایان cooldown ترافیکی به این سرویس‌دهنده نمی‌رود، سپس دوباره امتحان می‌شود
+                self.down_until = time.monotonic() + self.cooldown
+                self.outcomes.clear()
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """چندک تاخیر موفق؛ با نمونه ناکافی None"""
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def expected_latency(self) -> float:
+        """معیار رتبه‌بندی؛ سرویس‌دهنده بدون آمار کافی اول امتحان می‌شود"""
+        median = self.quantile(0.5)
+        if median is None:
+            return 0.0
+        return median * (1.0 + self.error_rate())
+
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "error_rate": self.error_rate(),
+            "healthy": self.is_healthy(),
+            "hedge_wins": self.hedge_wins
+        }
+
+
+class LLMRouter:
+    """کلاینت ترکیبی با همان رابط invoke
+
+    هر فراخوانی به سریع‌ترین سرویس‌دهنده سالم می‌رود. اگر پاسخ از p95 همان
+    سرویس‌دهنده دیرتر شود، درخواست تکراری به گزینه بعدی فرستاده می‌شود و
+    اولین پاسخ موفق برمی‌گردد؛ درخواست بازنده اگر هنوز شروع نشده لغو و در غیر
+    این صورت نادیده گرفته می‌شود. خطای یک سرویس‌دهنده به گزینه بعدی منتقل می‌شود.
+    """
+
+    def __init__(self, endpoints: List[Endpoint], hedging: bool = True,
+                 hedge_quantile: float = 0.95, default_hedge_delay: float = 2.0, max_workers: int = 32):
+        if not endpoints:
+            raise ValueError("LLMRouter needs at least one endpoint")
+        self.endpoints = endpoints
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.default_hedge_delay = default_hedge_delay
+        self.hedges = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+
+    @property
+    def max_tokens(self) -> int:
+        return self.endpoints[0].client.max_tokens
+
+    def rank(self) -> List[Endpoint]:
+        """سرویس‌دهنده‌های سالم به ترتیب تاخیر مورد انتظار؛ اگر هیچ‌کدام سالم نباشد همه"""
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.is_healthy()]
+        if not healthy:
+            return sorted(self.endpoints, key=lambda endpoint: endpoint.down_until)
+        return sorted(healthy, key=lambda endpoint: endpoint.expected_latency())
+
+    def hedge_delay(self, endpoint: Endpoint) -> float:
+        delay = endpoint.quantile(self.hedge_quantile)
+        return self.default_hedge_delay if delay is None else delay
+
+    def invoke(self, messages: List, **kwargs):
+        ranked = self.rank()
+        primary, backups = ranked[0], ranked[1:]
+        in_flight: Dict[Future, Endpoint] = {self._submit(primary, messages, kwargs): primary}
+        hedged = False
+        last_error: Optional[Exception] = None
+
+        while in_flight:
+            timeout = None
+            if self.hedging and not hedged and backups:
+                timeout = self.hedge_delay(primary)
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # پاسخ از p95 دیرتر شده؛ درخواست تکراری به سرویس‌دهنده بعدی
+                hedged = True
+                self.hedges += 1
+                backup = backups.pop(0)
+                in_flight[self._submit(backup, messages, kwargs)] = backup
+                continue
+
+            for future in done:
+                endpoint = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    if not in_flight and backups:
+                        backup = backups.pop(0)
+                        in_flight[self._submit(backup, messages, kwargs)] = backup
+                    continue
+
+                for loser in in_flight:
+                    loser.cancel()
+                if hedged and endpoint is not primary:
+                    endpoint.hedge_wins += 1
+                return result
+
+        raise last_error
+
+    def stats(self) -> Dict:
+        return {
+            "hedges": self.hedges,
+            "endpoints": {endpoint.name: endpoint.stats() for endpoint in self.endpoints}
+        }
+
+    def _submit(self, endpoint: Endpoint, messages: List, kwargs: Dict) -> Future:
+        return self._executor.submit(self._call, endpoint, messages, kwargs)
+
+    @staticmethod
+    def _call(endpoint: Endpoint, messages: List, kwargs: Dict):
+        started = time.perf_counter()
+        try:
+            result = endpoint.client.invoke(messages, **kwargs)
+        except Exception:
+            endpoint.record(time.perf_counter() - started, ok=False)
+            raise
+        endpoint.record(time.perf_counter() - started, ok=True)
+        return result
+
+
+class MockEndpointClient:
+    """سرویس‌دهنده محلی با تاخیر و نرخ خطای قابل تنظیم برای آزمایش مسیریابی"""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, error_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 3.0, max_tokens: int = 300,
+                 content: str = "باید اعداد دقیق‌تری ببینم."):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.max_tokens = max_tokens
+        self.content = content
+
+    def invoke(self, messages: List, **kwargs) -> ChatResponse:
+        started = time.perf_counter()
+        delay = self.slow_latency if random.random() < self.slow_rate else self.latency
+        time.sleep(max(0.0, delay + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            raise ConnectionError("mock endpoint failure")
+        return ChatResponse(self.content, {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+                            time.perf_counter() - started)
+
+
+def load_endpoint_config() -> List[Dict]:
+    """فهرست سرویس‌دهنده‌ها از LLM_ENDPOINTS (JSON)؛ بدون تنظیم، فهرست خالی"""
+    raw = os.getenv("LLM_ENDPOINTS", "").strip()
+    return json.loads(raw) if raw else []
+
+
+def build_router(api_key: str, config: List[Dict], create_client,
+                 temperature: float = 0.7, max_tokens: int = 300) -> LLMRouter:
+    """ساخت مسیریاب از تنظیمات؛ هر مدخل یا mock است یا base_url و model دارد"""
+    endpoints = []
+    for index, entry in enumerate(config):
+        name = entry.get("name") or entry.get("base_url") or f"endpoint-{index}"
+        if "mock" in entry:
+            client = MockEndpointClient(max_tokens=max_tokens, **entry["mock"])
+        else:
+            endpoint_key = os.getenv(entry["api_key_env"], api_key) if entry.get("api_key_env") else api_key
+            client = create_client(endpoint_key, entry["model"], entry["base_url"], temperature, max_tokens)
+        endpoints.append(Endpoint(name, client))
+
+    return LLMRouter(
+        endpoints,
+        hedging=os.getenv("LLM_HEDGING", "1") == "1",
+        default_hedge_delay=float(os.getenv("LLM_HEDGE_DELAY", "2.0")),
+    )
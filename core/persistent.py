@@ -0,0 +1,117 @@
+# persistent.py - فهرست با اشتراک ساختاری برای fork ارزان جلسات
+
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+class PersistentList:
+    """فهرست افزودنی که fork آن در O(1) و بدون کپی انجام می‌شود
+
+    محتوا در چند قطعه (list، طول) نگه داشته می‌شود. قطعه‌های قبلی بین نسخه‌ها
+    مشترک‌اند و فقط تا طول ثبت‌شده خوانده می‌شوند؛ نسخه فعلی فقط به قطعه آخر
+    خودش (own) اضافه می‌کند. پس از fork، بخشی از own که نسخه دیگری به آن
+    اشاره دارد قفل می‌شود و pop از آن بخش، own را به قطعه ثابت تبدیل می‌کند
+    به جای اینکه داده مشترک را تغییر دهد.
+    """
+
+    __slots__ = ("_segments", "_base_len", "_own", "_own_frozen")
+
+    def __init__(self, items: Optional[Iterable] = None):
+        self._segments: Tuple[Tuple[list, int], ...] = ()
+        self._base_len = 0
+        self._own: list = list(items) if items is not None else []
+        self._own_frozen = 0
+
+    def __reduce__(self):
+        # روی دیسک اشتراک حفظ نمی‌شود و هر نسخه کامل ذخیره می‌شود
+        return PersistentList, (list(self),)
+
+    def __len__(self) -> int:
+        return self._base_len + len(self._own)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator:
+        for items, length in self._segments:
+            yield from islice(items, length)
+        yield from self._own
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return list(self)[key]
+            return self._range(start, stop)
+
+        index = key + len(self) if key < 0 else key
+        if not 0 <= index < len(self):
+            raise IndexError("PersistentList index out of range")
+        if index >= self._base_len:
+            return self._own[index - self._base_len]
+        for items, length in self._segments:
+            if index < length:
+                return items[index]
+            index -= length
+
+    def __repr__(self) -> str:
+        return f"PersistentList({list(self)!r})"
+
+    def append(self, item):
+        self._own.append(item)
+
+    def pop(self):
+        """حذف آخرین عنصر؛ عنصر مشترک با نسخه دیگر بدون تغییر داده مشترک حذف می‌شود"""
+        if not self._own:
+            if not self._segments:
+                raise IndexError("pop from empty PersistentList")
+            items, length = self._segments[-1]
+            self._segments = self._segments[:-1] + (((items, length - 1),) if length > 1 else ())
+            self._base_len -= 1
+            return items[length - 1]
+
+        if len(self._own) > self._own_frozen:
+            return self._own.pop()
+
+        # این بخش از own بین نسخه‌ها مشترک است؛ به قطعه ثابت تبدیل و own تازه شروع می‌شود
+        item = self._own[-1]
+        if len(self._own) > 1:
+            self._segments += ((self._own, len(self._own) - 1),)
+            self._base_len += len(self._own) - 1
+        self._own = []
+        self._own_frozen = 0
+        return item
+
+    def fork(self, length: Optional[int] = None) -> "PersistentList":
+        """نسخه مستقل از length عنصر اول؛ زمان و حافظه متناسب با تعداد قطعه‌ها، نه طول فهرست"""
+        length = len(self) if length is None else length
+        if not 0 <= length <= len(self):
+            raise IndexError("fork length out of range")
+
+        segments: List[Tuple[list, int]] = []
+        remaining = length
+        for items, segment_length in self._segments:
+            if remaining <= 0:
+                break
+            segments.append((items, min(segment_length, remaining)))
+            remaining -= segment_length
+        if remaining > 0:
+            segments.append((self._own, remaining))
+            self._own_frozen = max(self._own_frozen, remaining)
+
+        clone = PersistentList()
+        clone._segments = tuple(segments)
+        clone._base_len = length
+        return clone
+
+    def _range(self, start: int, stop: int) -> list:
+        """عناصر [start, stop) با برش مستقیم قطعه‌ها، بدون پیمایش از ابتدا"""
+        result = []
+        offset = 0
+        for items, length in self._segments:
+            if offset + length > start and offset < stop:
+                result.extend(items[max(0, start - offset):min(length, stop - offset)])
+            offset += length
+        if stop > offset:
+            result.extend(self._own[max(0, start - offset):stop - offset])
+        return result
@@ -0,0 +1,128 @@
+# phrase_bank.py - صدای از پیش ساخته‌شده جمله‌های ثابت سیستم و ارزیاب
+
+import argparse
+import hashlib
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .agents import EVALUATOR_FEEDBACK, Evaluator
+from .audio_processing import normalize_tts_output, sniff_mime
+from .conversation import PHASE_TRANSITION_MESSAGES, WELCOME_MESSAGE
+from .speech_backends import SpeechBackend, get_speech_backend
+
+# جمله‌هایی که در هر جلسه عینا تکرار می‌شوند، با نام گوینده
+FIXED_PHRASES: List[Tuple[str, str]] = (
+    [("system", WELCOME_MESSAGE)]
+    + [("system", message) for message in PHASE_TRANSITION_MESSAGES.values()]
+    + [(Evaluator.persona.name, feedback) for feedback in EVALUATOR_FEEDBACK.values()]
+)
+
+
+class PhraseBank:
+    """کلیپ‌های صوتی آماده روی دیسک با کلید متن، گوینده و صدای سرویس
+
+    هر جمله ثابت یک بار برای هر گوینده ساخته می‌شود؛ پس از اولین خواندن
+    از دیسک، کلیپ در حافظه می‌ماند و بدون هیچ فراخوانی TTS تحویل داده می‌شود.
+    """
+
+    def __init__(self, backend: SpeechBackend, bank_dir: str = "phrase_bank"):
+        self.backend = backend
+        self.bank_dir = bank_dir
+        self._clips: Dict[str, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def key(self, text: str, speaker: int) -> str:
+        """کلید کلیپ؛ با تغییر صدای سرویس یا قالب پخش کلید هم تغییر می‌کند"""
+        playback_format = os.getenv("TTS_PLAYBACK_FORMAT", "mp3").lower()
+        payload = f"{self.backend.voice_id}|{speaker}|{playback_format}|{text.strip()}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.bank_dir, f"{key}.bin")
+
+    def get(self, text: str, speaker: int) -> Optional[Tuple[bytes, str]]:
+        """صدای آماده و mime آن؛ برای جمله‌ای که ساخته نشده None"""
+        key = self.key(text, speaker)
+        with self._lock:
+            clip = self._clips.get(key)
+        if clip is not None:
+            return clip
+
+        try:
+            with open(self.path(key), "rb") as f:
+                audio_bytes = f.read()
+        except FileNotFoundError:
+            return None
+
+        clip = (audio_bytes, sniff_mime(audio_bytes))
+        with self._lock:
+            self._clips[key] = clip
+        return clip
+
+    def build(self, phrases: Iterable[Tuple[int, str]], force: bool = False) -> int:
+        """ساخت کلیپ‌هایی که روی دیسک نیستند؛ خروجی تعداد کلیپ‌های ساخته‌شده است"""
+        os.makedirs(self.bank_dir, exist_ok=True)
+        built = 0
+        for speaker, text in phrases:
+            path = self.path(self.key(text, speaker))
+            if not force and os.path.exists(path):
+                continue
+
+            audio_bytes, _ = normalize_tts_output(self.backend.text_to_speech(text.strip(), speaker=speaker))
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(audio_bytes)
+            os.replace(tmp_path, path)
+            built += 1
+        return built
+
+    def warm_up(self, phrases: Iterable[Tuple[int, str]]):
+        """ساخت کلیپ‌های جاافتاده در پس‌زمینه تا شروع برنامه معطل TTS نشود"""
+        def run():
+            try:
+                self.build(phrases)
+            except Exception as e:
+                print(f"خطا در ساخت صداهای آماده: {str(e)}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+def fixed_phrases(speaker_map: Dict[str, int], default_speaker: int = 3) -> List[Tuple[int, str]]:
+    """جمله‌های ثابت با شماره گوینده سرویس TTS"""
+    return [(speaker_map.get(name, default_speaker), text) for name, text in FIXED_PHRASES]
+
+
+_bank: Optional[PhraseBank] = None
+_bank_lock = threading.Lock()
+
+
+def get_phrase_bank() -> PhraseBank:
+    """بانک مشترک کل فرایند؛ در اولین ساخت، کلیپ‌های جاافتاده در پس‌زمینه ساخته می‌شوند"""
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            from .audio_manager import SPEAKER_MAP
+
+            _bank = PhraseBank(get_speech_backend(), os.getenv("PHRASE_BANK_DIR", "phrase_bank"))
+            if os.getenv("PHRASE_BANK_WARMUP", "1") == "1":
+                _bank.warm_up(fixed_phrases(SPEAKER_MAP))
+        return _bank
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ساخت صدای جمله‌های ثابت سیستم و ارزیاب")
+    parser.add_argument("--dir", default=os.getenv("PHRASE_BANK_DIR", "phrase_bank"))
+    parser.add_argument("--force", action="store_true", help="ساخت دوباره کلیپ‌های موجود")
+    args = parser.parse_args()
+
+    from .audio_manager import SPEAKER_MAP
+
+    bank = PhraseBank(get_speech_backend(), args.dir)
+    phrases = fixed_phrases(SPEAKER_MAP)
+    built = bank.build(phrases, force=args.force)
+    print(f"phrases: {len(phrases)}, synthesized: {built}")
+
+
+if __name__ == "__main__":
+    main()
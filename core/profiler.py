@@ -0,0 +1,194 @@
+# profiler.py - پروفایل CPU نمونه‌برداری‌شده و تفکیک حافظه جلسات به درخواست مدیر
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+from .prompts import message_content
+
+
+class ProfilerBusy(Exception):
+    """خطای اجرای هم‌زمان دو پروفایل CPU"""
+
+
+class SamplingProfiler:
+    """نمونه‌بردار پشته همه رشته‌ها در فواصل ثابت
+
+    تا زمانی که capture فراخوانی نشود هیچ رشته یا hook فعالی وجود ندارد. نمونه‌ها
+    زمان دیواری‌اند، پس رشته‌هایی که منتظر قفل یا I/O هستند هم دیده می‌شوند.
+    خروجی collapsed stacks است («thread;frame;frame count») که مستقیما با
+    flamegraph.pl یا speedscope نمایش داده می‌شود.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    def capture(self, seconds: float) -> Counter:
+        """نمونه‌برداری به مدت seconds ثانیه؛ رشته فراخوان در نتیجه نمی‌آید"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("یک پروفایل CPU در حال اجراست")
+        try:
+            stacks: Counter = Counter()
+            own_ident = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self._sample(stacks, own_ident)
+                time.sleep(self.interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _sample(stacks: Counter, own_ident: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            labels = []
+            while frame is not None:
+                code = frame.f_code
+                labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(labels))] += 1
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """قالب flamegraph؛ هر خط یک پشته و تعداد نمونه‌های آن"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def start_allocation_tracing(frames: int = 1):
+    """شروع ثبت تخصیص‌های حافظه؛ تا stop سربار tracemalloc روی همه تخصیص‌ها هست"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_allocation_tracing():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def allocation_snapshot(top: int = 25) -> List[Dict]:
+    """پرحجم‌ترین محل‌های تخصیص از زمان شروع ثبت؛ بدون ثبت فعال، فهرست خالی"""
+    if not tracemalloc.is_tracing():
+        return []
+
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_bytes": stat.size,
+            "count": stat.count
+        }
+        for stat in snapshot.statistics("lineno")[:top]
+    ]
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """حجم یک شیء و همه اشیایی که به آن‌ها اشاره می‌کند؛ اشیای مشترک یک بار شمرده می‌شوند"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    # کلاس‌ها، ماژول‌ها و توابع بین جلسات مشترک‌اند و جزو حجم جلسه نیستند
+    if isinstance(obj, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+        return 0
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        return size + sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset, deque)):
+        return size + sum(deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += deep_sizeof(getattr(obj, slot), seen)
+    return size
+
+
+def session_breakdown(session, audio_queue=None) -> Dict:
+    """حجم اجزای اصلی یک جلسه به بایت"""
+    manager = session.conversation_manager
+    # پیام‌های سیستمی مشترک بین عوامل فقط برای اولین عامل شمرده می‌شوند
+    seen: set = set()
+    histories = {
+        role.value: deep_sizeof(agent.conversation_history, seen)
+        for role, agent in manager.agents.items()
+    }
+    return {
+        "session_id": manager.session_id,
+        "phase": manager.current_phase.value,
+        "conversation_log": deep_sizeof(manager.conversation_log),
+        "conversation_log_entries": len(manager.conversation_log),
+        "conversation_history": sum(histories.values()),
+        "conversation_history_by_agent": histories,
+        "conversation_history_chars": sum(
+            len(message_content(message))
+            for agent in manager.agents.values()
+            for message in agent.conversation_history
+        ),
+        # داده صوتی خود کلیپ‌ها؛ کلیپ‌های منتقل‌شده به دیسک حساب نمی‌شوند
+        "audio_queue": audio_queue.memory_bytes if audio_queue is not None else 0,
+        "audio_queue_clips": len(audio_queue) if audio_queue is not None else 0
+    }
+
+
+def memory_report(session_manager, top: int = 25) -> Dict:
+    """تفکیک حافظه همه جلسات فعال به همراه پرحجم‌ترین محل‌های تخصیص"""
+    sessions = [
+        session_breakdown(session, audio_queue)
+        for session, audio_queue in session_manager.resident_sessions()
+    ]
+    sessions.sort(key=lambda item: item["conversation_log"] + item["conversation_history"] + item["audio_queue"],
+                  reverse=True)
+    return {
+        "timestamp": time.time(),
+        "tracing": tracemalloc.is_tracing(),
+        "traced_bytes": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+        "sessions": sessions,
+        "top_allocations": allocation_snapshot(top)
+    }
+
+
+def write_profile(profile_dir: str, name: str, extension: str, content: str) -> str:
+    """ذخیره اتمیک خروجی پروفایل؛ خروجی مسیر فایل است"""
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.{extension}")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_memory_report(profile_dir: str, report: Dict) -> str:
+    return write_profile(profile_dir, "memory", "json", json.dumps(report, ensure_ascii=False, indent=2))
+
+
+_profiler: Optional[SamplingProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> SamplingProfiler:
+    """نمونه‌بردار مشترک کل فرایند؛ فقط یک پروفایل در هر لحظه اجرا می‌شود"""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler(float(os.getenv("PROFILE_INTERVAL", "0.01")))
+        return _profiler
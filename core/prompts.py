@@ -0,0 +1,78 @@
+# prompts.py - پیام‌های پرامپت از پیش ساخته‌شده و شمارش توکن
+
+from functools import lru_cache
+
+# کدگذاری توکن مدل‌های خانواده gpt-4o
+TOKEN_ENCODING = "o200k_base"
+
+
+def normalize_prompt(text: str) -> str:
+    """حذف تورفتگی و فاصله‌های اضافه هر خط پرامپت"""
+    return "\n".join(line.strip() for line in text.strip().splitlines())
+
+
+def make_message(backend: str, role: str, content: str):
+    """ساخت پیام در قالب بومی کلاینت تا کلاینت دوباره آن را تبدیل نکند"""
+    if backend == "openai":
+        return {"role": role, "content": content}
+
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    if role == "system":
+        return SystemMessage(content=content)
+    if role == "assistant":
+        return AIMessage(content=content)
+    return HumanMessage(content=content)
+
+
+def message_role(message) -> str:
+    """نقش پیام، چه dict و چه شیء پیام langchain (human/ai/system)"""
+    if isinstance(message, dict):
+        return message.get("role", "")
+    return message.type
+
+
+def message_content(message) -> str:
+    """متن پیام، چه dict و چه شیء پیام langchain"""
+    if isinstance(message, dict):
+        return message.get("content", "")
+    return message.content
+
+
+@lru_cache(maxsize=None)
+def system_message(backend: str, prompt: str):
+    """پیام سیستم هر persona؛ یک بار برای هر کلاینت ساخته می‌شود"""
+    return make_message(backend, "system", prompt)
+
+
+@lru_cache(maxsize=2 * 5 * 101)
+def state_line(backend: str, state: str, satisfaction: int):
+    """پیام وضعیت عامل؛ حداکثر ۵ وضعیت × ۱۰۱ سطح رضایت برای هر کلاینت"""
+    return make_message(backend, "system", f"Current state: {state}\nSatisfaction: {satisfaction}%")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        # بدون tiktoken یا فایل کدگذاری، تخمین تقریبی استفاده می‌شود
+        return None
+
+
+@lru_cache(maxsize=2048)
+def count_tokens(text: str) -> int:
+    """تعداد توکن یک متن (با سربار قالب پیام)
+
+    با tiktoken شمارش دقیق است؛ اگر tiktoken نصب نباشد یا فایل کدگذاری در دسترس نباشد
+    (مثلا بدون اینترنت در اولین اجرا) هر سه نویسه یک توکن حساب می‌شود. این تخمین فقط
+    رزرو محدودکننده نرخ را جابه‌جا می‌کند و با مصرف واقعی گزارش‌شده توسط API اصلاح می‌شود.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 3 + 4
+    return len(encoding.encode(text)) + 4
+
+
+def state_line_tokens(state: str, satisfaction: int) -> int:
+    return count_tokens(f"Current state: {state}\nSatisfaction: {satisfaction}%")
@@ -0,0 +1,204 @@
+# rate_limiter.py - محدودکننده نرخ سراسری برای فراخوانی‌های LLM
+
+import heapq
+import hashlib
+import json
+import os
+import threading
+import time
+from enum import IntEnum
+from typing import Callable, Dict, List, Optional
+
+from .prompts import message_content, message_role
+
+
+class RequestPriority(IntEnum):
+    """اولویت درخواست‌ها؛ عدد کمتر زودتر سرویس می‌گیرد"""
+    INTERACTIVE = 0  # نوبت‌های زنده کاربر
+    BACKGROUND = 1   # خلاصه‌سازی، ارزیابی آفلاین، تولید پیش‌دستانه
+
+
+class RateLimitExceeded(Exception):
+    """خطای ساختاریافته برای پاسخ 429 یا پر بودن ظرفیت"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """سطل توکن با پرشدن پیوسته براساس ظرفیت در دقیقه"""
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """زمان لازم تا موجود شدن مقدار درخواستی"""
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """محدودکننده سراسری درخواست و توکن در دقیقه با صف اولویت‌دار"""
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 200_000):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._condition = threading.Condition()
+        self._waiters: List = []
+        self._sequence = 0
+        self._blocked_until = 0.0
+
+    def acquire(self, estimated_tokens: int = 0,
+                priority: RequestPriority = RequestPriority.INTERACTIVE,
+                timeout: Optional[float] = None):
+        """انتظار تا نوبت درخواست در صف و موجود شدن ظرفیت"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            self._sequence += 1
+            ticket = (int(priority), self._sequence)
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(ticket, estimated_tokens, now)
+                    if wait == 0.0:
+                        heapq.heappop(self._waiters)
+                        self.requests.consume(1)
+                        self.tokens.consume(estimated_tokens)
+                        return
+                    if deadline is not None:
+                        if now + wait > deadline:
+                            raise RateLimitExceeded("ظرفیت درخواست‌های LLM پر است", retry_after=wait)
+                        wait = min(wait, deadline - now)
+                    self._condition.wait(wait)
+            finally:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def _wait_time(self, ticket, estimated_tokens: int, now: float) -> float:
+        """زمان انتظار؛ فقط سر صف مجاز به مصرف ظرفیت است"""
+        if self._waiters[0] != ticket:
+            # تا زمان تغییر سر صف منتظر می‌مانیم
+            return 0.05
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """اصلاح موجودی سطل توکن براساس مصرف واقعی"""
+        with self._condition:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def block_for(self, seconds: float):
+        """توقف همه درخواست‌ها پس از دریافت 429 از سرویس‌دهنده"""
+        with self._condition:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+
+class RequestCoalescer:
+    """ادغام درخواست‌های یکسان هم‌زمان در یک فراخوانی"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Dict] = {}
+
+    @staticmethod
+    def make_key(messages: List, **invoke_kwargs) -> str:
+        """کلید درخواست از زوج‌های (نقش، متن) پیام‌ها و تنظیمات فراخوانی
+
+        پیام‌های langchain با str سریال نمی‌شوند تا نقش از دست نرود؛ دو درخواست با متن
+        یکسان اما نقش یا max_tokens/temperature/response_format متفاوت ادغام نمی‌شوند.
+        """
+        payload = json.dumps(
+            [[[message_role(m), message_content(m)] for m in messages], invoke_kwargs],
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def run(self, key: str, call: Callable):
+        """اجرای فراخوانی یا انتظار برای نتیجه فراخوانی یکسان در حال اجرا"""
+        with self._lock:
+            entry = self._in_flight.get(key)
+            leader = entry is None
+            if leader:
+                entry = {"event": threading.Event(), "result": None, "error": None}
+                self._in_flight[key] = entry
+
+        if not leader:
+            entry["event"].wait()
+            if entry["error"] is not None:
+                raise entry["error"]
+            return entry["result"]
+
+        try:
+            entry["result"] = call()
+            return entry["result"]
+        except Exception as e:
+            entry["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            entry["event"].set()
+
+
+def estimate_tokens(messages: List) -> int:
+    """تخمین سریع تعداد توکن‌ها برای رزرو ظرفیت"""
+    return sum(len(message_content(m)) for m in messages) // 3 + 4 * len(messages)
+
+
+def retry_after_from_error(error: Exception) -> Optional[float]:
+    """استخراج زمان انتظار از خطای 429؛ برای سایر خطاها None"""
+    status = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if status != 429 and type(error).__name__ != "RateLimitError":
+        return None
+
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 1.0))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+_limiter: Optional[RateLimiter] = None
+_coalescer = RequestCoalescer()
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """محدودکننده مشترک کل فرایند"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+                tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+            )
+        return _limiter
+
+
+def get_coalescer() -> RequestCoalescer:
+    """ادغام‌کننده مشترک کل فرایند"""
+    return _coalescer
@@ -0,0 +1,51 @@
+# reports.py - ذخیره و بازیابی گزارش‌های جلسات
+
+import glob
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class ReportStore:
+    """ذخیره‌سازی گزارش‌های جلسات روی دیسک"""
+
+    def __init__(self, report_dir: str = "reports"):
+        self.report_dir = report_dir
+        os.makedirs(self.report_dir, exist_ok=True)
+
+    def save(self, report: Dict, text_report: str, report_id: Optional[str] = None) -> Tuple[str, str]:
+        """ذخیره گزارش JSON و متنی با نام مبتنی بر زمان
+
+        report_id (مثلا شناسه جلسه) نام فایل گزارش‌هایی را که در یک ثانیه ذخیره می‌شوند یکتا می‌کند.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if report_id:
+            timestamp = f"{timestamp}_{report_id}"
+
+        # ذخیره گزارش JSON
+        json_path = os.path.join(self.report_dir, f"report_{timestamp}.json")
+        self.write(json_path, report)
+
+        # ذخیره گزارش متنی
+        text_path = os.path.join(self.report_dir, f"report_{timestamp}.txt")
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write(text_report)
+
+        return json_path, text_path
+
+    def list_reports(self) -> List[str]:
+        """فهرست مسیر گزارش‌های JSON به ترتیب زمان"""
+        return sorted(glob.glob(os.path.join(self.report_dir, "report_*.json")))
+
+    def load(self, path: str) -> Dict:
+        """خواندن یک گزارش JSON"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(self, path: str, report: Dict):
+        """نوشتن اتمیک گزارش تا خواننده‌های هم‌زمان فایل ناقص نبینند"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
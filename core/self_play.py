@@ -0,0 +1,142 @@
+# self_play.py - اجرای خودکار جلسات با بنیان‌گذار مصنوعی برای تست بار و جمع‌آوری داده
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .agents import FounderAgent, FounderSkill
+from .clock import VirtualClock
+from .conversation import NegotiationSession, SessionPhase, WELCOME_MESSAGE
+from .evaluation_worker import get_evaluation_worker
+from .rate_limiter import RateLimitExceeded, RequestPriority
+from .reports import ReportStore
+
+# پیام آغاز برای بنیان‌گذار در نوبت اول
+OPENING_PROMPT = "جلسه آغاز شد. لطفا استارتاپ خود را به طور خلاصه معرفی کنید."
+
+
+def format_turn(responses: List[Dict]) -> str:
+    """تبدیل پاسخ‌های یک نوبت به ورودی بنیان‌گذار"""
+    return "\n".join(f"{r['agent']}: {r['message']}" for r in responses if r.get("message"))
+
+
+def run_session(api_key: str, skill: FounderSkill, store: Optional[ReportStore] = None,
+                turn_seconds: float = 30.0, max_turns: int = 60, voice_mode: bool = False) -> Dict:
+    """اجرای یک جلسه کامل با بنیان‌گذار مصنوعی
+
+    زمان جلسه با ساعت مجازی و به اندازه turn_seconds در هر نوبت جلو می‌رود تا
+    همه مراحل بدون انتظار واقعی طی شوند. خروجی خلاصه جلسه و مسیر گزارش‌هاست.
+    اگر تولید پاسخ بنیان‌گذار خطا بدهد، جلسه همان‌جا تمام و با error علامت‌گذاری می‌شود.
+    """
+    clock = VirtualClock(start=time.time())
+    session = NegotiationSession(api_key, clock=clock)
+    manager = session.conversation_manager
+    manager.voice_mode = voice_mode
+    founder = FounderAgent(api_key, skill)
+    # مصرف بنیان‌گذار مصنوعی هم با نقش founder در دفتر جلسه ثبت می‌شود
+    founder.usage = manager.usage
+
+    prompt = f"{WELCOME_MESSAGE.strip()}\n\n{OPENING_PROMPT}"
+    turns = 0
+    error = None
+    started = time.perf_counter()
+
+    while session.is_session_active() and turns < max_turns:
+        context = {"current_phase": manager.current_phase.value, "user_profile": manager.user_profile}
+        try:
+            founder_message = founder.generate_response(prompt, context, priority=RequestPriority.BACKGROUND)
+            if founder.last_reply is None:
+                # متن خطای تولید پاسخ نباید به عنوان نوبت بنیان‌گذار در جلسه و نمره ثبت شود
+                error = founder_message
+                break
+            responses = session.process_input(founder_message)
+        except RateLimitExceeded as e:
+            time.sleep(e.retry_after)
+            continue
+
+        # بازخوردهای ارزیاب در پس‌زمینه آماده می‌شوند و به نوبت بعد اضافه می‌شوند
+        responses = responses + session.poll_feedback()
+        prompt = format_turn(responses) or OPENING_PROMPT
+        turns += 1
+        clock.advance(turn_seconds)
+
+    report = session.get_final_report()
+    # جلسه دیگر poll نمی‌شود و بازخوردهای باقی‌مانده در صف ارزیابی نگه داشته نمی‌شوند
+    get_evaluation_worker().discard(manager.session_id)
+    report["self_play"] = {
+        "founder_skill": skill.value,
+        "voice_mode": voice_mode,
+        "turns": turns,
+        "turn_seconds": turn_seconds,
+        "wall_time": time.perf_counter() - started,
+        "completed": manager.current_phase == SessionPhase.COMPLETED,
+        "error": error
+    }
+
+    paths = None
+    if store is not None:
+        paths = store.save(report, session.export_report("text"), report_id=manager.session_id)
+
+    return {
+        "session_id": manager.session_id,
+        "founder_skill": skill.value,
+        "turns": turns,
+        "deal_closed": report["negotiation_result"]["deal_closed"],
+        "score": report["performance_evaluation"]["total_score"],
+        "wall_time": report["self_play"]["wall_time"],
+        "tokens": report["usage"]["totals"]["input_tokens"] + report["usage"]["totals"]["output_tokens"],
+        "error": error,
+        "paths": paths
+    }
+
+
+def run_many(api_key: str, skills: List[FounderSkill], sessions: int, workers: int = 8,
+             store: Optional[ReportStore] = None, turn_seconds: float = 30.0,
+             voice_mode: bool = False) -> List[Dict]:
+    """اجرای هم‌زمان جلسات روی یک pool؛ سطح مهارت‌ها به نوبت بین جلسات پخش می‌شوند"""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="self-play") as pool:
+        futures = [
+            pool.submit(run_session, api_key, skills[index % len(skills)], store, turn_seconds,
+                        voice_mode=voice_mode)
+            for index in range(sessions)
+        ]
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="اجرای خودکار جلسات با بنیان‌گذار مصنوعی")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--skills", default="novice,intermediate,expert",
+                        help="سطح‌های مهارت با جداکننده ویرگول")
+    parser.add_argument("--turn-seconds", type=float, default=30.0, help="زمان مجازی هر نوبت")
+    parser.add_argument("--reports", default=os.path.join("reports", "self_play"))
+    parser.add_argument("--voice", action="store_true", help="تولید پاسخ عوامل با پروفایل حالت صوتی")
+    parser.add_argument("--mock", action="store_true", help="استفاده از LLM محلی mock به جای API")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY", "")
+    if args.mock:
+        from .llm import install_client
+        from .llm_router import MockEndpointClient
+
+        # mock به langchain نیازی ندارد؛ پیام‌ها در قالب dict ساخته می‌شوند
+        os.environ.setdefault("LLM_CLIENT", "openai")
+        api_key = api_key or "self-play-mock"
+        install_client(MockEndpointClient(latency=0.05, jitter=0.02), api_key)
+
+    skills = [FounderSkill(skill.strip()) for skill in args.skills.split(",")]
+    results = run_many(api_key, skills, args.sessions, args.workers,
+                       ReportStore(args.reports), args.turn_seconds, args.voice)
+
+    for result in results:
+        print(f"{result['session_id'][:8]}  {result['founder_skill']:12s}  turns {result['turns']:3d}  "
+              f"deal {'yes' if result['deal_closed'] else 'no ':3s}  score {result['score']:3d}  "
+              f"tokens {result['tokens']:6d}  {result['wall_time']:.1f}s"
+              + (f"  failed: {result['error']}" if result["error"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+# session_manager.py - مدیریت چند جلسه هم‌زمان با کنترل پذیرش و حساب حافظه
+
+import glob
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .conversation import NegotiationSession
+from .evaluation_worker import get_evaluation_worker
+from .prompts import message_content
+
+# سربار تقریبی هر مدخل لاگ یا تاریخچه (dict یا شیء پیام) جدا از متن آن
+ENTRY_OVERHEAD_BYTES = 360
+
+# در فشار ظرفیت، جلساتی که حداقل این مدت بی‌کار بوده‌اند زودتر از موعد به دیسک منتقل می‌شوند
+PRESSURE_IDLE_SECONDS = 30
+
+CALL_KINDS = ("llm", "tts", "stt")
+
+
+class SessionCapacityExceeded(Exception):
+    """خطای پر بودن ظرفیت جلسات یا فراخوانی‌های هم‌زمان"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_session_bytes(session: NegotiationSession) -> int:
+    """تخمین حافظه یک جلسه از روی لاگ گفتگو، تاریخچه و یادداشت‌های عوامل"""
+    manager = session.conversation_manager
+    total = 0
+    for entry in manager.conversation_log:
+        total += ENTRY_OVERHEAD_BYTES + sys.getsizeof(entry["message"])
+    for agent in manager.agents.values():
+        for message in agent.conversation_history:
+            total += ENTRY_OVERHEAD_BYTES + sys.getsizeof(message_content(message))
+        for note in agent.notes:
+            total += sys.getsizeof(note)
+    return total
+
+
+class SessionStore:
+    """ذخیره جلسات بی‌کار روی دیسک تا پس از بازگشت کاربر بازیابی شوند
+
+    فایل‌ها فقط توسط همین فرایند نوشته و خوانده می‌شوند، پس pickle امن است.
+    """
+
+    def __init__(self, store_dir: str = "session_store"):
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def path(self, session_id: str) -> str:
+        return os.path.join(self.store_dir, f"session_{session_id}.pkl")
+
+    def save(self, session_id: str, session: NegotiationSession):
+        """نوشتن اتمیک جلسه"""
+        path = self.path(session_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(session, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, session_id: str) -> Optional[NegotiationSession]:
+        """خواندن و حذف جلسه ذخیره‌شده؛ در صورت نبودن None"""
+        path = self.path(session_id)
+        try:
+            with open(path, "rb") as f:
+                session = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        os.remove(path)
+        return session
+
+    def contains(self, session_id: str) -> bool:
+        return os.path.exists(self.path(session_id))
+
+    def delete(self, session_id: str):
+        try:
+            os.remove(self.path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def count(self) -> int:
+        return len(glob.glob(os.path.join(self.store_dir, "session_*.pkl")))
+
+    def purge(self, max_age: float) -> int:
+        """حذف جلساتی که بیش از max_age ثانیه دست‌نخورده مانده‌اند"""
+        removed = 0
+        cutoff = time.time() - max_age
+        for path in glob.glob(os.path.join(self.store_dir, "session_*.pkl")):
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        return removed
+
+
+class SessionManager:
+    """نگهداری جلسات فعال یک فرایند با سقف تعداد، حافظه و فراخوانی‌های هم‌زمان
+
+    جلسه‌های جدید و فراخوانی‌های LLM/TTS/STT در صورت پر بودن ظرفیت در صف
+    منتظر می‌مانند و پس از پایان مهلت SessionCapacityExceeded می‌گیرند.
+    جلسات بی‌کار به SessionStore منتقل و هنگام دسترسی دوباره بازیابی می‌شوند.
+    خواندن و نوشتن pickle بیرون از قفل _condition انجام می‌شود تا track، پذیرش و
+    جلسات دیگر منتظر دیسک نمانند؛ نتیجه پس از گرفتن دوباره قفل بررسی و ثبت می‌شود.
+    """
+
+    def __init__(self, store: SessionStore, max_sessions: int = 200,
+                 memory_limit_bytes: int = 512 * 1024 * 1024, max_in_flight: int = 64,
+                 idle_timeout: float = 900.0, store_ttl: float = 24 * 3600,
+                 admission_timeout: float = 10.0):
+        self.store = store
+        self.max_sessions = max_sessions
+        self.memory_limit_bytes = memory_limit_bytes
+        self.max_in_flight = max_in_flight
+        self.idle_timeout = idle_timeout
+        self.store_ttl = store_ttl
+        self.admission_timeout = admission_timeout
+
+        self._sessions: Dict[str, Dict] = {}
+        self._restoring = set()  # شناسه جلساتی که در حال خواندن از دیسک‌اند
+        self._condition = threading.Condition()
+        self._in_flight = {kind: 0 for kind in CALL_KINDS}
+        self._waiting_admissions = 0
+        self._waiting_calls = 0
+        self._counters = {"admitted": 0, "rejected": 0, "evicted": 0, "restored": 0, "closed": 0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def create(self, api_key: str, timeout: Optional[float] = None) -> NegotiationSession:
+        """ساخت جلسه جدید پس از گرفتن مجوز پذیرش"""
+        with self._condition:
+            self._admit(timeout)
+            session = NegotiationSession(api_key)
+            self._register(session)
+            self._counters["admitted"] += 1
+            return session
+
+    def fork(self, session_id: str, turn: Optional[int] = None,
+             timeout: Optional[float] = None) -> Optional[NegotiationSession]:
+        """جلسه جدید از نوبت turn یک جلسه موجود؛ برای جلسه ناموجود None"""
+        session = self.get(session_id)
+        if session is None:
+            return None
+        # انتظار برای ارزیاب بیرون از قفل انجام می‌شود
+        forked = session.fork(turn)
+
+        with self._condition:
+            self._admit(timeout)
+            self._register(forked)
+            self._counters["admitted"] += 1
+            return forked
+
+    def get(self, session_id: str) -> Optional[NegotiationSession]:
+        """جلسه فعال یا بازیابی‌شده از دیسک؛ برای جلسه ناموجود None"""
+        with self._condition:
+            # اگر رشته دیگری همین جلسه را از دیسک می‌خواند، منتظر نتیجه آن می‌مانیم
+            while True:
+                entry = self._sessions.get(session_id)
+                if entry is not None:
+                    entry["last_active"] = time.monotonic()
+                    return entry["session"]
+                if session_id not in self._restoring:
+                    break
+                self._condition.wait()
+            self._restoring.add(session_id)
+
+        # کاربر فعلی نباید پشت صف جلسات جدید بماند؛ بازیابی همیشه پذیرفته می‌شود
+        session = None
+        try:
+            session = self.store.load(session_id)
+        finally:
+            with self._condition:
+                self._restoring.discard(session_id)
+                if session is not None:
+                    self._register(session)
+                    self._counters["restored"] += 1
+                self._condition.notify_all()
+        return session
+
+    def close(self, session_id: str):
+        """خارج کردن جلسه پایان‌یافته از حافظه و دیسک"""
+        with self._condition:
+            if self._sessions.pop(session_id, None) is not None:
+                self._counters["closed"] += 1
+            self._condition.notify_all()
+        get_evaluation_worker().discard(session_id)
+        self.store.delete(session_id)
+
+    def attach_audio_queue(self, session_id: str, audio_queue):
+        """ثبت صف صوتی جلسه تا حجم آن در حساب حافظه بیاید"""
+        with self._condition:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry["audio_queue"] = audio_queue
+
+    @contextmanager
+    def track(self, session_id: str, kind: str, timeout: Optional[float] = None):
+        """شمارش یک فراخوانی LLM/TTS/STT در حال اجرا با سقف هم‌زمانی کل فرایند"""
+        timeout = self.admission_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            self._waiting_calls += 1
+            try:
+                while sum(self._in_flight.values()) >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["rejected"] += 1
+                        raise SessionCapacityExceeded("سرور در حال پردازش درخواست‌های زیادی است",
+                                                      retry_after=1.0)
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting_calls -= 1
+
+            self._in_flight[kind] += 1
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry["in_flight"] += 1
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight[kind] -= 1
+                entry = self._sessions.get(session_id)
+                if entry is not None:
+                    entry["in_flight"] -= 1
+                    entry["last_active"] = time.monotonic()
+                    entry["memory_bytes"] = estimate_session_bytes(entry["session"])
+                self._condition.notify_all()
+
+    def resident_sessions(self) -> List[Tuple[NegotiationSession, Optional[object]]]:
+        """جلسات داخل حافظه همراه با صف صوتی هرکدام"""
+        with self._condition:
+            return [(entry["session"], entry["audio_queue"]) for entry in self._sessions.values()]
+
+    def evict_idle(self, idle_seconds: Optional[float] = None) -> int:
+        """انتقال جلسات بی‌کار به دیسک"""
+        idle_seconds = self.idle_timeout if idle_seconds is None else idle_seconds
+        cutoff = time.monotonic() - idle_seconds
+        evicted = 0
+
+        with self._condition:
+            for session_id, entry in list(self._sessions.items()):
+                if entry["last_active"] <= cutoff and self._evict(session_id):
+                    evicted += 1
+            if evicted:
+                self._condition.notify_all()
+        return evicted
+
+    def stats(self) -> Dict:
+        """شمارنده‌های لحظه‌ای برای تصمیم‌گیری مقیاس‌پذیری"""
+        stored_sessions = self.store.count()
+        with self._condition:
+            memory_bytes = sum(self._entry_bytes(entry) for entry in self._sessions.values())
+            return {
+                "active_sessions": len(self._sessions),
+                "stored_sessions": stored_sessions,
+                "max_sessions": self.max_sessions,
+                "memory_bytes": memory_bytes,
+                "memory_limit_bytes": self.memory_limit_bytes,
+                "in_flight": dict(self._in_flight),
+                "max_in_flight": self.max_in_flight,
+                "waiting_admissions": self._waiting_admissions,
+                "waiting_calls": self._waiting_calls,
+                "utilization": max(len(self._sessions) / self.max_sessions,
+                                   memory_bytes / self.memory_limit_bytes,
+                                   sum(self._in_flight.values()) / self.max_in_flight),
+                "totals": dict(self._counters)
+            }
+
+    def write_stats(self, path: str):
+        """نوشتن اتمیک شمارنده‌ها برای خواندن توسط autoscaler"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.stats(), f)
+        os.replace(tmp_path, path)
+
+    def start(self, interval: float = 60.0, stats_path: Optional[str] = None):
+        """انتقال دوره‌ای جلسات بی‌کار و انتشار شمارنده‌ها در پس‌زمینه"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval, stats_path), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _loop(self, interval: float, stats_path: Optional[str]):
+        while not self._stop.is_set():
+            try:
+                self.evict_idle()
+                self.store.purge(self.store_ttl)
+                if stats_path:
+                    self.write_stats(stats_path)
+            except Exception as e:
+                print(f"خطا در مدیریت جلسات: {str(e)}")
+            self._stop.wait(interval)
+
+    def _admit(self, timeout: Optional[float]):
+        """انتظار برای ظرفیت جلسه جدید؛ باید با قفل _condition فراخوانی شود"""
+        timeout = self.admission_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        self._waiting_admissions += 1
+        try:
+            while not self._has_capacity():
+                if self._evict_for_pressure():
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["rejected"] += 1
+                    raise SessionCapacityExceeded("ظرفیت جلسات این سرور پر است",
+                                                  retry_after=PRESSURE_IDLE_SECONDS)
+                self._condition.wait(remaining)
+        finally:
+            self._waiting_admissions -= 1
+
+    def _register(self, session: NegotiationSession):
+        session_id = session.conversation_manager.session_id
+        self._sessions[session_id] = {
+            "session": session,
+            "last_active": time.monotonic(),
+            "memory_bytes": estimate_session_bytes(session),
+            "in_flight": 0,
+            "audio_queue": None,
+            "evicting": False
+        }
+
+    def _entry_bytes(self, entry: Dict) -> int:
+        audio_queue = entry["audio_queue"]
+        return entry["memory_bytes"] + (audio_queue.memory_bytes if audio_queue is not None else 0)
+
+    def _has_capacity(self) -> bool:
+        if len(self._sessions) >= self.max_sessions:
+            return False
+        memory_bytes = sum(self._entry_bytes(entry) for entry in self._sessions.values())
+        return memory_bytes < self.memory_limit_bytes
+
+    def _evict_for_pressure(self) -> bool:
+        """انتقال قدیمی‌ترین جلسه‌ای که حداقل مدت کوتاهی بی‌کار بوده"""
+        cutoff = time.monotonic() - PRESSURE_IDLE_SECONDS
+        candidates = sorted(
+            (entry["last_active"], session_id)
+            for session_id, entry in self._sessions.items()
+            if entry["last_active"] <= cutoff and not entry["evicting"]
+        )
+        return any(self._evict(session_id) for _, session_id in candidates)
+
+    @contextmanager
+    def _unlocked(self):
+        """آزاد کردن موقت قفل _condition برای IO دیسک؛ فقط با قفل در دست فراخوانی شود"""
+        self._condition.release()
+        try:
+            yield
+        finally:
+            self._condition.acquire()
+
+    def _evict(self, session_id: str) -> bool:
+        """ذخیره جلسه روی دیسک و آزاد کردن حافظه آن؛ جلسات مشغول منتقل نمی‌شوند
+
+        با قفل _condition فراخوانی می‌شود ولی pickle بیرون از قفل نوشته می‌شود. اگر در
+        این فاصله جلسه استفاده یا بسته شده باشد، انتقال لغو و فایل نوشته‌شده حذف می‌شود.
+        """
+        entry = self._sessions.get(session_id)
+        # بازخوردهای آماده همراه جلسه ذخیره و پس از بازیابی تحویل داده می‌شوند
+        if (entry is None or entry["evicting"] or entry["in_flight"]
+                or get_evaluation_worker().pending(session_id)):
+            return False
+
+        entry["evicting"] = True
+        last_active = entry["last_active"]
+        with self._unlocked():
+            try:
+                entry["session"].conversation_manager.hold_evaluations()
+                self.store.save(session_id, entry["session"])
+                saved = True
+            except Exception as e:
+                print(f"خطا در ذخیره جلسه {session_id}: {str(e)}")
+                saved = False
+
+        if (saved and self._sessions.get(session_id) is entry
+                and not entry["in_flight"] and entry["last_active"] == last_active):
+            del self._sessions[session_id]
+            self._counters["evicted"] += 1
+            with self._unlocked():
+                if entry["audio_queue"] is not None:
+                    entry["audio_queue"].spill()
+            return True
+
+        # جلسه در حین ذخیره استفاده یا بسته شد؛ نسخه دیسک کهنه است
+        if saved:
+            with self._unlocked():
+                self.store.delete(session_id)
+        entry["evicting"] = False
+        return False
+
+
+_manager: Optional[SessionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_session_manager() -> SessionManager:
+    """مدیر جلسات مشترک کل فرایند"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = SessionManager(
+                SessionStore(os.getenv("SESSION_STORE_DIR", "session_store")),
+                max_sessions=int(os.getenv("MAX_SESSIONS", "200")),
+                memory_limit_bytes=int(os.getenv("SESSION_MEMORY_LIMIT_BYTES", str(512 * 1024 * 1024))),
+                max_in_flight=int(os.getenv("MAX_IN_FLIGHT_CALLS", "64")),
+                idle_timeout=float(os.getenv("SESSION_IDLE_SECONDS", "900")),
+                admission_timeout=float(os.getenv("SESSION_ADMISSION_TIMEOUT", "10")),
+            )
+            _manager.start(stats_path=os.getenv("SESSION_STATS_PATH") or None)
+        return _manager
@@ -0,0 +1,374 @@
+# speech_backends.py - پیاده‌سازی‌های قابل تعویض تبدیل گفتار و متن
+
+import base64
+import io
+import json
+import os
+import queue
+import threading
+import wave
+from abc import ABC, abstractmethod
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional
+
+
+class SpeechBackendError(Exception):
+    """خطای سرویس گفتار با پیام قابل نمایش به کاربر"""
+    pass
+
+
+class SpeechBackend(ABC):
+    """رابط مشترک STT و TTS"""
+
+    # قالب خروجی text_to_speech
+    mime = "audio/mp3"
+
+    @property
+    def voice_id(self) -> str:
+        """شناسه صدای تولیدی؛ با تغییر آن صداهای از پیش ساخته‌شده نامعتبر می‌شوند"""
+        return type(self).__name__
+
+    @abstractmethod
+    def speech_to_text(self, audio_base64: str, language: str = "fa",
+                       idempotency_key: Optional[str] = None) -> Dict:
+        """تبدیل صدا به متن؛ خروجی شامل کلید result است"""
+        pass
+
+    @abstractmethod
+    def text_to_speech(self, text: str, speaker: int = 3, speed: float = 1) -> bytes:
+        """تبدیل متن به صدا"""
+        pass
+
+
+class RemoteSpeechBackend(SpeechBackend):
+    """سرویس‌های STT و TTS دروازه partai"""
+
+    def __init__(self):
+        self.STT_ENDPOINT = os.getenv("STT_ENDPOINT", "https://partai.gw.isahab.ir/speechRecognition/v1/base64")
+        self.TTS_ENDPOINT = os.getenv("TTS_ENDPOINT", "https://partai.gw.isahab.ir/TextToSpeech/v1/speech-synthesys")
+        self.STT_API_KEY = os.getenv("STT_API_KEY", "Gateway 5c1ea0b8-7dc9-5f36-8f96-c4deff201a1d")
+        self.TTS_API_KEY = os.getenv("TTS_API_KEY", "Gateway a7f37b14-d0a1-5b52-a6f0-d0baef9e1b67")
+
+    @property
+    def voice_id(self) -> str:
+        return f"remote:{self.TTS_ENDPOINT}"
+
+    def speech_to_text(self, audio_base64: str, language: str = "fa",
+                       idempotency_key: Optional[str] = None) -> Dict:
+        import requests
+
+        payload = json.dumps({"language": language, "data": audio_base64})
+        headers = {
+            'gateway-token': self.STT_API_KEY,
+            'Content-Type': 'application/json'
+        }
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
+
+        response = requests.post(self.STT_ENDPOINT, headers=headers, data=payload)
+        response.raise_for_status()
+        result = response.json()
+
+        # Debug response
+        print("STT Response:", result)
+
+        # Parse response based on the provided structure
+        if result.get("data", {}).get("status") == "success":
+            return result["data"]["data"]
+        raise SpeechBackendError("خطا در تبدیل صدا به متن: پاسخ نامعتبر")
+
+    def text_to_speech(self, text: str, speaker: int = 3, speed: float = 1) -> bytes:
+        import requests
+
+        payload = json.dumps({
+            "data": text,
+            "filePath": "true",
+            "base64": "1",
+            "checksum": "1",
+            "speaker": str(speaker),
+            "speed": str(speed)
+        })
+        headers = {
+            'Content-Type': 'application/json',
+            'gateway-token': self.TTS_API_KEY
+        }
+
+        response = requests.post(self.TTS_ENDPOINT, headers=headers, data=payload)
+        response.raise_for_status()
+        result = response.json()
+
+        if result["data"]["status"] != "success":
+            raise SpeechBackendError("TTS API returned unsuccessful status.")
+
+        file_url = result["data"]["data"].get("filePath")
+        if not file_url:
+            raise SpeechBackendError("No filePath found in TTS response.")
+        if not file_url.startswith(('http://', 'https://')):
+            file_url = f"https://{file_url}"
+        audio_response = requests.get(file_url, headers={'gateway-token': self.TTS_API_KEY})
+        audio_response.raise_for_status()
+        return audio_response.content
+
+
+class MicroBatcher:
+    """جمع کردن درخواست‌های هم‌زمان جلسات در یک فراخوانی دسته‌ای مدل"""
+
+    def __init__(self, batch_fn: Callable[[List], List], max_batch: int = 8, max_wait: float = 0.05):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: queue.Queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, item) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=self.max_wait))
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
+class LocalSpeechBackend(SpeechBackend):
+    """مدل‌های محلی CPU برای STT (Whisper) و TTS (MMS فارسی)
+
+    مدل‌ها یک بار در هر فرایند بارگذاری و بین همه جلسات مشترک می‌شوند و
+    درخواست‌های هم‌زمان به صورت دسته‌ای به مدل داده می‌شوند.
+    """
+
+    mime = "audio/wav"
+
+    def __init__(self):
+        self.stt_model = os.getenv("LOCAL_STT_MODEL", "openai/whisper-small")
+        self.tts_model = os.getenv("LOCAL_TTS_MODEL", "facebook/mms-tts-fas")
+        self.timeout = float(os.getenv("LOCAL_SPEECH_TIMEOUT", "60"))
+        self._stt_batcher: Optional[MicroBatcher] = None
+        self._tts_batcher: Optional[MicroBatcher] = None
+        self._lock = threading.Lock()
+
+    @property
+    def voice_id(self) -> str:
+        return f"local:{self.tts_model}"
+
+    def speech_to_text(self, audio_base64: str, language: str = "fa",
+                       idempotency_key: Optional[str] = None) -> Dict:
+        future = self._get_stt_batcher().submit((base64.b64decode(audio_base64), language))
+        return {"result": future.result(timeout=self.timeout)}
+
+    def text_to_speech(self, text: str, speaker: int = 3, speed: float = 1) -> bytes:
+        # مدل MMS تک‌گوینده است؛ speaker فقط در سرویس راه دور اثر دارد
+        return self._get_tts_batcher().submit(text).result(timeout=self.timeout)
+
+    def _get_stt_batcher(self) -> MicroBatcher:
+        with self._lock:
+            if self._stt_batcher is None:
+                pipeline = _load_pipeline("automatic-speech-recognition", self.stt_model)
+                self._stt_batcher = MicroBatcher(lambda items: _transcribe_batch(pipeline, items))
+            return self._stt_batcher
+
+    def _get_tts_batcher(self) -> MicroBatcher:
+        with self._lock:
+            if self._tts_batcher is None:
+                pipeline = _load_pipeline("text-to-speech", self.tts_model)
+                self._tts_batcher = MicroBatcher(lambda texts: _synthesize_batch(pipeline, texts))
+            return self._tts_batcher
+
+
+def _load_pipeline(task: str, model: str):
+    try:
+        from transformers import pipeline
+    except ImportError as e:
+        raise SpeechBackendError(
+            "برای SPEECH_BACKEND=local بسته‌های transformers و torch لازم است"
+        ) from e
+    return pipeline(task, model=model, device="cpu")
+
+
+def _transcribe_batch(pipeline, items: List) -> List[str]:
+    """تبدیل دسته‌ای فایل‌های صوتی به متن"""
+    language = items[0][1]
+    outputs = pipeline(
+        [audio_bytes for audio_bytes, _ in items],
+        batch_size=len(items),
+        generate_kwargs={"language": language, "task": "transcribe"}
+    )
+    return [output["text"].strip() for output in outputs]
+
+
+def _synthesize_batch(pipeline, texts: List[str]) -> List[bytes]:
+    """تولید دسته‌ای صدا و بسته‌بندی هر خروجی در WAV"""
+    outputs = pipeline(texts, batch_size=len(texts))
+    return [_to_wav(output["audio"], output["sampling_rate"]) for output in outputs]
+
+
+def _to_wav(samples, sampling_rate: int) -> bytes:
+    """تبدیل نمونه‌های float به WAV شانزده بیتی تک‌کاناله"""
+    import numpy as np
+
+    pcm = (np.clip(np.asarray(samples).reshape(-1), -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(int(sampling_rate))
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+class CircuitBreaker:
+    """قطع‌کننده مدار: پس از چند خطای پیاپی، تا reset_timeout ثانیه فراخوانی‌ها رد می‌شوند
+
+    پس از این مدت یک فراخوانی آزمایشی مجاز است؛ موفقیت آن مدار را می‌بندد و
+    خطای آن دوباره مدار را باز می‌کند.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class ResilientSpeechBackend(SpeechBackend):
+    """سرویس گفتار با مهلت هر مرحله، قطع‌کننده مدار و سرویس جایگزین اختیاری
+
+    فراخوانی‌ای که از مهلت بگذرد کنار گذاشته می‌شود (رشته آن تا پایان ادامه
+    می‌دهد اما نتیجه‌اش استفاده نمی‌شود) و به عنوان خطا در مدار ثبت می‌شود.
+    """
+
+    def __init__(self, primary: SpeechBackend, fallback: Optional[SpeechBackend] = None,
+                 stt_budget: float = 8.0, tts_budget: float = 6.0, breaker: Optional[CircuitBreaker] = None):
+        self.primary = primary
+        self.fallback = fallback
+        self.stt_budget = stt_budget
+        self.tts_budget = tts_budget
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speech")
+
+    @property
+    def mime(self) -> str:
+        return self.primary.mime
+
+    @property
+    def voice_id(self) -> str:
+        return self.primary.voice_id
+
+    def speech_to_text(self, audio_base64: str, language: str = "fa",
+                       idempotency_key: Optional[str] = None) -> Dict:
+        return self._call(
+            lambda backend: backend.speech_to_text(audio_base64, language, idempotency_key=idempotency_key),
+            self.stt_budget
+        )
+
+    def text_to_speech(self, text: str, speaker: int = 3, speed: float = 1) -> bytes:
+        return self._call(lambda backend: backend.text_to_speech(text, speaker=speaker, speed=speed), self.tts_budget)
+
+    def _call(self, call: Callable, budget: float):
+        if self.breaker.allow():
+            future = self._executor.submit(call, self.primary)
+            try:
+                result = future.result(timeout=budget)
+                self.breaker.record_success()
+                return result
+            except FutureTimeout:
+                self.breaker.record_failure()
+                error = SpeechBackendError("پاسخ سرویس گفتار از مهلت مجاز طولانی‌تر شد")
+            except SpeechBackendError as e:
+                self.breaker.record_failure()
+                error = e
+            except Exception as e:
+                self.breaker.record_failure()
+                error = SpeechBackendError(f"خطا در سرویس گفتار: {str(e)}")
+        else:
+            error = SpeechBackendError("سرویس گفتار موقتا در دسترس نیست")
+
+        if self.fallback is not None:
+            return call(self.fallback)
+        raise error
+
+
+_backend: Optional[SpeechBackend] = None
+_resilient_backend: Optional[ResilientSpeechBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_speech_backend() -> SpeechBackend:
+    """پیاده‌سازی مشترک کل فرایند براساس SPEECH_BACKEND (remote یا local)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if os.getenv("SPEECH_BACKEND", "remote").lower() == "local":
+                _backend = LocalSpeechBackend()
+            else:
+                _backend = RemoteSpeechBackend()
+        return _backend
+
+
+def get_resilient_backend() -> ResilientSpeechBackend:
+    """سرویس گفتار مشترک با مهلت و قطع‌کننده مدار برای نوبت‌های زنده"""
+    global _resilient_backend
+    primary = get_speech_backend()
+    with _backend_lock:
+        if _resilient_backend is None:
+            fallback = None
+            if os.getenv("SPEECH_FALLBACK", "none").lower() == "local" and not isinstance(primary, LocalSpeechBackend):
+                fallback = LocalSpeechBackend()
+            _resilient_backend = ResilientSpeechBackend(
+                primary,
+                fallback,
+                stt_budget=float(os.getenv("VOICE_STT_BUDGET", "8")),
+                tts_budget=float(os.getenv("VOICE_TTS_BUDGET", "6")),
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv("SPEECH_BREAKER_FAILURES", "3")),
+                    reset_timeout=float(os.getenv("SPEECH_BREAKER_RESET", "30")),
+                ),
+            )
+        return _resilient_backend
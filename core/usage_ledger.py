@@ -0,0 +1,200 @@
+# usage_ledger.py - دفتر مصرف توکن، TTS و STT به تفکیک جلسه، عامل و مرحله
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# شمارنده‌های هر دسته؛ latency مجموع ثانیه‌هاست
+COUNTER_FIELDS = ("calls", "input_tokens", "output_tokens", "latency", "tts_chars", "stt_seconds")
+
+
+def unit_prices() -> Dict[str, float]:
+    """قیمت واحد هر شمارنده از متغیرهای محیطی؛ بدون تنظیم، صفر"""
+    return {
+        "input_tokens": float(os.getenv("PRICE_INPUT_TOKENS_1K", "0")) / 1000,
+        "output_tokens": float(os.getenv("PRICE_OUTPUT_TOKENS_1K", "0")) / 1000,
+        "tts_chars": float(os.getenv("PRICE_TTS_CHARS_1K", "0")) / 1000,
+        "stt_seconds": float(os.getenv("PRICE_STT_MINUTE", "0")) / 60,
+    }
+
+
+def empty_counters() -> Dict:
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+def add_counters(target: Dict, amounts: Dict):
+    for field in COUNTER_FIELDS:
+        target[field] += amounts.get(field, 0)
+
+
+def with_cost(counters: Dict, prices: Dict[str, float]) -> Dict:
+    result = dict(counters)
+    result["cost"] = sum(counters[field] * price for field, price in prices.items())
+    return result
+
+
+def summarize(buckets: Dict[Tuple[str, str, str], Dict]) -> Dict:
+    """جمع کل و تفکیک براساس نوع، عامل و مرحله به همراه هزینه تخمینی"""
+    prices = unit_prices()
+    totals = empty_counters()
+    groups = {"by_kind": defaultdict(empty_counters), "by_agent": defaultdict(empty_counters),
+              "by_phase": defaultdict(empty_counters)}
+
+    for (kind, role, phase), counters in buckets.items():
+        add_counters(totals, counters)
+        add_counters(groups["by_kind"][kind], counters)
+        add_counters(groups["by_agent"][role], counters)
+        add_counters(groups["by_phase"][phase], counters)
+
+    summary = {"totals": with_cost(totals, prices)}
+    for name, group in groups.items():
+        summary[name] = {key: with_cost(counters, prices) for key, counters in group.items()}
+    summary["entries"] = sorted(
+        ({"kind": kind, "role": role, "phase": phase, **with_cost(counters, prices)}
+         for (kind, role, phase), counters in buckets.items()),
+        key=lambda entry: entry["cost"], reverse=True
+    )
+    return summary
+
+
+class UsageLedger:
+    """مصرف یک جلسه به تفکیک (نوع، عامل، مرحله)
+
+    هر فراخوانی در دسته خودش جمع می‌شود و همزمان به دفتر مشترک فرایند
+    فرستاده می‌شود. ارزیاب در رشته پس‌زمینه ثبت می‌کند، پس ثبت‌ها قفل دارند.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self._buckets: Dict[Tuple[str, str, str], Dict] = {}
+        self._summary: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"session_id": self.session_id, "_buckets": self._buckets}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._summary = None
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, role: str, phase: Optional[str], **amounts):
+        """ثبت یک فراخوانی؛ amounts از فیلدهای COUNTER_FIELDS به جز calls است"""
+        key = (kind, role, phase or "unknown")
+        amounts["calls"] = 1
+        with self._lock:
+            counters = self._buckets.get(key)
+            if counters is None:
+                counters = self._buckets[key] = empty_counters()
+            add_counters(counters, amounts)
+            self._summary = None
+        get_usage_aggregator().add(self.session_id, key, amounts)
+
+    def summary(self) -> Dict:
+        """خلاصه مصرف؛ تا ثبت بعدی از کش برگردانده می‌شود"""
+        with self._lock:
+            if self._summary is None:
+                self._summary = summarize(self._buckets)
+            return self._summary
+
+
+class UsageAggregator:
+    """جمع مصرف همه جلسات فرایند؛ با تنظیم مسیر، هر فراخوانی یک خط JSONL هم می‌شود"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._buckets: Dict[Tuple[str, str, str], Dict] = defaultdict(empty_counters)
+        self._sessions = set()
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def add(self, session_id: str, key: Tuple[str, str, str], amounts: Dict):
+        with self._lock:
+            add_counters(self._buckets[key], amounts)
+            self._sessions.add(session_id)
+            if self.path:
+                kind, role, phase = key
+                record = {"timestamp": time.time(), "session_id": session_id,
+                          "kind": kind, "role": role, "phase": phase, **amounts}
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def summary(self) -> Dict:
+        with self._lock:
+            buckets = {key: dict(counters) for key, counters in self._buckets.items()}
+            sessions = len(self._sessions)
+        summary = summarize(buckets)
+        summary["sessions"] = sessions
+        return summary
+
+
+def load_records(path: str) -> Iterable[Dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def aggregate_records(records: Iterable[Dict]) -> Dict:
+    """جمع رکوردهای JSONL چند فرایند یا چند روز"""
+    buckets: Dict[Tuple[str, str, str], Dict] = defaultdict(empty_counters)
+    sessions = set()
+    for record in records:
+        add_counters(buckets[(record["kind"], record["role"], record["phase"])], record)
+        sessions.add(record["session_id"])
+    summary = summarize(buckets)
+    summary["sessions"] = len(sessions)
+    return summary
+
+
+_aggregator: Optional[UsageAggregator] = None
+_aggregator_lock = threading.Lock()
+
+
+def get_usage_aggregator() -> UsageAggregator:
+    """دفتر مشترک کل فرایند"""
+    global _aggregator
+    with _aggregator_lock:
+        if _aggregator is None:
+            _aggregator = UsageAggregator(os.getenv("USAGE_LEDGER_PATH") or None)
+        return _aggregator
+
+
+def format_entries(entries: List[Dict], sessions: int) -> str:
+    lines = [f"{'kind':5s} {'role':24s} {'phase':22s} {'calls':>6s} {'in tok':>9s} {'out tok':>9s} "
+             f"{'tts chr':>9s} {'stt sec':>8s} {'latency':>8s} {'cost':>10s} {'cost/ses':>9s}"]
+    for entry in entries:
+        lines.append(
+            f"{entry['kind']:5s} {entry['role']:24s} {entry['phase']:22s} {entry['calls']:6d} "
+            f"{entry['input_tokens']:9d} {entry['output_tokens']:9d} {entry['tts_chars']:9d} "
+            f"{entry['stt_seconds']:8.1f} {entry['latency']:8.1f} {entry['cost']:10.4f} "
+            f"{entry['cost'] / max(1, sessions):9.4f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="جمع مصرف جلسات از فایل USAGE_LEDGER_PATH")
+    parser.add_argument("path", nargs="?", default=os.getenv("USAGE_LEDGER_PATH", "usage/usage.jsonl"))
+    parser.add_argument("--json", action="store_true", help="خروجی JSON به جای جدول")
+    args = parser.parse_args()
+
+    summary = aggregate_records(load_records(args.path))
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    print(format_entries(summary["entries"], summary["sessions"]))
+    totals = summary["totals"]
+    print(f"\nsessions {summary['sessions']}  calls {totals['calls']}  "
+          f"tokens {totals['input_tokens']}+{totals['output_tokens']}  "
+          f"tts chars {totals['tts_chars']}  stt sec {totals['stt_seconds']:.1f}  cost {totals['cost']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
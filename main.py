@@ -5,16 +5,18 @@ import sys
 import json
 import streamlit as st
 from datetime import datetime
-from typing import Dict, List
-from dotenv import load_dotenv
+from typing import Dict, Optional
 import time
-import base64
+from collections import deque
 
 # اضافه کردن مسیر پروژه به sys.path برای import ماژول‌ها
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from core.conversation import NegotiationSession, SessionPhase
 from core.audio_manager import AudioManager
+from core.reports import ReportStore
+from core.session_manager import SessionCapacityExceeded, get_session_manager
+from core.event_bus import get_event_bus, session_snapshot
 
 # تنظیمات صفحه
 st.set_page_config(
@@ -82,37 +84,60 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# تعداد پیام‌های هر بلوک HTML کش‌شده در نمایش گفتگو
+TRANSCRIPT_BLOCK_SIZE = 20
+
+# پایش زنده: تعداد ستون کارت‌ها و پیام‌های آخر هر جلسه که نگه داشته می‌شود
+MONITOR_COLUMNS = 3
+MONITOR_TAIL = 5
+
+
 class StreamlitNegotiationApp:
     """اپلیکیشن مذاکره با رابط کاربری Streamlit و قابلیت صوتی"""
 
     def __init__(self):
         # بارگذاری متغیرهای محیطی
+        from dotenv import load_dotenv
         load_dotenv()
 
         # مدیر صوتی
         self.audio_manager = AudioManager()
 
+        # جلسات در مدیر مشترک فرایند نگهداری می‌شوند و session state فقط شناسه را دارد
+        self.session_manager = get_session_manager()
+
         # تنظیمات اولیه session state
-        if 'session' not in st.session_state:
-            st.session_state.session = None
+        if 'session_id' not in st.session_state:
+            st.session_state.session_id = None
         if 'messages' not in st.session_state:
             st.session_state.messages = []
+        if 'transcript' not in st.session_state:
+            self.reset_transcript()
         if 'api_key' not in st.session_state:
             st.session_state.api_key = os.getenv("OPENAI_API_KEY", "")
         if 'session_active' not in st.session_state:
             st.session_state.session_active = False
         if 'final_report' not in st.session_state:
             st.session_state.final_report = None
+        if 'final_report_text' not in st.session_state:
+            st.session_state.final_report_text = None
         if 'voice_mode' not in st.session_state:
             st.session_state.voice_mode = False
-        if 'last_audio' not in st.session_state:
-            st.session_state.last_audio = None
+        if 'processed_audio' not in st.session_state:
+            st.session_state.processed_audio = set()
         if 'audio_autoplay' not in st.session_state:
             st.session_state.audio_autoplay = True
 
         # ایجاد پوشه گزارشات
         self.report_dir = "reports"
-        os.makedirs(self.report_dir, exist_ok=True)
+        self.report_store = ReportStore(self.report_dir)
+
+    @property
+    def session(self) -> Optional[NegotiationSession]:
+        """جلسه جاری؛ اگر به دلیل بی‌کاری به دیسک رفته باشد بازیابی می‌شود"""
+        if not st.session_state.session_id:
+            return None
+        return self.session_manager.get(st.session_state.session_id)
 
     def render_sidebar(self):
         """رندر کردن سایدبار"""
@@ -160,7 +185,8 @@ class StreamlitNegotiationApp:
             st.divider()
 
             # نمایش وضعیت جلسه
-            if st.session_state.session_active and st.session_state.session:
+            session = self.session
+            if st.session_state.session_active and session:
                 st.subheader("📊 وضعیت جلسه")
                 phase_colors = {
                     SessionPhase.INTRODUCTION: "#bbdefb",
@@ -169,7 +195,7 @@ class StreamlitNegotiationApp:
                     SessionPhase.FINAL_NEGOTIATION: "#ffe0b2",
                     SessionPhase.COMPLETED: "#f5f5f5"
                 }
-                current_phase = st.session_state.session.conversation_manager.current_phase
+                current_phase = session.conversation_manager.current_phase
                 st.markdown(
                     f"""<div class="phase-indicator" style="background-color: {phase_colors[current_phase]}">
                     مرحله فعلی: {current_phase.value}
@@ -178,28 +204,104 @@ class StreamlitNegotiationApp:
                 )
 
                 # نمایش زمان سپری شده
-                elapsed_time = time.time() - st.session_state.session.conversation_manager.session_start_time
+                manager = session.conversation_manager
+                elapsed_time = manager.clock.time() - manager.session_start_time
                 st.metric("زمان سپری شده", f"{elapsed_time:.0f} ثانیه")
 
                 # نمایش میله پیشرفت
                 progress = min(elapsed_time / 600, 1.0)  # 10 دقیقه کل
                 st.progress(progress)
 
+                # امتحان پاسخ دیگر از یک نوبت قبلی، بدون تکرار کل جلسه؛
+                # فقط پیام‌هایی که نوبت مدیر گفتگو برایشان ثبت شده قابل انتخاب‌اند
+                user_turns = {m["turn"]: m["message"] for m in st.session_state.messages
+                              if m.get("agent") == "شما" and "turn" in m}
+                if user_turns:
+                    with st.expander("↩️ امتحان پاسخ دیگر"):
+                        turn = st.selectbox(
+                            "پاسخ جدید به جای",
+                            list(user_turns),
+                            format_func=lambda i: f"{i + 1}. {user_turns[i][:40]}"
+                        )
+                        if st.button("ادامه از این نوبت", use_container_width=True):
+                            self.fork_session(turn)
+
+            if self.is_admin():
+                self.render_admin_panel()
+
+    def is_admin(self) -> bool:
+        """پنل مدیر فقط با ?admin=<ADMIN_TOKEN> در آدرس نمایش داده می‌شود"""
+        token = os.getenv("ADMIN_TOKEN", "")
+        return bool(token) and st.query_params.get("admin") == token
+
+    def render_admin_panel(self):
+        """پروفایل CPU و تفکیک حافظه جلسات همین فرایند"""
+        from core import profiler
+
+        profile_dir = os.getenv("PROFILE_DIR", "profiles")
+
+        st.divider()
+        with st.expander("🛠️ پروفایل‌گیری"):
+            seconds = st.number_input("مدت پروفایل CPU (ثانیه)", min_value=1, max_value=120, value=10)
+            if st.button("ثبت پروفایل CPU", use_container_width=True):
+                try:
+                    with st.spinner("در حال نمونه‌برداری..."):
+                        stacks = profiler.get_profiler().capture(seconds)
+                    collapsed = profiler.to_collapsed(stacks)
+                    path = profiler.write_profile(profile_dir, "cpu", "collapsed", collapsed)
+                    st.success(f"{sum(stacks.values())} نمونه در {path}")
+                    st.download_button("دانلود (flamegraph)", collapsed, file_name=os.path.basename(path),
+                                       mime="text/plain")
+                except profiler.ProfilerBusy as e:
+                    st.warning(str(e))
+
+            tracing = profiler.tracemalloc.is_tracing()
+            if st.button("توقف ثبت تخصیص‌ها" if tracing else "شروع ثبت تخصیص‌ها", use_container_width=True):
+                if tracing:
+                    profiler.stop_allocation_tracing()
+                else:
+                    profiler.start_allocation_tracing()
+                st.rerun()
+
+            if st.button("تفکیک حافظه جلسات", use_container_width=True):
+                report = profiler.memory_report(self.session_manager)
+                path = profiler.write_memory_report(profile_dir, report)
+                st.caption(path)
+                st.dataframe([
+                    {key: value for key, value in item.items() if key != "conversation_history_by_agent"}
+                    for item in report["sessions"]
+                ])
+                if report["top_allocations"]:
+                    st.dataframe(report["top_allocations"])
+
+            if st.button("مصرف همه جلسات", use_container_width=True):
+                from core.usage_ledger import get_usage_aggregator
+
+                usage = get_usage_aggregator().summary()
+                st.caption(f"{usage['sessions']} جلسه، هزینه تخمینی {usage['totals']['cost']:.4f}")
+                st.dataframe(usage["entries"])
+
     def start_new_session(self):
         """شروع جلسه جدید"""
         try:
-            st.session_state.session = NegotiationSession(st.session_state.api_key)
+            if st.session_state.session_id:
+                self.session_manager.close(st.session_state.session_id)
+            session = self.session_manager.create(st.session_state.api_key)
+            st.session_state.session_id = session.conversation_manager.session_id
             st.session_state.session_active = True
             st.session_state.messages = []
+            self.reset_transcript()
             st.session_state.final_report = None
-            st.session_state.last_audio = None
+            st.session_state.final_report_text = None
+            st.session_state.processed_audio = set()
             
             # پاک کردن صف صوتی
             self.audio_manager.clear_audio_queue()
+            self.session_manager.attach_audio_queue(st.session_state.session_id, st.session_state.audio_queue)
 
             # پیام خوش‌آمدگویی
-            welcome_msg = st.session_state.session.start_session()
-            st.session_state.messages.append({
+            welcome_msg = session.start_session()
+            self.add_message({
                 "agent": "system",
                 "message": welcome_msg,
                 "timestamp": time.time()
@@ -208,17 +310,60 @@ class StreamlitNegotiationApp:
             st.success("جلسه جدید شروع شد!")
             st.rerun()
 
+        except SessionCapacityExceeded as e:
+            st.warning(f"ظرفیت کارگاه در حال حاضر پر است. لطفا {e.retry_after:.0f} ثانیه دیگر دوباره تلاش کنید.")
         except Exception as e:
             st.error(f"خطا در شروع جلسه: {str(e)}")
 
+    def fork_session(self, turn: int):
+        """ادامه در یک جلسه جدید از وضعیت پیش از نوبت turn مدیر گفتگو"""
+        parent_id = st.session_state.session_id
+        try:
+            forked = self.session_manager.fork(parent_id, turn)
+        except SessionCapacityExceeded as e:
+            st.warning(f"ظرفیت کارگاه در حال حاضر پر است. لطفا {e.retry_after:.0f} ثانیه دیگر دوباره تلاش کنید.")
+            return
+        except ValueError:
+            st.warning("این نوبت در جلسه قبلی ثبت نشده است.")
+            return
+        if forked is None:
+            st.warning("جلسه قبلی در دسترس نیست.")
+            return
+
+        # پیام‌های نمایش داده‌شده تا پیش از همان پاسخ کاربر نگه داشته می‌شوند
+        messages = st.session_state.messages
+        cut = next((index for index, message in enumerate(messages)
+                    if message.get("agent") == "شما" and message.get("turn") == turn), len(messages))
+        kept = messages[:cut]
+
+        st.session_state.session_id = forked.conversation_manager.session_id
+        st.session_state.messages = []
+        self.reset_transcript()
+        for message in kept:
+            # صدای این پیام‌ها قبلا پخش شده و دوباره ساخته نمی‌شود
+            self.add_message(dict(message, voiced=True))
+
+        # جلسه اصلی دیگر در دسترس کاربر نیست و ظرفیت و فضای دیسک را آزاد می‌کند
+        self.session_manager.close(parent_id)
+
+        self.audio_manager.clear_audio_queue()
+        self.session_manager.attach_audio_queue(st.session_state.session_id, st.session_state.audio_queue)
+        st.rerun()
+
     def end_session(self):
         """پایان جلسه و تولید گزارش"""
-        if st.session_state.session:
+        session = self.session
+        if session:
             try:
-                st.session_state.final_report = st.session_state.session.get_final_report()
+                st.session_state.final_report = session.get_final_report()
+                st.session_state.final_report_text = session.export_report("text")
                 st.session_state.session_active = False
                 self.save_report(st.session_state.final_report)
                 self.audio_manager.clear_audio_queue()
+
+                # متن گزارش نگه داشته شده و جلسه دیگر نیازی به حافظه ندارد
+                self.session_manager.close(st.session_state.session_id)
+                st.session_state.session_id = None
                 st.success("جلسه به پایان رسید. گزارش ذخیره شد.")
                 st.rerun()
             except Exception as e:
@@ -226,22 +371,26 @@ class StreamlitNegotiationApp:
 
     def save_report(self, report: Dict):
         """ذخیره گزارش جلسه"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        # ذخیره گزارش JSON
-        json_path = os.path.join(self.report_dir, f"report_{timestamp}.json")
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
-
-        # ذخیره گزارش متنی
-        text_path = os.path.join(self.report_dir, f"report_{timestamp}.txt")
-        with open(text_path, 'w', encoding='utf-8') as f:
-            f.write(st.session_state.session.export_report("text"))
-
-        return json_path, text_path
-
-    def render_message(self, message: Dict):
-        """رندر کردن یک پیام"""
+        return self.report_store.save(report, st.session_state.final_report_text)
+
+    def reset_transcript(self):
+        """پاک کردن پیام‌ها و کش رندر آن‌ها"""
+        st.session_state.transcript = {
+            "next_id": 0,
+            "rendered_count": 0,
+            "blocks": [],       # HTML بلوک‌های کامل که دیگر تغییر نمی‌کنند
+            "open_block": []    # قطعه‌های HTML بلوک در حال پر شدن
+        }
+
+    def add_message(self, message: Dict):
+        """افزودن پیام با شناسه یکتا"""
+        transcript = st.session_state.transcript
+        message["id"] = transcript["next_id"]
+        transcript["next_id"] += 1
+        st.session_state.messages.append(message)
+
+    def render_message_html(self, message: Dict) -> str:
+        """ساخت HTML یک پیام"""
         agent = message.get("agent", "")
         content = message.get("message", "")
         role = message.get("role", "")
@@ -250,7 +399,10 @@ class StreamlitNegotiationApp:
         css_class = "agent-message "
         icon = ""
 
-        if role == "conservative_investor":
+        if message.get("type") == "rate_limited":
+            css_class += "system"
+            icon = "⏳"
+        elif role == "conservative_investor":
             css_class += "conservative"
             icon = "👔"
         elif role == "risky_investor":
@@ -269,27 +421,90 @@ class StreamlitNegotiationApp:
             css_class = "user-message"
             icon = "👤"
 
-        # نمایش پیام
-        st.markdown(
-            f"""<div class="{css_class}">
+        return f"""<div class="{css_class}">
             <strong>{icon} {agent}:</strong> {content}
-            </div>""",
-            unsafe_allow_html=True
-        )
+            </div>"""
+
+    def render_new_messages(self):
+        """ساخت HTML و صف صوتی فقط برای پیام‌هایی که هنوز رندر نشده‌اند"""
+        transcript = st.session_state.transcript
+        new_messages = st.session_state.messages[transcript["rendered_count"]:]
+        session_id = st.session_state.session_id
+        session = self.session
+        manager = session.conversation_manager if session else None
+
+        for message in new_messages:
+            transcript["open_block"].append(self.render_message_html(message))
+            if len(transcript["open_block"]) >= TRANSCRIPT_BLOCK_SIZE:
+                transcript["blocks"].append("".join(transcript["open_block"]))
+                transcript["open_block"] = []
+
+            # اگر حالت صوتی فعال است و پیام از عوامل است، صدا را یک بار به صف اضافه کنید
+            agent = message.get("agent", "")
+            if message.get("voiced"):
+                continue
+            if st.session_state.voice_mode and agent == "system":
+                # پیام‌های سیستم فقط در صورت آماده بودن در بانک صدا پخش می‌شوند
+                self.audio_manager.enqueue_phrase(agent, message.get("message", ""))
+            elif (st.session_state.voice_mode and agent != "شما"
+                    and message.get("type") != "rate_limited"):
+                # متن بلافاصله نمایش داده می‌شود و صدا در پس‌زمینه ساخته می‌شود؛
+                # در شلوغی سرور (SessionCapacityExceeded) صدای این پیام حذف می‌شود
+                role = message.get("role", agent)
+                self.audio_manager.enqueue_audio(
+                    agent, message.get("message", ""),
+                    track=lambda: self.session_manager.track(session_id, "tts"),
+                    usage=(lambda role=role, **amounts: manager.record_usage("tts", role, **amounts))
+                    if manager else None
+                )
 
-        # اگر حالت صوتی فعال است و پیام از عوامل است، صدا را به صف اضافه کنید
-        if st.session_state.voice_mode and agent != "شما" and agent != "system":
-            self.audio_manager.enqueue_audio(agent, content)
+        transcript["rendered_count"] += len(new_messages)
+
+    @st.fragment(run_every=1.0)
+    def render_feedback_listener(self):
+        """دریافت دوره‌ای بازخوردهای ارزیاب که در پس‌زمینه آماده شده‌اند"""
+        session = self.session
+        feedback = session.poll_feedback() if session else []
+        if feedback:
+            for message in feedback:
+                self.add_message(message)
+            st.rerun()
+
+    @st.fragment(run_every=0.5)
+    def render_audio_listener(self):
+        """افزودن صداهایی که در پس‌زمینه آماده شده‌اند به صف پخش"""
+        if self.audio_manager.collect_ready_audio():
+            st.rerun()
 
     def render_chat_interface(self):
         """رندر کردن رابط چت"""
-        # نمایش پیام‌ها
-        for message in st.session_state.messages:
-            self.render_message(message)
+        # افزودن بازخوردهایی که از آخرین اجرا آماده شده‌اند
+        session = self.session
+        if session:
+            for message in session.poll_feedback():
+                self.add_message(message)
+
+        # نمایش پیام‌ها؛ بلوک‌های کامل از کش خوانده می‌شوند و فقط پیام‌های جدید ساخته می‌شوند
+        self.render_new_messages()
+        transcript = st.session_state.transcript
+        for block in transcript["blocks"]:
+            st.markdown(block, unsafe_allow_html=True)
+        if transcript["open_block"]:
+            st.markdown("".join(transcript["open_block"]), unsafe_allow_html=True)
+
+        # تا زمانی که ارزیابی در صف است، بازخورد به صورت خودکار اضافه می‌شود
+        if session and session.has_pending_feedback():
+            self.render_feedback_listener()
 
         # اگر حالت صوتی فعال است، پخش کننده صوتی را نمایش دهید
         if st.session_state.voice_mode:
+            self.audio_manager.collect_ready_audio()
+            if self.audio_manager.has_audio_jobs():
+                self.render_audio_listener()
+            if self.audio_manager.voice_degraded():
+                st.caption("🔇 سرویس گفتار موقتا در دسترس نیست؛ پاسخ‌ها به صورت متنی نمایش داده می‌شوند.")
             self.audio_manager.render_audio_player()
+            self.audio_manager.render_replay_controls()
 
         # ورودی کاربر - متنی یا صوتی
         if st.session_state.session_active:
@@ -308,17 +523,30 @@ class StreamlitNegotiationApp:
             if user_input:
                 self.process_user_input(user_input)
 
-            # پردازش ورودی صوتی
-            if recorded_audio and recorded_audio != st.session_state.last_audio:
+            # پردازش ورودی صوتی؛ هر ضبط (براساس هش محتوا) فقط یک نوبت می‌شود
+            audio_bytes = recorded_audio.getvalue() if recorded_audio else None
+            audio_key = self.audio_manager.recording_key(audio_bytes) if audio_bytes else None
+            if audio_key and audio_key not in st.session_state.processed_audio:
                 with st.spinner("در حال پردازش صدا..."):
-                    st.session_state.last_audio = recorded_audio
-                    audio_bytes = recorded_audio.read()
-                    audio_base64 = base64.b64encode(audio_bytes).decode()
+                    st.session_state.processed_audio.add(audio_key)
                     
                     # نمایش پیام برای دیباگ
                     st.info("در حال ارسال صدا برای تبدیل به متن...")
                     
-                    transcribed_text = self.audio_manager.speech_to_text(audio_base64)
+                    try:
+                        session = self.session
+                        with self.session_manager.track(st.session_state.session_id, "stt"):
+                            transcribed_text = self.audio_manager.transcribe_recording(
+                                audio_bytes,
+                                usage=lambda **amounts: session.conversation_manager.record_usage(
+                                    "stt", "user", **amounts)
+                            )
+                    except SessionCapacityExceeded as e:
+                        # ضبط دوباره قابل ارسال است
+                        st.session_state.processed_audio.discard(audio_key)
+                        st.warning(f"سرور شلوغ است. لطفا {e.retry_after:.0f} ثانیه دیگر دوباره تلاش کنید.")
+                        return
+
                     if transcribed_text:
                         # Get result from the transcribed data structure
                         text_result = transcribed_text.get("result", "")
@@ -333,26 +561,39 @@ class StreamlitNegotiationApp:
     def process_user_input(self, user_input: str):
         """پردازش ورودی کاربر"""
         # افزودن پیام کاربر
-        st.session_state.messages.append({
+        user_message = {
             "agent": "شما",
             "message": user_input,
             "timestamp": time.time()
-        })
+        }
+        self.add_message(user_message)
 
         # پردازش پاسخ
         try:
-            responses = st.session_state.session.process_input(user_input)
+            session = self.session
+            manager = session.conversation_manager
+            manager.voice_mode = st.session_state.voice_mode
+            turn = manager.turns
+            try:
+                with self.session_manager.track(st.session_state.session_id, "llm"):
+                    responses = session.process_input(user_input)
+            finally:
+                # نوبت مدیر فقط وقتی ثبت می‌شود که checkpoint آن گرفته شده باشد؛ fork با همین شماره انجام می‌شود
+                if manager.turns > turn:
+                    user_message["turn"] = turn
 
             # افزودن پاسخ‌های عوامل
             for response in responses:
-                st.session_state.messages.append(response)
+                self.add_message(response)
 
             # بررسی پایان جلسه
-            if not st.session_state.session.is_session_active():
+            if not session.is_session_active():
                 self.end_session()
 
             st.rerun()
 
+        except SessionCapacityExceeded as e:
+            st.warning(f"سرور شلوغ است. لطفا {e.retry_after:.0f} ثانیه دیگر دوباره تلاش کنید.")
         except Exception as e:
             st.error(f"خطا در پردازش پیام: {str(e)}")
 
@@ -429,19 +670,93 @@ class StreamlitNegotiationApp:
                 )
 
             with col2:
-                text_report = st.session_state.session.export_report("text")
                 st.download_button(
                     label="📥 دانلود گزارش متنی",
-                    data=text_report,
+                    data=st.session_state.final_report_text,
                     file_name=f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
                     mime="text/plain"
                 )
 
+    def render_instructor_dashboard(self):
+        """پایش زنده همه جلسات این فرایند برای مربی"""
+        st.title("👀 پایش زنده جلسات")
+        if 'monitor' not in st.session_state:
+            st.session_state.monitor = {"subscription": get_event_bus().subscribe(), "sessions": {}}
+            self.resync_monitor()
+        self.render_monitor_feed()
+
+    def resync_monitor(self):
+        """ساخت دوباره وضعیت بیننده از خلاصه سبک جلسات، بدون ارسال گفتگوها"""
+        sessions = {}
+        for session, _ in self.session_manager.resident_sessions():
+            snapshot = session_snapshot(session.conversation_manager, MONITOR_TAIL)
+            snapshot["messages"] = deque(snapshot["messages"], maxlen=MONITOR_TAIL)
+            sessions[snapshot["session_id"]] = snapshot
+        st.session_state.monitor["sessions"] = sessions
+
+    @st.fragment(run_every=1.0)
+    def render_monitor_feed(self):
+        """اعمال رویدادهای تازه روی وضعیت محلی بیننده و نمایش کارت جلسات"""
+        monitor = st.session_state.monitor
+        bus = get_event_bus()
+        if monitor["subscription"].closed:
+            monitor["subscription"] = bus.subscribe()
+            self.resync_monitor()
+
+        events, resync = bus.poll(monitor["subscription"])
+        if resync:
+            self.resync_monitor()
+
+        sessions = monitor["sessions"]
+        for event in events:
+            state = sessions.get(event["session_id"])
+            if state is None:
+                state = sessions[event["session_id"]] = {
+                    "session_id": event["session_id"], "seq": 0, "phase": "introduction",
+                    "message_count": 0, "messages": deque(maxlen=MONITOR_TAIL), "deal_closed": False
+                }
+            # رویدادهایی که پیش از خلاصه وضعیت منتشر شده‌اند، دوباره اعمال نمی‌شوند
+            if event["seq"] <= state["seq"]:
+                continue
+            state["seq"] = event["seq"]
+            if event["type"] == "message":
+                state["messages"].append(event["entry"])
+                state["message_count"] += 1
+            elif event["type"] == "phase":
+                state["phase"] = event["phase"]
+            elif event["type"] == "deal":
+                state["deal_closed"] = True
+
+        stats = bus.stats()
+        st.caption(f"{len(sessions)} جلسه | {stats['subscribers']} بیننده | "
+                   f"رویدادهای جاافتاده این بیننده: {monitor['subscription'].dropped}")
+
+        columns = st.columns(MONITOR_COLUMNS)
+        for index, state in enumerate(sessions.values()):
+            with columns[index % MONITOR_COLUMNS].container(border=True):
+                deal = " ✅" if state["deal_closed"] else ""
+                st.markdown(f"**{state['session_id'][:8]}** — {state['phase']}{deal}")
+                st.caption(f"{state['message_count']} پیام")
+                for entry in state["messages"]:
+                    st.text(f"{entry['sender']}: {entry['message'][:120]}")
+
     def run(self):
         """اجرای اصلی برنامه"""
+        if self.is_admin() and st.query_params.get("view") == "monitor":
+            self.render_instructor_dashboard()
+            return
+
         st.title("🤝 کارگاه مذاکره جذب سرمایه")
         st.markdown("---")
 
+        # جلسه‌ای که از مخزن جلسات پاک شده، قابل ادامه نیست
+        if st.session_state.session_active and self.session is None:
+            st.session_state.session_active = False
+            st.session_state.session_id = None
+            st.warning("جلسه شما به دلیل بی‌کاری طولانی بسته شد. لطفا جلسه جدیدی شروع کنید.")
+        elif st.session_state.session_id:
+            self.session_manager.attach_audio_queue(st.session_state.session_id, st.session_state.audio_queue)
+
         # رندر سایدبار
         self.render_sidebar()
 